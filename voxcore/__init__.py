@@ -0,0 +1,29 @@
+"""
+GUI-independent core of voxmapper: the generation pipeline, the shared worker
+pool and parameter presets. Nothing in this package imports tkinter.
+
+Submodules are imported on first use, so worker processes that unpickle a
+task from one module don't load the rest (numba in particular).
+"""
+import importlib
+
+_EXPORTS = {
+    "render_heightmap": "voxcore.pipeline",
+    "generate_full_noise_data": "voxcore.pipeline",
+    "create_heightmap": "voxcore.postprocess",
+    "generate_landmass": "voxcore.landmass",
+    "create_grass_map_data": "voxcore.grass",
+    "DEFAULT_VARS": "voxcore.presets",
+    "make_vars": "voxcore.presets",
+    "load_preset": "voxcore.presets",
+    "save_preset": "voxcore.presets",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'voxcore' has no attribute {name!r}")
+    return getattr(importlib.import_module(module), name)
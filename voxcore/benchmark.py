@@ -0,0 +1,285 @@
+"""
+Benchmarks for the generation hot paths.
+
+    python voxmapper_bench.py                       # every benchmark at 256, 1024 and 4096
+    python voxmapper_bench.py --sizes 256 -k canyon  # a subset
+    python voxmapper_bench.py -o new.json --compare old.json
+
+Each benchmark is timed once cold (numba compilation, pool start-up, ...)
+and then --repeat more times. Results are written as JSON together with the
+machine, library versions and pipeline version, so runs from different
+releases can be compared with --compare. Nothing here needs a display.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+import numpy as np
+from PIL import Image
+
+from voxcore import parallel
+from voxcore.canyons import canyon_edge_softness, canyon_paths, canyon_strokes, rasterize_canyon_mask
+from voxcore.rivers import river_strokes
+from voxcore.grass import create_grass_map_data
+from voxcore.imageimport import process_imported_image
+from voxcore.landmass import generate_landmass_parallel
+from voxcore.noise import NoiseTypeEnum, SimplexNoise, get_noise_backend
+from voxcore.pipeline import PIPELINE_VERSION, generate_full_noise_data
+from voxcore.postprocess import create_heightmap
+from voxcore.presets import make_vars
+from voxcore.preview import generate_preview_noise
+
+DEFAULT_SIZES = (256, 1024, 4096)
+
+# Scalar noise benchmarks sample this many points per unit of size
+SCALAR_POINTS_PER_SIZE = 16
+
+NOISE_TYPE_NAMES = {
+    NoiseTypeEnum.PERLINNOISE: "perlin",
+    NoiseTypeEnum.FRACTALNOISE: "fractal",
+    NoiseTypeEnum.TURBULENCE: "turbulence",
+}
+
+# Generated noise per size, shared by the post-processing benchmarks
+_noise_inputs = {}
+
+
+def _bench_vars(size, **overrides):
+    return make_vars({"noise_size": size, "landmass_size": size, "noise_type": "fractal noise", **overrides})
+
+
+def _noise_input(size):
+    if size not in _noise_inputs:
+        _noise_inputs[size] = generate_full_noise_data(size, _bench_vars(size))
+    return _noise_inputs[size]
+
+
+def _scalar_points(size):
+    rng = np.random.RandomState(size)
+    points = rng.uniform(0.0, 100.0, (size * SCALAR_POINTS_PER_SIZE, 2))
+    return [tuple(p) for p in points.tolist()]
+
+
+def setup_noise2d(size):
+    noise = SimplexNoise(seed=42)
+    points = _scalar_points(size)
+
+    def run():
+        for x, y in points:
+            noise.noise2d(x, y)
+    return run
+
+
+def _setup_simplex_noise(noise_type):
+    def setup(size):
+        noise = SimplexNoise(seed=42)
+        points = _scalar_points(size)
+
+        def run():
+            for x, y in points:
+                noise.simplexNoise(noise_type, size, 7, 0.6, 2.0, 150.0, x, y)
+        return run
+    return setup
+
+
+def setup_preview_noise(size):
+    vars_dict = _bench_vars(size)
+    # A fresh tile cache every run, so this measures sampling rather than cache hits
+    return lambda: generate_preview_noise(size, vars_dict)
+
+
+def setup_full_noise_data(size):
+    vars_dict = _bench_vars(size)
+    return lambda: generate_full_noise_data(size, vars_dict)
+
+
+def setup_create_heightmap(size):
+    noise_data = _noise_input(size)
+    vars_dict = _bench_vars(size)
+    return lambda: create_heightmap(noise_data, vars_dict)
+
+
+def setup_create_heightmap_canyons(size):
+    noise_data = _noise_input(size)
+    vars_dict = _bench_vars(size, canyon_strength=0.5, vignette_strength=0.3)
+    return lambda: create_heightmap(noise_data, vars_dict)
+
+
+def setup_river_drainage(size):
+    noise_data = _noise_input(size)
+    vars_dict = _bench_vars(size, river_strength=0.5)
+    return lambda: river_strokes(noise_data, vars_dict)
+
+
+def setup_canyon_paths(size):
+    vars_dict = _bench_vars(size)
+    edge_points = [(0, size // 3)]
+    return lambda: canyon_paths(edge_points, size, vars_dict["canyon_branch_density"], vars_dict["canyon_seed"])
+
+
+def setup_canyon_mask(size):
+    vars_dict = _bench_vars(size, canyon_strength=0.5)
+    strokes = canyon_strokes(size, vars_dict)
+    softness = canyon_edge_softness(size, vars_dict["canyon_strength"])
+    return lambda: rasterize_canyon_mask(strokes, size, softness)
+
+
+def setup_landmass_parallel(size):
+    v = _bench_vars(size)
+    return lambda: generate_landmass_parallel(
+        size, v["landmass_land_proportion"], v["landmass_plain_factor"], v["landmass_shore_height"],
+        v["landmass_noise_scale"], v["landmass_octaves"], v["landmass_seed"])
+
+
+def setup_grass_map(size):
+    vars_dict = _bench_vars(size)
+    return lambda: create_grass_map_data(vars_dict, notify=lambda message: None)
+
+
+def setup_image_import(size):
+    rng = np.random.RandomState(0)
+    image = Image.fromarray((rng.rand(size, size, 3) * 255).astype(np.uint8))
+    vars_dict = _bench_vars(size, image_size=size, gaussian_blur=1.0, red_lightness=0.2)
+    return lambda: process_imported_image(image, vars_dict)
+
+
+# name -> setup(size) returning the callable to time
+BENCHMARKS = {
+    "noise2d": setup_noise2d,
+    **{f"simplex_noise.{name}": _setup_simplex_noise(noise_type)
+       for noise_type, name in NOISE_TYPE_NAMES.items()},
+    "preview_noise": setup_preview_noise,
+    "full_noise_data": setup_full_noise_data,
+    "create_heightmap": setup_create_heightmap,
+    "create_heightmap.canyons": setup_create_heightmap_canyons,
+    "canyon_paths": setup_canyon_paths,
+    "river_drainage": setup_river_drainage,
+    "canyon_mask": setup_canyon_mask,
+    "landmass_parallel": setup_landmass_parallel,
+    "grass_map": setup_grass_map,
+    "image_import": setup_image_import,
+}
+
+
+def time_benchmark(setup, size, repeat):
+    """Time one benchmark at one size; returns a result dict (times in seconds)."""
+    run = setup(size)
+    started = time.perf_counter()
+    run()
+    first = time.perf_counter() - started
+
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    times = times or [first]
+    return {
+        "size": size,
+        "first": first,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "times": times,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    """The machine and software a run was made on."""
+    import PIL
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "workers": parallel.PROCESS_POOL_WORKERS,
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "numba": numba_version,
+        "noise_backend": get_noise_backend(),
+        "pipeline_version": PIPELINE_VERSION,
+        "git_revision": _git_revision(),
+    }
+
+
+def run_benchmarks(names, sizes, repeat, report=print):
+    """Run the named benchmarks at each size; returns the results document."""
+    results = []
+    for name in names:
+        for size in sizes:
+            result = time_benchmark(BENCHMARKS[name], size, repeat)
+            result["name"] = name
+            results.append(result)
+            report(f"{name:<28} {size:>6}  min {result['min']:9.4f}s  median {result['median']:9.4f}s  "
+                   f"first {result['first']:9.4f}s")
+    return {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+            "repeat": repeat, "results": results}
+
+
+def compare(old, new, report=print):
+    """Print the median time ratio new/old for every benchmark present in both runs."""
+    old_medians = {(r["name"], r["size"]): r["median"] for r in old["results"]}
+    report(f"{'benchmark':<28} {'size':>6}  {'old':>9}  {'new':>9}  ratio")
+    for r in new["results"]:
+        before = old_medians.get((r["name"], r["size"]))
+        if before:
+            report(f"{r['name']:<28} {r['size']:>6}  {before:9.4f}  {r['median']:9.4f}  {r['median'] / before:5.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="voxmapper-bench", description="Benchmark the voxmapper generators.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated map sizes (default: %(default)s)")
+    parser.add_argument("-k", "--filter", action="append", default=[], metavar="TEXT",
+                        help="only run benchmarks whose name contains TEXT; may be repeated")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="timed runs after the cold run (default: 3)")
+    parser.add_argument("-o", "--output", default="benchmark_results.json",
+                        help="JSON results file (default: %(default)s)")
+    parser.add_argument("--compare", metavar="JSON", help="compare against the results of an earlier run")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    try:
+        sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    except ValueError:
+        parser.error(f"invalid --sizes: {args.sizes}")
+    names = [name for name in BENCHMARKS if not args.filter or any(f in name for f in args.filter)]
+    if not names:
+        parser.error("no benchmark matches the filter")
+
+    try:
+        document = run_benchmarks(names, sizes, max(0, args.repeat))
+    finally:
+        parallel.shutdown_process_pool()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), document)
+    return 0
@@ -0,0 +1,128 @@
+"""
+Export bundle: the Teardown RGB heightmap, the greyscale heightmap and the
+grass map of one terrain in a single job.
+
+The noise and post-processing are done once and both heightmaps are taken
+from the same buffer (or, for very large maps, from the same stream of row
+bands). Files are encoded on a thread pool while the next output is computed.
+"""
+import os
+import time
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from voxcore.cache import cached_noise_data, get_render_cache
+from voxcore.canyons import canyon_strokes
+from voxcore.grass import create_grass_map_data
+from voxcore.pipeline import generate_full_noise_data
+from voxcore.postprocess import create_heightmap, create_heightmap_rows
+from voxcore.rivers import river_strokes
+from voxcore.streaming import RawHeightBands, check_rivers, open_stream_writer, should_stream
+from voxcore.timing import current_timer, stage
+
+BUNDLE_OUTPUTS = ("rgb", "greyscale", "grass")
+
+# File name suffix of each output, appended to the stem of the base path
+BUNDLE_SUFFIXES = {"rgb": "", "greyscale": "_greyscale", "grass": "_grass"}
+
+
+def bundle_paths(base_path, outputs=BUNDLE_OUTPUTS):
+    """Output paths for a bundle, e.g. map.png, map_greyscale.png and map_grass.png."""
+    stem, ext = os.path.splitext(base_path)
+    ext = ext or ".png"
+    for output in outputs:
+        if output not in BUNDLE_SUFFIXES:
+            raise ValueError(f"Unknown bundle output: {output}")
+    return {output: stem + BUNDLE_SUFFIXES[output] + ext for output in outputs}
+
+
+def _save_array(array, path, timer=None):
+    start = time.time()
+    started = time.perf_counter()
+    if os.path.splitext(path)[1].lower() == ".npy":
+        np.save(path, array)
+    else:
+        Image.fromarray(array).save(path)
+    if timer is not None:
+        # Encoding runs on a pool thread, outside the job's own stages
+        timer.add("save", start, time.perf_counter() - started, category="thread",
+                  args={"file": os.path.basename(path)})
+
+
+def _stream_heightmaps(vars_dict, paths):
+    """Write the RGB and/or greyscale heightmap from one pass over the row bands."""
+    check_rivers(vars_dict)
+    spill_dir = os.path.dirname(os.path.abspath(next(iter(paths.values()))))
+    with RawHeightBands(vars_dict, spill_dir) as source:
+        size = source.size
+        data_max = source.data_max()
+        strokes = canyon_strokes(size, vars_dict) if vars_dict["canyon_strength"] > 0 else None
+        rivers = river_strokes(source.full_map(), vars_dict) if vars_dict["river_strength"] > 0 else None
+
+        with ExitStack() as stack:
+            writers = {}
+            for output, path in paths.items():
+                channels = 3 if output == "rgb" else 1
+                writers[output] = stack.enter_context(open_stream_writer(path, size, size, channels))
+            for start, end in source.bands():
+                rows = create_heightmap_rows(source.rows(start, end), vars_dict, start, size, data_max, strokes,
+                                             rivers)
+                with stage("encode"):
+                    for output, writer in writers.items():
+                        writer.write_rows(rows if output == "rgb" else rows[:, :, 0])
+
+
+def export_bundle(vars_dict, base_path, outputs=BUNDLE_OUTPUTS, notify=print):
+    """
+    Export several outputs of one terrain, sharing the noise and post-processing.
+
+    Args:
+        vars_dict (dict): Generation parameters.
+        base_path (str): Path of the RGB heightmap; the other outputs get a
+            suffix on its stem (see bundle_paths). .npy works as for single exports.
+        outputs (iterable): Any of "rgb", "greyscale" and "grass".
+        notify (callable): Passed on to create_grass_map_data.
+
+    Returns:
+        dict: The path written for each output.
+    """
+    paths = bundle_paths(base_path, outputs)
+    render_cache = get_render_cache()
+
+    # Heightmaps exported before come straight from the render cache
+    heightmaps = {}
+    for output in ("rgb", "greyscale"):
+        if output in paths and not render_cache.copy_image(vars_dict, paths[output],
+                                                           greyscale=output == "greyscale"):
+            heightmaps[output] = paths[output]
+
+    timer = current_timer()
+    with ThreadPoolExecutor() as executor:
+        saves = []
+        if heightmaps and should_stream(vars_dict, base_path):
+            _stream_heightmaps(vars_dict, heightmaps)
+        elif heightmaps:
+            noise_data = cached_noise_data(
+                vars_dict, lambda: generate_full_noise_data(vars_dict["noise_size"], vars_dict))
+            heightmap = create_heightmap(noise_data, vars_dict)
+            del noise_data
+            for output, path in heightmaps.items():
+                array = heightmap if output == "rgb" else np.ascontiguousarray(heightmap[:, :, 0])
+                saves.append(executor.submit(_save_array, array, path, timer))
+
+        # The grass map is computed while the heightmaps are being encoded
+        if "grass" in paths:
+            with stage("grass map"):
+                grass_map = create_grass_map_data(vars_dict, notify=notify)
+            saves.append(executor.submit(_save_array, grass_map, paths["grass"], timer))
+
+        with stage("wait for saves"):
+            for future in saves:
+                future.result()
+
+    for output, path in heightmaps.items():
+        render_cache.store_image(vars_dict, path, greyscale=output == "greyscale")
+    return paths
@@ -0,0 +1,200 @@
+"""
+Content-addressed on-disk render cache.
+
+Entries are keyed by a hash of the normalized parameters and PIPELINE_VERSION
+(see pipeline.noise_key and pipeline.render_key), so a change to either simply
+misses. Two layers are kept:
+
+- the raw float heightfield, shared by every export with the same noise
+  settings (e.g. the RGB and greyscale heightmaps of one map);
+- the finished PNGs, so exporting the same map again is a file copy.
+
+The least recently used entries are evicted once the cache grows past its
+size limit. The cache lives in the user cache directory; set
+VOXMAPPER_CACHE_DIR to move it and VOXMAPPER_CACHE_MB to change the limit
+(0 disables the cache).
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+from voxcore.pipeline import noise_key, render_key
+
+DEFAULT_CACHE_MB = 2048
+
+# Raw heightfields bigger than this fraction of the limit aren't worth keeping
+RAW_MAX_FRACTION = 0.25
+
+
+def default_cache_dir():
+    """The platform's user cache directory for voxmapper."""
+    override = os.environ.get("VOXMAPPER_CACHE_DIR", "").strip()
+    if override:
+        return override
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        return os.path.join(base, "voxmapper", "Cache")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/voxmapper")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "voxmapper")
+
+
+def _default_cache_bytes():
+    """Size limit from the VOXMAPPER_CACHE_MB environment variable."""
+    value = os.environ.get("VOXMAPPER_CACHE_MB", "").strip()
+    if value:
+        try:
+            return max(0, int(float(value) * 1024 * 1024))
+        except ValueError:
+            print(f"Ignoring invalid VOXMAPPER_CACHE_MB={value!r}")
+    return DEFAULT_CACHE_MB * 1024 * 1024
+
+
+def _is_png(path):
+    return os.path.splitext(path)[1].lower() == ".png"
+
+
+class RenderCache:
+    """A directory of cached raw heightfields (.npy) and heightmap PNGs."""
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = _default_cache_bytes() if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _path(self, key, kind):
+        return os.path.join(self.directory, key[:2], f"{key}.{kind}")
+
+    def _hit(self, path):
+        """Whether path is cached, marking it as recently used."""
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _store(self, path, write):
+        """Write an entry through a temporary file, so readers never see a partial one."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def load_raw(self, vars_dict):
+        """The cached raw heightfield for vars_dict, or None."""
+        if not self.enabled:
+            return None
+        path = self._path(noise_key(vars_dict), "raw.npy")
+        if not self._hit(path):
+            return None
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            return None
+
+    def store_raw(self, vars_dict, data):
+        if not self.enabled or data.nbytes > self.max_bytes * RAW_MAX_FRACTION:
+            return
+        try:
+            self._store(self._path(noise_key(vars_dict), "raw.npy"), lambda f: np.save(f, data))
+        except OSError as e:
+            print(f"Render cache: could not store heightfield: {e}")
+
+    def copy_image(self, vars_dict, dest, greyscale=False):
+        """Copy the cached heightmap PNG for vars_dict to dest; returns whether there was one."""
+        if not self.enabled or not _is_png(dest):
+            return False
+        path = self._path(render_key(vars_dict), "grey.png" if greyscale else "rgb.png")
+        if not self._hit(path):
+            return False
+        try:
+            shutil.copyfile(path, dest)
+        except OSError:
+            return False
+        return True
+
+    def store_image(self, vars_dict, src, greyscale=False):
+        """Add the heightmap at src, rendered from vars_dict, to the cache if it is a PNG."""
+        if not self.enabled or not _is_png(src) or os.path.getsize(src) > self.max_bytes:
+            return
+
+        def copy(f):
+            with open(src, "rb") as source:
+                shutil.copyfileobj(source, f)
+
+        try:
+            self._store(self._path(render_key(vars_dict), "grey.png" if greyscale else "rgb.png"), copy)
+        except OSError as e:
+            print(f"Render cache: could not store {src}: {e}")
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits its size limit."""
+        with self._lock:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+_render_cache = None
+
+
+def get_render_cache():
+    """The shared RenderCache, configured from the environment on first use."""
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache()
+    return _render_cache
+
+
+def cached_noise_data(vars_dict, generate):
+    """
+    The raw heightfield for vars_dict from the cache, or from generate()
+    (which is then cached).
+    """
+    cache = get_render_cache()
+    data = cache.load_raw(vars_dict)
+    if data is None:
+        data = generate()
+        cache.store_raw(vars_dict, data)
+    return data
@@ -0,0 +1,623 @@
+"""
+Canyon networks: meandering paths from the map edges toward the centre,
+rasterized into a mask that is carved out of the heightmap.
+
+The network is kept as an array of tapered line segments. The mask is a
+distance field over them: each pixel takes the strongest segment within
+reach, with a smooth falloff at the canyon walls instead of a blur pass.
+Any window of the map can be rasterized on its own, with the same result as
+in the full map.
+
+The paths themselves are resolution independent: a network is walked once on
+a grid of CANYON_LAYER_GRID steps across the map and kept as a CanyonLayer in
+those normalized units. Every map size, from the preview passes to a 4096px
+export, scales the same layer, widths and wall softness included. Layers can
+be saved to JSON and loaded back (the canyon_layer_file setting) to keep a
+network while the other settings change.
+"""
+import hashlib
+import json
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from voxcore.noise import get_noise_backend, numba, snoise2_array
+from voxcore.timing import stage
+
+# Columns of the segment arrays returned by canyon_strokes
+SEG_AX, SEG_AY, SEG_BX, SEG_BY, SEG_WIDTH_A, SEG_WIDTH_B, SEG_INTENSITY_A, SEG_INTENSITY_B = range(8)
+SEGMENT_FIELDS = 8
+
+# Length in layer grid steps of the segments canyon paths are joined into
+CANYON_SEGMENT_LENGTH = 6.0
+
+# Canyon networks kept by canyon_geometry
+CANYON_GEOMETRY_CACHE_SIZE = 8
+
+# Steps across the map of the grid canyon layers are walked on; widths and
+# wall softness are given in pixels of a map of this size
+CANYON_LAYER_GRID = 512
+
+# Format tag of saved canyon layers
+CANYON_LAYER_FORMAT = "voxmapper-canyons"
+CANYON_LAYER_VERSION = 1
+
+# Rows per tile of the compiled rasterizer, which runs the tiles in parallel
+CANYON_RASTER_TILE = 64
+
+# Pixels evaluated at once by the NumPy rasterizer, bounding the temporary arrays
+CANYON_BATCH_PIXELS = 1 << 22
+
+# The soft edge reaches this many times the softness either side of the wall
+CANYON_EDGE_SCALE = 1.5
+
+
+def apply_canyons(height_data, vars_dict, start_row=0, size=None, strokes=None):
+    """
+    Carve the canyon network into height_data (floats in [0, 1]) and return the result.
+
+    Args:
+        height_data (np.ndarray): The full heightmap, or rows of it starting at start_row.
+        vars_dict (dict): Generation parameters.
+        start_row (int): First row of height_data within the full map.
+        size (int): Side length of the full map; defaults to height_data's width.
+        strokes (np.ndarray): Precomputed canyon_strokes(size, vars_dict), to reuse across bands.
+    """
+    canyon_strength = vars_dict["canyon_strength"]
+    if canyon_strength <= 0:
+        return height_data
+
+    if size is None:
+        size = height_data.shape[1]  # Assuming square heightmap
+    if strokes is None:
+        strokes = canyon_strokes(size, vars_dict)
+
+    with stage("canyon mask"):
+        canyon_mask = rasterize_canyon_mask(strokes, size, canyon_edge_softness(size, canyon_strength),
+                                            start_row, start_row + height_data.shape[0])
+
+        # Apply to heightmap with canyon_strength
+        return height_data * (1.0 - canyon_mask * min(1.0, canyon_strength * 1.2))
+
+def canyon_edge_softness(size, canyon_strength):
+    """
+    Width in pixels of the soft canyon walls, scaled with canyon_strength and
+    the map size; never below a pixel, so small maps stay antialiased.
+    """
+    grid = CANYON_LAYER_GRID
+    return max(1.0, size / grid * min(3.0, grid / 256 * canyon_strength * 2))
+
+def _segment_bounds(segments, softness):
+    """Per-segment (x_lo, y_lo, x_hi, y_hi) of the pixels the segment can reach."""
+    reach = np.maximum(segments[:, SEG_WIDTH_A], segments[:, SEG_WIDTH_B]) / 2 + CANYON_EDGE_SCALE * softness
+    x_lo = np.minimum(segments[:, SEG_AX], segments[:, SEG_BX]) - reach
+    x_hi = np.maximum(segments[:, SEG_AX], segments[:, SEG_BX]) + reach
+    y_lo = np.minimum(segments[:, SEG_AY], segments[:, SEG_BY]) - reach
+    y_hi = np.maximum(segments[:, SEG_AY], segments[:, SEG_BY]) + reach
+    return x_lo, y_lo, x_hi, y_hi
+
+def segments_near(segments, softness, x0, y0, x1, y1):
+    """The segments, in order, that can reach pixels in the inclusive box (x0, y0)-(x1, y1)."""
+    x_lo, y_lo, x_hi, y_hi = _segment_bounds(segments, softness)
+    return segments[(x_hi >= x0) & (x_lo <= x1) & (y_hi >= y0) & (y_lo <= y1)]
+
+def _wall_profile(radius, distance, edge):
+    """
+    Cross-section of a line of the given radius with soft walls, at distance
+    from its centre: a smoothstep on either wall, so thin lines come out
+    fainter as they would after a blur.
+    """
+    outer = np.clip((radius - distance + edge) / (2 * edge), 0.0, 1.0)
+    inner = np.clip((-radius - distance + edge) / (2 * edge), 0.0, 1.0)
+    return outer * outer * (3.0 - 2.0 * outer) - inner * inner * (3.0 - 2.0 * inner)
+
+def _segment_values(segments, xs, ys, edge):
+    """
+    Mask values of each segment at pixel coordinates xs, ys (broadcast
+    against one row per segment).
+    """
+    ax = segments[:, SEG_AX, None]
+    ay = segments[:, SEG_AY, None]
+    dx = segments[:, SEG_BX, None] - ax
+    dy = segments[:, SEG_BY, None] - ay
+    length2 = dx * dx + dy * dy
+    length2[length2 == 0] = 1.0  # Degenerate segments are points
+
+    # Position along each segment of the nearest point, and the distance to it
+    px = xs - ax
+    py = ys - ay
+    t = np.clip((px * dx + py * dy) / length2, 0.0, 1.0)
+    distance = np.hypot(px - t * dx, py - t * dy)
+
+    # Width and intensity taper linearly along the segment
+    width_a = segments[:, SEG_WIDTH_A, None]
+    intensity_a = segments[:, SEG_INTENSITY_A, None]
+    radius = (width_a + t * (segments[:, SEG_WIDTH_B, None] - width_a)) * 0.5
+    intensity = intensity_a + t * (segments[:, SEG_INTENSITY_B, None] - intensity_a)
+    return intensity * _wall_profile(radius, distance, edge)
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _rasterize_compiled(segments, left, top, right, bottom, edge, mask, start_row, tile, first, last):
+        """
+        The NumPy rasterizer's per-pixel arithmetic, over tiles of rows in
+        parallel, each segment over its own inclusive box left..right,
+        top..bottom. Segments are sorted by top; those of row tile i are
+        first[i]:last[i].
+        """
+        rows, cols = mask.shape
+        for i in numba.prange(len(first)):
+            row0 = start_row + i * tile
+            row1 = min(row0 + tile, start_row + rows)
+            for k in range(first[i], last[i]):
+                ax = segments[k, SEG_AX]
+                ay = segments[k, SEG_AY]
+                dx = segments[k, SEG_BX] - ax
+                dy = segments[k, SEG_BY] - ay
+                length2 = dx * dx + dy * dy
+                if length2 == 0:
+                    length2 = np.float32(1.0)
+                for y in range(max(top[k], row0), min(bottom[k] + 1, row1)):
+                    for x in range(max(left[k], 0), min(right[k] + 1, cols)):
+                        px = np.float32(x) - ax
+                        py = np.float32(y) - ay
+                        t = min(max((px * dx + py * dy) / length2, np.float32(0.0)), np.float32(1.0))
+                        ex = px - t * dx
+                        ey = py - t * dy
+                        distance = math.sqrt(ex * ex + ey * ey)
+                        width_a = segments[k, SEG_WIDTH_A]
+                        radius = (width_a + t * (segments[k, SEG_WIDTH_B] - width_a)) * 0.5
+                        outer = min(max((radius - distance + edge) / (2 * edge), 0.0), 1.0)
+                        inner = min(max((-radius - distance + edge) / (2 * edge), 0.0), 1.0)
+                        profile = outer * outer * (3.0 - 2.0 * outer) - inner * inner * (3.0 - 2.0 * inner)
+                        intensity_a = segments[k, SEG_INTENSITY_A]
+                        value = (intensity_a + t * (segments[k, SEG_INTENSITY_B] - intensity_a)) * profile
+                        if value > mask[y - start_row, x]:
+                            mask[y - start_row, x] = value
+
+def rasterize_canyon_mask(strokes, size, softness, start_row=0, end_row=None):
+    """
+    Rasterize the canyon segments into mask rows [start_row, end_row) of a
+    size x size map, as floats in [0, 1].
+
+    Each segment is evaluated only over the square window of pixels it can
+    reach and the results are combined with a maximum, so the cost follows
+    the canyon area and a band of rows comes out exactly as in the full mask.
+    Uses a compiled kernel, tile by tile, with the numba noise backend and
+    NumPy batches otherwise.
+    """
+    if end_row is None:
+        end_row = size
+    mask = np.zeros((end_row - start_row, size), dtype=np.float32)
+
+    x_lo, y_lo, x_hi, y_hi = _segment_bounds(strokes, softness)
+    segments = strokes[(y_hi >= start_row) & (y_lo <= end_row - 1) & (x_hi >= 0) & (x_lo <= size - 1)]
+    if len(segments) == 0:
+        return mask.astype(np.float64)
+
+    x_lo, y_lo, x_hi, y_hi = _segment_bounds(segments, softness)
+    left = np.ceil(x_lo).astype(np.int64)
+    top = np.ceil(y_lo).astype(np.int64)
+    right = np.floor(x_hi).astype(np.int64)
+    bottom = np.floor(y_hi).astype(np.int64)
+    window = int(max((right - left).max(), (bottom - top).max())) + 1
+    segments = segments.astype(np.float32)
+    edge = np.float32(CANYON_EDGE_SCALE * softness)
+
+    if get_noise_backend() == "numba":
+        order = np.argsort(top, kind="stable")
+        segments, left, top, right, bottom = segments[order], left[order], top[order], right[order], bottom[order]
+        tile_rows = np.arange(start_row, end_row, CANYON_RASTER_TILE)
+        first = np.searchsorted(top, tile_rows - window + 1)
+        last = np.searchsorted(top, tile_rows + CANYON_RASTER_TILE)
+        _rasterize_compiled(segments, left, top, right, bottom, edge, mask, start_row, CANYON_RASTER_TILE,
+                            first, last)
+        return mask.astype(np.float64)
+
+    offsets = np.arange(window)
+    flat = mask.reshape(-1)
+    batch_size = max(1, CANYON_BATCH_PIXELS // (window * window))
+    for batch in range(0, len(segments), batch_size):
+        part = slice(batch, batch + batch_size)
+        ys = (top[part, None] + offsets)[:, :, None]
+        xs = (left[part, None] + offsets)[:, None, :]
+        n = len(ys)
+        grid_shape = (n, window, window)
+        values = _segment_values(segments[part],
+                                 np.broadcast_to(xs, grid_shape).reshape(n, -1).astype(np.float32),
+                                 np.broadcast_to(ys, grid_shape).reshape(n, -1).astype(np.float32),
+                                 edge).reshape(grid_shape)
+        inside = (ys >= start_row) & (ys < end_row) & (xs >= 0) & (xs < size)
+        np.maximum.at(flat, ((ys - start_row) * size + xs)[inside], values[inside])
+    return mask.astype(np.float64)
+
+def canyon_strokes(size, vars_dict):
+    """
+    Build the canyon network for a size x size map as an (n, SEGMENT_FIELDS)
+    float array of tapered segments: start and end point, full width at each
+    end and intensity in [0, 1] at each end.
+
+    The paths come from canyon_layer, scaled to the map, so changing only
+    canyon_strength or the map size recomputes the widths, not the paths.
+    """
+    with stage("canyon paths"):
+        layer = canyon_layer(vars_dict)
+        scale = size / layer.grid
+        # Widths are pixels at CANYON_LAYER_GRID, whatever grid the layer was walked on
+        width = vars_dict["canyon_strength"] * size / CANYON_LAYER_GRID
+        min_width = size / CANYON_LAYER_GRID
+        segments = [_tapered_segments(*_polyline(points, scale), width * 15, min_width * 2, 1.0, 0.2)
+                    for points in layer.main_paths]
+        segments += [_tapered_segments(*_polyline(points, scale), width * 5, min_width, 220 / 255, 0.3)
+                     for points in layer.branches]
+        if not segments:
+            return np.zeros((0, SEGMENT_FIELDS))
+        return np.concatenate(segments)
+
+def _smooth_path(points):
+    """3-point moving average of a polyline, keeping its end points."""
+    smoothed = points.copy()
+    smoothed[1:-1] = (points[:-2] + points[1:-1] + points[2:]) / 3.0
+    return smoothed
+
+def _polyline(points, scale=1.0):
+    """
+    Smooth a path and join runs of its points into segments of about
+    CANYON_SEGMENT_LENGTH grid steps, then scale it to the map; returns the
+    points and the progress (0 to 1) of each along the path.
+
+    The paths advance a step or two per point, and the joined segments
+    follow the smoothed path to well within a step. The segments are the
+    same at every map size.
+    """
+    points = _smooth_path(points)
+    progress = np.linspace(0.0, 1.0, len(points))
+    step = np.hypot(*np.diff(points, axis=0).T).mean()
+    stride = max(1, int(CANYON_SEGMENT_LENGTH / step)) if step > 0 else 1
+    keep = np.append(np.arange(0, len(points) - 1, stride), len(points) - 1)
+    return points[keep] * scale, progress[keep]
+
+def _tapered_segments(points, progress, start_width, min_width, start_intensity, taper):
+    """
+    Segments of a polyline whose width shrinks to 30% and intensity by taper
+    along it. Widths never drop below min_width.
+    """
+    widths = np.maximum(min_width, (1.0 - progress * 0.7) * start_width)
+    intensities = start_intensity * (1.0 - progress * taper)
+    return np.column_stack([points[:-1], points[1:], widths[:-1], widths[1:],
+                            intensities[:-1], intensities[1:]])
+
+@dataclass(frozen=True, eq=False)
+class CanyonLayer:
+    """
+    A canyon network independent of the map size: main paths and branches as
+    read-only (n, 2) arrays of x, y on a grid of `grid` steps across the map,
+    i.e. normalized coordinates times grid. A map of size pixels scales them
+    by size / grid.
+    """
+    grid: int
+    main_paths: tuple
+    branches: tuple
+
+    def to_dict(self):
+        """The layer as a JSON-serialisable dict, paths as flat x, y lists."""
+        def flat(points):
+            values = points.ravel()
+            return [int(v) for v in values] if np.all(values == np.round(values)) else values.tolist()
+        return {"format": CANYON_LAYER_FORMAT, "version": CANYON_LAYER_VERSION, "grid": self.grid,
+                "main_paths": [flat(points) for points in self.main_paths],
+                "branches": [flat(points) for points in self.branches]}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("format") != CANYON_LAYER_FORMAT:
+            raise ValueError("Not a voxmapper canyon layer")
+        if data.get("version", 0) > CANYON_LAYER_VERSION:
+            raise ValueError(f"Unsupported canyon layer version: {data['version']}")
+        def paths(key):
+            result = []
+            for values in data.get(key, []):
+                points = np.asarray(values, dtype=np.float64)
+                if points.size % 2 or points.size < 4:
+                    raise ValueError(f"Invalid canyon path in {key}")
+                result.append(_read_only(points.reshape(-1, 2)))
+            return tuple(result)
+        return cls(int(data["grid"]), paths("main_paths"), paths("branches"))
+
+
+def save_canyon_layer(layer, path):
+    """Write a CanyonLayer to a JSON file."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(layer.to_dict(), f, separators=(",", ":"))
+        f.write("\n")
+
+def load_canyon_layer(path):
+    """Read a CanyonLayer saved by save_canyon_layer."""
+    stat = os.stat(path)
+    return _load_canyon_layer(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+@lru_cache(maxsize=CANYON_GEOMETRY_CACHE_SIZE)
+def _load_canyon_layer(path, mtime_ns, size):
+    # Keyed by modification time too, so an overwritten file is read again
+    with open(path, encoding="utf-8") as f:
+        return CanyonLayer.from_dict(json.load(f))
+
+def canyon_layer_digest(path):
+    """SHA-1 of a canyon layer file, for cache keys."""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def canyon_layer(vars_dict):
+    """The canyon network of vars_dict: the canyon_layer_file if set, else canyon_geometry."""
+    path = vars_dict.get("canyon_layer_file")
+    if path:
+        return load_canyon_layer(path)
+    return canyon_geometry(vars_dict["canyon_seed"], vars_dict["canyon_count"],
+                           vars_dict["canyon_branch_density"], vars_dict["canyon_length"])
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+@lru_cache(maxsize=CANYON_GEOMETRY_CACHE_SIZE)
+def canyon_geometry(canyon_seed, canyon_count, canyon_branch_density, canyon_length):
+    """
+    Walk the canyon network on a CANYON_LAYER_GRID grid and return it as a
+    CanyonLayer.
+
+    The geometry depends on nothing else, so it is memoized: previews and
+    exports that change other settings, canyon_strength and the map size
+    included, reuse it.
+    """
+    size = CANYON_LAYER_GRID
+    main_paths = []
+    branches = []
+    # Fixed random generator with canyon-specific seed instead of main seed
+    fixed_rng = np.random.RandomState(canyon_seed)
+
+    # Number of canyons per edge - now using the slider value
+    canyons_per_edge = canyon_count
+
+    # Generate edge points
+    edge_points = []
+
+    # Generate evenly distributed edge points with consistent randomness
+    def generate_edge_points(edge_type, count):
+        points = []
+        spacing = size / count
+
+        if edge_type == "top":
+            y = 0
+            for i in range(count):
+                offset = fixed_rng.uniform(0.2, 0.8)
+                x = int((i + offset) * spacing)
+                points.append((x, y))
+        elif edge_type == "bottom":
+            y = size - 1
+            for i in range(count):
+                offset = fixed_rng.uniform(0.2, 0.8)
+                x = int((i + offset) * spacing)
+                points.append((x, y))
+        elif edge_type == "left":
+            x = 0
+            for i in range(count):
+                offset = fixed_rng.uniform(0.2, 0.8)
+                y = int((i + offset) * spacing)
+                points.append((x, y))
+        elif edge_type == "right":
+            x = size - 1
+            for i in range(count):
+                offset = fixed_rng.uniform(0.2, 0.8)
+                y = int((i + offset) * spacing)
+                points.append((x, y))
+
+        return points
+
+    # Get points from all four edges
+    edge_points.extend(generate_edge_points("top", canyons_per_edge))
+    edge_points.extend(generate_edge_points("bottom", canyons_per_edge))
+    edge_points.extend(generate_edge_points("left", canyons_per_edge))
+    edge_points.extend(generate_edge_points("right", canyons_per_edge))
+
+    # All paths and their branches in one batched call
+    all_canyon_paths = canyon_paths(edge_points, size, canyon_branch_density, canyon_seed)
+
+    # Now apply the actual canyon_length parameter to draw only portions of each path
+    for canyon in all_canyon_paths:
+        # Get the main path
+        path_points = np.asarray(canyon['main_path'], dtype=np.float64)
+
+        # Calculate the actual path length based on canyon_length parameter
+        length_variation = fixed_rng.uniform(-0.05, 0.05)
+        length_ratio = canyon_length + length_variation
+        length_ratio = max(0.2, min(0.95, length_ratio))
+
+        # Get the number of points to use based on length_ratio
+        points_to_use = max(2, int(len(path_points) * length_ratio))
+        used_path = path_points[:points_to_use]
+
+        # Short paths are dropped; the rest are smoothed when rasterized
+        if len(used_path) > 3:
+            main_paths.append(_read_only(used_path))
+
+        # Now draw branches - only those that connect to the used portion of the main path
+        for branch_points in canyon['branches']:
+            branch_points = np.asarray(branch_points, dtype=np.float64)
+
+            # A branch connects if it starts within a pixel of a point of the used path
+            if not np.any(np.all(np.abs(used_path - branch_points[0]) <= 1, axis=1)):
+                continue
+
+            # Calculate how much of the branch to use based on main path length ratio
+            branch_length_ratio = length_ratio * 1.2  # Branches can be a bit longer
+            branch_length_ratio = min(1.0, branch_length_ratio)  # Cap at 100%
+
+            # Get the points to use
+            branch_points_to_use = max(2, int(len(branch_points) * branch_length_ratio))
+            used_branch = branch_points[:branch_points_to_use]
+
+            if len(used_branch) > 3:
+                branches.append(_read_only(used_branch))
+
+    return CanyonLayer(size, tuple(main_paths), tuple(branches))
+
+def _clamped_walk(start, steps, high):
+    """
+    Positions of a walk from start that is clamped to [0, high] after every
+    step, as a cumulative sum restarted wherever the clamp bites.
+    """
+    positions = np.cumsum(np.concatenate(([start], steps)))
+    k = 1
+    while True:
+        outside = np.flatnonzero((positions[k:] < 0) | (positions[k:] > high))
+        if not len(outside):
+            return positions
+        k += outside[0]
+        positions[k] = min(max(0, positions[k]), high)
+        positions[k:] = np.cumsum(np.concatenate(([positions[k]], steps[k:])))
+        k += 1
+
+def _uniform(draws, low, high):
+    """RandomState.uniform(low, high) computed from random_sample() draws."""
+    return low + (high - low) * draws
+
+def _path_draws(count):
+    """
+    Where the random draws of the first count steps of a main path sit in its
+    stream: after the four path parameters, each step draws a jitter, an
+    extra bend every eighth step, and a step size.
+    """
+    steps = np.arange(1, count + 1)
+    jitter = 4 + 2 * (steps - 1) + (steps - 1) // 8
+    bend = jitter + 1
+    step_size = jitter + 1 + (steps % 8 == 0)
+    return jitter, bend, step_size
+
+def canyon_paths(edge_points, size, canyon_branch_density, canyon_seed):
+    """
+    Walk a canyon from every edge point toward the centre of the map, with
+    its branches.
+
+    The random streams are drawn as arrays up front and every path is built
+    from cumulative sums, with the same numbers as stepping through them one
+    at a time. Every path draws the same stream of canyon_seed, so the walks
+    share their wiggle angles and differ only in their heading.
+
+    Returns:
+        list: {'main_path': (n, 2) int array, 'branches': list of (m, 2) int
+        arrays} per edge point that is not at the centre.
+    """
+    cx, cy = size / 2, size / 2
+    starts = []
+    for start_x, start_y in edge_points:
+        to_center_x = cx - start_x
+        to_center_y = cy - start_y
+        # Skip if already at center
+        if abs(to_center_x) < 1 and abs(to_center_y) < 1:
+            continue
+        dist_to_center = math.sqrt(to_center_x**2 + to_center_y**2)
+        starts.append((start_x, start_y, to_center_x / dist_to_center, to_center_y / dist_to_center,
+                       max(0, int(dist_to_center * 0.95) - 1)))
+    if not starts:
+        return []
+
+    # One stream long enough for the longest walk and its branch decisions
+    longest = max(start[4] for start in starts)
+    draws = np.random.RandomState(canyon_seed).random_sample(4 + 3 * longest + longest // 8 + 1)
+    angle_deviation = _uniform(draws[0], -0.1, 0.1)
+    wiggle_freq = _uniform(draws[1], 30.0, 50.0)
+    wiggle_amp = _uniform(draws[2], 0.2, 0.5)
+    wiggle_phase = _uniform(draws[3], 0, 100)
+
+    jitter, bend, step_size = _path_draws(longest)
+    step_counts = np.arange(1, longest + 1)
+    wiggle = (snoise2_array(step_counts / wiggle_freq, wiggle_phase) * wiggle_amp * math.pi
+              + _uniform(draws[jitter], -0.05, 0.05))
+    # Periodic larger bends
+    wiggle[7::8] += _uniform(draws[bend[7::8]], -0.2, 0.2)
+    cos_wiggle, sin_wiggle = np.cos(wiggle), np.sin(wiggle)
+    step_size = _uniform(draws[step_size], 1.0, 2.0)
+
+    results = []
+    for start_x, start_y, to_center_x, to_center_y, count in starts:
+        # Add slight random angle deviation
+        heading_x = to_center_x * math.cos(angle_deviation) - to_center_y * math.sin(angle_deviation)
+        heading_y = to_center_x * math.sin(angle_deviation) + to_center_y * math.cos(angle_deviation)
+
+        dx = heading_x * cos_wiggle[:count] - heading_y * sin_wiggle[:count]
+        dy = heading_x * sin_wiggle[:count] + heading_y * cos_wiggle[:count]
+        xs = _clamped_walk(start_x, dx * step_size[:count], size - 1)
+        ys = _clamped_walk(start_y, dy * step_size[:count], size - 1)
+
+        # Stop at the first point very close to the centre
+        near = np.flatnonzero(np.sqrt((xs[1:] - cx)**2 + (ys[1:] - cy)**2) < 10)
+        steps = near[0] + 1 if len(near) else count
+        path_points = np.column_stack([xs[:steps + 1], ys[:steps + 1]]).astype(np.int64)
+
+        # Branch decisions continue the stream after the walk
+        length = len(path_points)
+        index = np.arange(length)
+        index = index[(0.3 < index / length) & (index / length < 0.7)]
+        consumed = 4 + 2 * steps + steps // 8
+        index = index[draws[consumed:consumed + len(index)] < canyon_branch_density]
+        results.append({'main_path': path_points,
+                        'branches': _canyon_branches(path_points, index, size, canyon_seed)})
+    return results
+
+def _canyon_branches(path_points, index, size, canyon_seed):
+    """
+    Branches leaving a main path at the given point indices. Each draws its
+    own seeded stream; the walks are evaluated together as rows of one array,
+    padded to the longest branch.
+    """
+    if not len(index):
+        return []
+    px = path_points[index, 0]
+    py = path_points[index, 1]
+    params = np.empty((len(index), 5))
+    draws = np.zeros((len(index), 2 * 50))  # at most 49 steps of two draws
+    lengths = np.empty(len(index), dtype=np.int64)
+    # Re-seeding one generator is much cheaper than creating one per branch
+    branch_rng = np.random.RandomState()
+    for row, (i, x, y) in enumerate(zip(index.tolist(), px.tolist(), py.tolist())):
+        branch_rng.seed(canyon_seed + i + int(x * 100 + y))
+        params[row] = branch_rng.random_sample(5)
+        lengths[row] = int(_uniform(params[row, 1], 20, 50))
+        # Each step draws a jitter and a step size
+        draws[row, :2 * lengths[row]] = branch_rng.random_sample(2 * lengths[row])
+
+    branch_angle = _uniform(params[:, 0], -math.pi/4, math.pi/4)
+    branch_freq = _uniform(params[:, 2], 20.0, 40.0)
+    branch_amp = _uniform(params[:, 3], 0.2, 0.4)
+    branch_phase = _uniform(params[:, 4], 0, 100)
+
+    # Direction of the main path at each branch point, rotated
+    main_dx = (path_points[index + 1, 0] - px).astype(np.float64)
+    main_dy = (path_points[index + 1, 1] - py).astype(np.float64)
+    length = np.sqrt(main_dx**2 + main_dy**2)
+    moving = length > 0
+    main_dx[moving] /= length[moving]
+    main_dy[moving] /= length[moving]
+    branch_dx = (main_dx * np.cos(branch_angle) - main_dy * np.sin(branch_angle))[:, None]
+    branch_dy = (main_dx * np.sin(branch_angle) + main_dy * np.cos(branch_angle))[:, None]
+
+    steps = np.arange(draws.shape[1] // 2)
+    branch_wiggle = (snoise2_array(steps / branch_freq[:, None], branch_phase[:, None])
+                     * branch_amp[:, None] * math.pi + _uniform(draws[:, 0::2], -0.05, 0.05))
+    step_size = _uniform(draws[:, 1::2], 1.0, 1.5)
+    xs = np.cumsum(np.column_stack([px, (branch_dx * np.cos(branch_wiggle)
+                                         - branch_dy * np.sin(branch_wiggle)) * step_size]), axis=1)
+    ys = np.cumsum(np.column_stack([py, (branch_dx * np.sin(branch_wiggle)
+                                         + branch_dy * np.cos(branch_wiggle)) * step_size]), axis=1)
+
+    # A branch ends where it leaves the map or runs out of steps
+    ended = (xs < 0) | (xs >= size) | (ys < 0) | (ys >= size)
+    ended[:, 1:] |= steps >= lengths[:, None]
+    ended = np.column_stack([ended, np.ones(len(index), dtype=bool)])
+    ends = np.argmax(ended[:, 1:], axis=1) + 1
+    points = np.stack([xs, ys], axis=2).astype(np.int64)
+    # Only save non-trivial branches
+    return [points[row, :end] for row, end in enumerate(ends.tolist()) if end > 5]
@@ -0,0 +1,225 @@
+"""
+Headless command-line renderer.
+
+    python voxmapper_cli.py preset.json -o heightmap.png
+    python voxmapper_cli.py a.toml b.json --seeds 1-8 --output-dir out/
+
+With --tiles, each map is written as a directory of biome_ground.lua tiles
+plus a manifest; re-running into the same directory only rewrites tiles whose
+content changed.
+
+A single render spreads its tiles over all worker processes. Batch mode
+(several presets and/or seeds) renders whole maps in parallel instead, one
+per process.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+from voxcore import parallel
+from voxcore.bundle import export_bundle
+from voxcore.cache import cached_noise_data, get_render_cache
+from voxcore.pipeline import generate_full_noise_data
+from voxcore.postprocess import create_heightmap
+from voxcore.presets import DEFAULT_VARS, load_preset, make_vars
+from voxcore.streaming import (STREAMING_MIN_SIZE, check_memory_budget, export_heightmap_streaming,
+                               should_stream)
+from voxcore.tiles import DEFAULT_TILE_SIZE, export_tiles
+from voxcore.timing import stage, timed_job
+
+
+def parse_seeds(spec):
+    """Parse a seed list like "1,4,10-12" into [1, 4, 10, 11, 12]."""
+    seeds = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        if sep:
+            seeds.extend(range(int(first), int(last) + 1))
+        else:
+            seeds.append(int(part))
+    if not seeds:
+        raise ValueError(f"No seeds in {spec!r}")
+    return seeds
+
+
+def parse_overrides(items):
+    """Turn ["key=value", ...] into a dict, leaving type conversion to make_vars."""
+    overrides = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected KEY=VALUE, got {item!r}")
+        overrides[key.strip()] = value.strip()
+    return overrides
+
+
+def render_to_file(vars_dict, path, stream=False, tile_size=None, bundle=False, timings=False):
+    """
+    Render one heightmap and save it as a PNG (or .npy); returns (path, seconds).
+
+    Large maps, maps over the memory budget and .npy output are streamed in
+    bands even when stream is False; a warning is printed when even that is
+    estimated to exceed the budget.
+    PNGs are looked up in (and added to) the render cache.
+    With a tile_size, path is a directory that receives the tiles instead.
+    With bundle, the greyscale heightmap and grass map are written next to path.
+    With timings, the per-stage timings are printed afterwards.
+    """
+    warning = check_memory_budget(vars_dict)
+    if warning:
+        print(f"{path}: warning: {warning}", file=sys.stderr)
+    with timed_job("render") as timer:
+        result = _render_to_file(vars_dict, path, stream, tile_size, bundle)
+    if timings:
+        print(f"{path}: {timer.summary()}")
+    return result
+
+
+def _render_to_file(vars_dict, path, stream, tile_size, bundle):
+    started = time.perf_counter()
+    if tile_size:
+        export_tiles(vars_dict, path, tile_size)
+        return path, time.perf_counter() - started
+    if bundle:
+        export_bundle(vars_dict, path)
+        return path, time.perf_counter() - started
+
+    render_cache = get_render_cache()
+    if render_cache.copy_image(vars_dict, path):
+        return path, time.perf_counter() - started
+
+    if stream or should_stream(vars_dict, path):
+        export_heightmap_streaming(vars_dict, path)
+    else:
+        noise_data = cached_noise_data(
+            vars_dict, lambda: generate_full_noise_data(vars_dict["noise_size"], vars_dict))
+        heightmap = create_heightmap(noise_data, vars_dict)
+        with stage("save png"):
+            Image.fromarray(heightmap).save(path)
+    render_cache.store_image(vars_dict, path)
+    return path, time.perf_counter() - started
+
+
+def _batch_worker_initializer():
+    # Each batch process renders a whole map on its own
+    parallel.set_process_pool_workers(1)
+
+
+def build_jobs(args):
+    """Expand presets x seeds into (vars_dict, output path) pairs."""
+    overrides = parse_overrides(args.set)
+    presets = args.presets or [None]
+    seeds = parse_seeds(args.seeds) if args.seeds else [None]
+    batch = len(presets) > 1 or len(seeds) > 1
+
+    if batch and args.output:
+        raise ValueError("-o/--output takes a single file; use --output-dir for batches")
+
+    jobs = []
+    for preset in presets:
+        base = load_preset(preset) if preset else make_vars()
+        base = make_vars({**base, **overrides})
+        stem = os.path.splitext(os.path.basename(preset))[0] if preset else "heightmap"
+        for seed in seeds:
+            vars_dict = dict(base)
+            name = stem
+            if seed is not None:
+                vars_dict["seed"] = seed
+                name = f"{stem}_seed{seed}"
+            path = args.output or os.path.join(args.output_dir, name if args.tiles else name + ".png")
+            jobs.append((vars_dict, path))
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="voxmapper",
+        description="Render voxmapper heightmaps without the GUI.")
+    parser.add_argument("presets", nargs="*", metavar="PRESET",
+                        help="JSON or TOML preset files; defaults are used when none are given")
+    parser.add_argument("-o", "--output", help="output .png or .npy (or directory with --tiles) for a single render")
+    parser.add_argument("--output-dir", default=".", help="directory for batch output (default: current)")
+    parser.add_argument("--seeds", help="render each preset once per seed, e.g. 1,2,10-20")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a preset value; may be repeated")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="maps rendered at once in batch mode (default: one per core)")
+    parser.add_argument("-w", "--workers", type=int,
+                        help="worker processes for a single render (default: one per core)")
+    parser.add_argument("--stream", action="store_true",
+                        help="generate and write in row bands to bound memory use "
+                             f"(automatic for .npy output, maps of {STREAMING_MIN_SIZE}px or more and "
+                             "maps over the memory budget, VOXMAPPER_MEMORY_BUDGET_MB)")
+    parser.add_argument("--bundle", action="store_true",
+                        help="also write the greyscale heightmap and grass map (NAME_greyscale.png, "
+                             "NAME_grass.png), sharing the noise with the RGB heightmap")
+    parser.add_argument("--tiles", action="store_true",
+                        help="write a directory of tile PNGs plus manifest.json per map, "
+                             "rewriting only changed tiles on re-export")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE,
+                        help=f"tile size for --tiles, as biome_ground.lua's tilesize (default: {DEFAULT_TILE_SIZE})")
+    parser.add_argument("--timings", action="store_true",
+                        help="print how long each stage of a render took and its peak memory "
+                             "(set VOXMAPPER_TRACE=FILE for a Chrome trace)")
+    parser.add_argument("--dump-defaults", action="store_true",
+                        help="print a preset with every default value and exit")
+    args = parser.parse_args(argv)
+
+    if args.dump_defaults:
+        json.dump(DEFAULT_VARS, sys.stdout, indent=4, sort_keys=True)
+        sys.stdout.write("\n")
+        return 0
+
+    if args.tile_size < 1:
+        parser.error("--tile-size must be positive")
+    tile_size = args.tile_size if args.tiles else None
+    if args.tiles and args.bundle:
+        parser.error("--tiles and --bundle cannot be combined")
+
+    try:
+        jobs = build_jobs(args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    if len(jobs) == 1:
+        if args.workers:
+            parallel.set_process_pool_workers(args.workers)
+        try:
+            path, seconds = render_to_file(*jobs[0], stream=args.stream, tile_size=tile_size,
+                                           bundle=args.bundle, timings=args.timings)
+            print(f"{path} ({seconds:.2f}s)")
+        finally:
+            parallel.shutdown_process_pool()
+        return 0
+
+    max_workers = min(args.jobs or multiprocessing.cpu_count(), len(jobs))
+    failures = 0
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_batch_worker_initializer) as executor:
+        futures = {executor.submit(render_to_file, vars_dict, path, args.stream, tile_size, args.bundle,
+                                   args.timings): path
+                   for vars_dict, path in jobs}
+        for future in as_completed(futures):
+            try:
+                path, seconds = future.result()
+                print(f"{path} ({seconds:.2f}s)")
+            except Exception as e:
+                failures += 1
+                print(f"{futures[future]}: failed: {e}", file=sys.stderr)
+
+    print(f"Rendered {len(jobs) - failures}/{len(jobs)} maps in {time.perf_counter() - started:.2f}s "
+          f"using {max_workers} processes")
+    return 1 if failures else 0
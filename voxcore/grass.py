@@ -0,0 +1,183 @@
+"""
+Grass: the noise-based grass channel of the heightmap and the standalone grass map.
+"""
+import numpy as np
+from noise import snoise2
+
+from voxcore.parallel import JobCancelled, check_cancelled, run_parallel_tiles
+
+
+def generate_grass_noise(height, width, vars_dict, start_row=0, end_row=None):
+    """
+    Generate grass noise using exactly the same coordinate system as the main noise.
+
+    height and width are those of the full map; start_row/end_row select the
+    rows to return (all of them by default).
+    """
+    if end_row is None:
+        end_row = height
+
+    # === 1. Grass-specific parameters ===
+    octaves = vars_dict["grass_noise_octaves"]
+    persistence = vars_dict["grass_noise_persistence"]
+    grass_scale = vars_dict["grass_noise_scale"]
+    density = vars_dict["noise_grass_density"]
+    grass_amount = vars_dict["grass_amount"]
+    seed = vars_dict["seed"] + 1000  # Offset seed to differentiate grass
+
+    # === 2. Scaling and resolution matching ===
+    base_scale = vars_dict["scale"]
+    preview_res = vars_dict["noise_size"]  # Size used in preview
+    export_res = width  # Export width — assume square
+
+    zoom_factor = export_res / preview_res
+    adjusted_scale = base_scale * zoom_factor * 0.05  # 🔧 Tame zoom with 0.05 multiplier
+
+    # === 3. Use current focus point ===
+    focus_x = max(0.0, min(1.0, vars_dict["focus_x"]))
+    focus_y = max(0.0, min(1.0, vars_dict["focus_y"]))
+
+    # === 4. Coordinate offset matching main noise ===
+    world_offset_x = (focus_x - 0.5) * width
+    world_offset_y = (focus_y - 0.5) * height
+
+    base_offset_x = 1000.0
+    base_offset_y = 1000.0
+
+    # === 5. Output grass map ===
+    grass_map = np.zeros((end_row - start_row, width), dtype=np.uint8)
+
+    for y in range(start_row, end_row):
+        for x in range(width):
+            # Match coordinate sampling with base texture
+            sample_x = base_offset_x + (x - world_offset_x) / adjusted_scale
+            sample_y = base_offset_y + (y - world_offset_y) / adjusted_scale
+
+            # Apply grass-specific scaling
+            grass_sample_x = sample_x / grass_scale
+            grass_sample_y = sample_y / grass_scale
+
+            noise_value = snoise2(
+                grass_sample_x,
+                grass_sample_y,
+                octaves=octaves,
+                persistence=persistence,
+                lacunarity=2.0,
+                base=seed
+            )
+
+            normalized_noise = (noise_value + 1) / 2
+
+            if normalized_noise < density:
+                grass_map[y - start_row, x] = grass_amount
+            else:
+                grass_map[y - start_row, x] = 0
+
+    return grass_map
+
+# Maps at least this size generate the grass map on the worker pool
+GRASS_PARALLEL_MIN_SIZE = 512
+
+
+def _simple_noise_rows(seed, start_row, end_row, start_col, end_col):
+    """
+    The grass map's "simple" (white) noise for a block of the map, uniform in [0, 1).
+
+    Every row has its own random stream seeded by (seed, row), so the values
+    are the same however the map is split into tiles. Each float takes one
+    step of the stream, so a tile skips ahead to its first column and draws
+    only its own.
+    """
+    seed %= 2 ** 32
+    block = np.empty((end_row - start_row, end_col - start_col), dtype=np.float64)
+    for y in range(start_row, end_row):
+        stream = np.random.PCG64((seed, y))  # As np.random.default_rng((seed, y))
+        stream.advance(start_col)
+        block[y - start_row] = np.random.Generator(stream).random(end_col - start_col)
+    return block
+
+def generate_grass_map_chunk(start_row, end_row, start_col, end_col, size, density, perlin_amount, simple_amount,
+                             seed=0):
+    chunk_data = np.zeros((end_row - start_row, end_col - start_col), dtype=np.float32)
+    simple_noise = _simple_noise_rows(seed, start_row, end_row, start_col, end_col)
+
+    for y in range(start_row, end_row):
+        check_cancelled()
+        for x in range(start_col, end_col):
+            # Generate Perlin noise
+            noise_value_perlin = snoise2(x / (50.0 * perlin_amount), 
+                                        y / (50.0 * perlin_amount), 
+                                        octaves=5, 
+                                        persistence=0.5, 
+                                        lacunarity=2.0, 
+                                        repeatx=size, 
+                                        repeaty=size, 
+                                        base=42)
+            # Generate Simple noise
+            noise_value_simple = simple_noise[y - start_row, x - start_col]
+
+            # Normalize the noise values to be between 0 and 1
+            normalized_noise_value_perlin = (noise_value_perlin + 1) / 2  # Normalize from [-1, 1] to [0, 1]
+            normalized_noise_value_simple = (noise_value_simple)  # Already between [0, 1]
+
+            # Combine noise values based on their amounts
+            combined_noise_value = (perlin_amount * normalized_noise_value_perlin + 
+                                    simple_amount * normalized_noise_value_simple) / (perlin_amount + simple_amount)
+
+            # Determine grass presence based on combined noise and density
+            chunk_data[y - start_row, x - start_col] = combined_noise_value < density
+
+    return chunk_data
+
+def create_grass_map_data(vars_dict, notify=print, parallel=None):
+    """
+    Generate the grass map as a uint8 array.
+
+    The same vars_dict (including grass_seed) always gives the same map,
+    whether it is generated in one piece or in tiles on the worker pool.
+
+    Args:
+        vars_dict (dict): Generation parameters.
+        notify (callable): Receives a message when falling back to a single process.
+        parallel (bool): Use the worker pool; by default only for maps of
+            GRASS_PARALLEL_MIN_SIZE and larger.
+    """
+    size = vars_dict["noise_size"]
+    density = vars_dict["grass_density"]
+    perlin_amount = vars_dict["perlin_noise_amount"]
+    simple_amount = vars_dict["simple_noise_amount"]
+    lightness = vars_dict["lightness"]
+    args = (size, density, perlin_amount, simple_amount, vars_dict["grass_seed"])
+
+    if parallel is None:
+        parallel = size >= GRASS_PARALLEL_MIN_SIZE
+
+    # For smaller sizes, avoid multiprocessing
+    if not parallel:
+        # Generate the entire map in the main process for small maps
+        grass_map_data = generate_grass_map_chunk(0, size, 0, size, *args)
+    else:
+        # Use multiprocessing only for larger maps
+        try:
+            grass_map_data = run_parallel_tiles(generate_grass_map_chunk, args, (size, size), label="grass map")
+
+        except JobCancelled:
+            raise
+        except Exception as e:
+            print(f"Multiprocessing error: {e}")
+            # Fall back to single-process method
+            notify("Using single-process mode for generating grass map")
+
+            # Generate the entire map in the main process as fallback
+            grass_map_data = generate_grass_map_chunk(0, size, 0, size, *args)
+
+    # Turn into an image
+    grass_map_image = np.zeros((size, size), dtype=np.uint8)
+    grass_map_image[grass_map_data.astype(bool)] = 255
+
+    brightness_value = int(255 * lightness)
+    brightness_value = max(0, min(255, brightness_value))
+
+    grass_map_image[~grass_map_data.astype(bool)] = brightness_value
+
+    return grass_map_image
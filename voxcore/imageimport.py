@@ -0,0 +1,65 @@
+"""
+Image import: turning an existing image into a Teardown heightmap (red
+channel height, green overlay, optional blur).
+"""
+import numpy as np
+from PIL import Image, ImageFilter
+
+
+def process_imported_image(original_image, vars_dict):
+    """Resize and process the imported image, returning (resized, processed, preview) images."""
+    # Resize the actual imported image based on slider
+    target_size = vars_dict["image_size"]
+    width, height = original_image.size
+    aspect_ratio = width / height
+
+    if width > height:
+        new_width = min(target_size, 4096)
+        new_height = int(new_width / aspect_ratio)
+    else:
+        new_height = min(target_size, 4096)
+        new_width = int(new_height * aspect_ratio)
+
+    imported_image = original_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+    # Convert to numpy array for red channel processing
+    img_array = np.array(imported_image)
+    rgb_array = np.zeros((img_array.shape[0], img_array.shape[1], 3), dtype=np.uint8)
+
+    red_channel = img_array[:, :, 0].astype(float)
+    if vars_dict["invert_red"]:
+        red_channel = 255 - red_channel
+    lightness = vars_dict["red_lightness"]
+    if lightness > 0:
+        red_channel = red_channel + (255 - red_channel) * lightness
+    red_value = vars_dict["red_channel_value"]
+    red_channel = (red_channel * red_value).clip(0, 255).astype(np.uint8)
+    rgb_array[:, :, 0] = red_channel
+
+    # Convert to RGBA for overlay
+    img_rgba = Image.fromarray(rgb_array, mode="RGB").convert("RGBA")
+
+    # Create green overlay
+    alpha_val = int(vars_dict["green_channel_value"] * 255)
+    green_overlay = Image.new('RGBA', img_rgba.size, (0, 255, 0, alpha_val))
+
+    # Composite green overlay
+    img_with_overlay = Image.alpha_composite(img_rgba, green_overlay)
+    processed_image = img_with_overlay.convert("RGB")
+
+    # Apply Gaussian blur if set
+    blur_radius = vars_dict["gaussian_blur"]
+    if blur_radius > 0:
+        processed_image = processed_image.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+
+    # Create preview image at consistent size (512x512)
+    preview_size = 512
+    if width > height:
+        preview_width = preview_size
+        preview_height = int(preview_width / aspect_ratio)
+    else:
+        preview_height = preview_size
+        preview_width = int(preview_height * aspect_ratio)
+
+    preview_img = processed_image.resize((preview_width, preview_height), Image.Resampling.LANCZOS)
+    return imported_image, processed_image, preview_img
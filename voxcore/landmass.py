@@ -0,0 +1,126 @@
+"""
+Landmass generation: continent-shaped terrain with a water line, shores and plains.
+"""
+import numpy as np
+from noise import snoise2
+
+from voxcore.parallel import run_parallel_tiles
+
+
+def generate_landmass(vars_dict):
+    """Generate heightmap with landmass shape, returning a 2D float numpy array normalized 0-1."""
+    # Get parameters
+    size = vars_dict["landmass_size"]
+    land_proportion = vars_dict["landmass_land_proportion"]
+    # water_level is not directly used in this version of landmass shaping, but kept for potential future use
+    # water_level = vars_dict["landmass_water_level"] 
+    plain_factor = vars_dict["landmass_plain_factor"]
+    shore_height = vars_dict["landmass_shore_height"]
+    noise_scale = vars_dict["landmass_noise_scale"]
+    octaves = vars_dict["landmass_octaves"]
+    seed = vars_dict["landmass_seed"]
+
+    # Generate base terrain using FBM noise
+    heightmap = generate_landmass_parallel(
+        size=size,
+        land_proportion=land_proportion,
+        plain_factor=plain_factor,
+        shore_height=shore_height,
+        noise_scale=noise_scale,
+        octaves=octaves,
+        seed=seed
+    )
+
+    # Normalize heightmap to 0-1 range initially
+    h_min_initial = np.min(heightmap)
+    h_max_initial = np.max(heightmap)
+    if h_max_initial == h_min_initial:
+        heightmap = np.full((size, size), 0.5, dtype=np.float32)
+    else:
+        heightmap = (heightmap - h_min_initial) / (h_max_initial - h_min_initial)
+
+    # Determine water threshold using np.percentile
+    # (1.0 - land_proportion) gives the percentile of water.
+    # E.g., if land_proportion is 0.7 (70% land), water is 30%, so we find the 30th percentile.
+    if len(heightmap.flatten()) == 0: # Should not happen with proper size
+        water_threshold = 0.5
+    else:
+        water_threshold = np.percentile(heightmap.flatten(), (1.0 - land_proportion) * 100.0)
+
+    # --- Vectorized Shaping Logic ---
+    under_water_mask = heightmap < water_threshold
+    above_water_mask = ~under_water_mask
+
+    # Process underwater areas
+    # Lower underwater terrain by shore_height (relative to current 0-1 range)
+    heightmap[under_water_mask] = heightmap[under_water_mask] - shore_height
+
+    # Process above-water areas
+    # Temporarily store above-water heights to avoid modifying them in place during calculation
+    h_above = heightmap[above_water_mask]
+
+    # Handle case where water_threshold might be 1.0 (all water or flat terrain at max)
+    denominator = 1.0 - water_threshold
+    if np.isclose(denominator, 0): # Avoid division by zero
+        # If denominator is close to zero, it means water_threshold is very close to 1.0
+        # This implies very little or no land above water_threshold to apply plain_factor to.
+        # Or, all land is effectively at water_threshold.
+        # Set h_norm_above to 0 to avoid issues, or handle as appropriate (e.g., no change).
+        h_norm_above = np.zeros_like(h_above) # Or 0.0 if h_above could be scalar
+    else:
+        h_norm_above = (h_above - water_threshold) / denominator
+
+    h_norm_above = np.clip(h_norm_above, 0.0, 1.0) # Ensure h_norm is in [0,1] before power
+    h_shaped_above = h_norm_above ** plain_factor
+
+    # Apply shaped heights back
+    heightmap[above_water_mask] = water_threshold + h_shaped_above * (1.0 - water_threshold)
+    # --- End of Vectorized Shaping Logic ---
+
+    # Final normalization to ensure output is strictly 0-1
+    heightmap = heightmap.astype(np.float32) 
+    final_h_min = np.min(heightmap)
+    final_h_max = np.max(heightmap)
+    if final_h_max == final_h_min:
+        heightmap = np.full((size, size), 0.5, dtype=np.float32)
+    else:
+        heightmap = (heightmap - final_h_min) / (final_h_max - final_h_min)
+
+    return heightmap
+
+def generate_landmass_chunk(start_y, end_y, start_x, end_x, size, noise_scale, octaves, seed):
+        chunk = np.zeros((end_y - start_y, end_x - start_x), dtype=np.float32)
+        for y in range(start_y, end_y):
+            for x in range(start_x, end_x):
+                nx = x / noise_scale
+                ny = y / noise_scale
+                chunk[y - start_y, x - start_x] = snoise2(nx, ny, octaves=octaves, persistence=0.5, lacunarity=2.0, base=seed)
+        return chunk
+
+def generate_landmass_parallel(size, land_proportion, plain_factor,
+                                shore_height, noise_scale, octaves, seed):
+    heightmap = run_parallel_tiles(generate_landmass_chunk, (size, noise_scale, octaves, seed),
+                                   (size, size), label="landmass")
+
+    # Normalize to [0, 1]
+    h_min, h_max = heightmap.min(), heightmap.max()
+    if h_max != h_min:
+        heightmap = (heightmap - h_min) / (h_max - h_min)
+    else:
+        heightmap[:] = 0.5
+
+    # Water threshold
+    water_threshold = np.percentile(heightmap, (1.0 - land_proportion) * 100.0)
+    under = heightmap < water_threshold
+    above = ~under
+
+    # Shore and plain shaping
+    heightmap[under] -= shore_height
+    denom = 1.0 - water_threshold
+    h_above = heightmap[above]
+    norm_above = np.clip((h_above - water_threshold) / denom, 0.0, 1.0) if denom > 1e-6 else np.zeros_like(h_above)
+    heightmap[above] = water_threshold + norm_above**plain_factor * denom
+
+    # Final normalization
+    h_min, h_max = heightmap.min(), heightmap.max()
+    return (heightmap - h_min) / (h_max - h_min) if h_max != h_min else np.full_like(heightmap, 0.5)
@@ -0,0 +1,252 @@
+"""
+Memory use of exports: per-stage peaks while running, and an estimate
+beforehand that is checked against a budget.
+
+Resident set size (RSS) is sampled on a background thread while a timed job
+runs (see voxcore.timing). Setting VOXMAPPER_TRACEMALLOC=1 also records the
+tracemalloc high-water mark of Python/NumPy allocations per stage, in the
+parent and in the worker processes; it slows allocation-heavy code down, so
+it is off by default.
+
+The budget is VOXMAPPER_MEMORY_BUDGET_MB, or three quarters of the physical
+memory when that is not set. Exports whose estimate exceeds it are written in
+row bands instead (see streaming.should_stream).
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+# Record tracemalloc peaks per stage (slow, off by default)
+TRACEMALLOC = bool(os.environ.get("VOXMAPPER_TRACEMALLOC"))
+
+# Seconds between RSS samples while a job runs
+RSS_SAMPLE_INTERVAL = 0.02
+
+# Default budget as a fraction of physical memory
+DEFAULT_BUDGET_FRACTION = 0.75
+
+# Approximate bytes per map pixel at the peak of each part of an in-memory
+# export, measured with the RSS sampler on 2048px and 4096px maps
+BYTES_PER_PIXEL_BASE = 16        # raw noise, float temporaries, RGB output, PNG save
+BYTES_PER_PIXEL_CANYONS = 22     # float32 mask, its float64 copy and the carved heights
+BYTES_PER_PIXEL_VIGNETTE = 22    # float64 distance and falloff grids
+BYTES_PER_PIXEL_GRASS_NOISE = 1
+BYTES_PER_PIXEL_LANDMASS = 8     # the whole landmass, which is never banded
+BYTES_PER_PIXEL_RIVERS = 32      # filled heights, flood queues and flow arrays of the whole map
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if unknown."""
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm", "rb") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+    if sys.platform == "win32":
+        counters = _windows_memory_counters()
+        return counters.WorkingSetSize if counters else None
+    return peak_rss()
+
+
+def peak_rss():
+    """Highest resident set size of this process so far in bytes, or None if unknown."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+    counters = _windows_memory_counters()
+    return counters.PeakWorkingSetSize if counters else None
+
+
+def _windows_memory_counters():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters
+    except (AttributeError, OSError):
+        pass
+    return None
+
+
+def physical_memory():
+    """Total physical memory in bytes, or None if unknown."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        pass
+    if sys.platform == "win32":
+        try:
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(status)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return status.ullTotalPhys
+        except (AttributeError, OSError):
+            pass
+    return None
+
+
+def memory_budget():
+    """The export memory budget in bytes, or None for no limit."""
+    value = os.environ.get("VOXMAPPER_MEMORY_BUDGET_MB", "").strip()
+    if value:
+        try:
+            return int(float(value) * MB) or None
+        except ValueError:
+            print(f"Ignoring invalid VOXMAPPER_MEMORY_BUDGET_MB={value!r}")
+    total = physical_memory()
+    return int(total * DEFAULT_BUDGET_FRACTION) if total else None
+
+
+def estimate_export_memory(vars_dict, band_rows=None):
+    """
+    Rough peak memory in bytes of exporting vars_dict, in memory or, with
+    band_rows, in row bands of that height.
+    """
+    landmass = vars_dict["noise_type"] == "landmass"
+    size = vars_dict["landmass_size"] if landmass else vars_dict["noise_size"]
+
+    per_pixel = BYTES_PER_PIXEL_BASE
+    if vars_dict["canyon_strength"] > 0:
+        per_pixel += BYTES_PER_PIXEL_CANYONS
+    if vars_dict["vignette_strength"] > 0:
+        per_pixel += BYTES_PER_PIXEL_VIGNETTE
+    if vars_dict["use_noise_grass"]:
+        per_pixel += BYTES_PER_PIXEL_GRASS_NOISE
+
+    if band_rows is None:
+        estimate = size * size * per_pixel
+    else:
+        estimate = min(size, band_rows) * size * per_pixel
+    if landmass:
+        # Landmass maps are always generated whole
+        estimate += size * size * BYTES_PER_PIXEL_LANDMASS
+    if vars_dict["river_strength"] > 0:
+        # So is the drainage network
+        estimate += size * size * BYTES_PER_PIXEL_RIVERS
+    return estimate
+
+
+def format_bytes(count):
+    if count is None:
+        return "?"
+    if count >= 1024 * MB:
+        return f"{count / (1024 * MB):.1f} GB"
+    return f"{count / MB:.0f} MB"
+
+
+class MemoryTracker:
+    """
+    Peak RSS and tracemalloc peaks of nested stages within one job.
+
+    A sampler thread polls the RSS; enter() and exit() bracket a stage and
+    exit() returns its peaks. Peaks of inner stages count towards the stages
+    around them.
+    """
+
+    def __init__(self, sample_interval=RSS_SAMPLE_INTERVAL, trace_allocations=TRACEMALLOC):
+        self.sample_interval = sample_interval
+        self.samples = []  # (time.time(), rss) for the trace's memory counter
+        self.trace_allocations = trace_allocations
+        self._stack = []
+        self._rss_peak = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if current_rss() is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self._record(current_rss())
+            self._stop.wait(self.sample_interval)
+
+    def _record(self, rss):
+        if rss is None:
+            return
+        with self._lock:
+            self.samples.append((time.time(), rss))
+            self._rss_peak = max(self._rss_peak, rss)
+
+    def _fold(self):
+        """Fold the peaks seen since the last call into every open stage."""
+        self._record(current_rss())
+        with self._lock:
+            rss_peak, self._rss_peak = self._rss_peak, 0
+        traced_peak = None
+        if tracemalloc.is_tracing():
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        for frame in self._stack:
+            frame["rss_peak"] = max(frame["rss_peak"], rss_peak)
+            if traced_peak is not None:
+                frame["traced_peak"] = max(frame.get("traced_peak", 0), traced_peak)
+
+    def enter(self):
+        self._fold()
+        frame = {"rss_peak": current_rss() or 0}
+        self._stack.append(frame)
+        return frame
+
+    def exit(self, frame):
+        self._fold()
+        # By identity: frames of different stages can compare equal
+        self._stack = [open_frame for open_frame in self._stack if open_frame is not frame]
+        return frame
+
+
+def worker_memory():
+    """(peak RSS, tracemalloc peak or None) of this worker process, for reporting from tasks."""
+    traced = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+    return peak_rss(), traced
+
+
+def start_worker_tracing():
+    """Pool initializer hook: trace allocations in workers as in the parent."""
+    if TRACEMALLOC and not tracemalloc.is_tracing():
+        tracemalloc.start()
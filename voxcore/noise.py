@@ -0,0 +1,724 @@
+import os
+import numpy as np
+from PIL import Image
+import random
+import math
+from functools import lru_cache
+
+try:
+    import numba
+    # Kernels are launched from preview and export threads; the TBB layer can
+    # hang interpreter shutdown after that, so try OpenMP first
+    numba.config.THREADING_LAYER_PRIORITY = ["omp", "tbb", "workqueue"]
+except ImportError:  # Optional: compiled noise backend
+    numba = None
+
+# Skewing and unskewing factors for 2D, shared with the compiled kernels
+_F2 = 0.5 * (math.sqrt(3.0) - 1.0)
+_G2 = (3.0 - math.sqrt(3.0)) / 6.0
+
+NOISE_BACKENDS = ("numba", "numpy")
+
+# Environment variable holding the selected backend; set_noise_backend
+# exports it so worker processes spawned afterwards use the same one
+NOISE_BACKEND_ENV = "VOXMAPPER_NOISE_BACKEND"
+
+def _default_noise_backend():
+    """Backend from the VOXMAPPER_NOISE_BACKEND environment variable, else the compiled one when numba is importable."""
+    value = os.environ.get(NOISE_BACKEND_ENV, "").strip().lower()
+    if value == "numpy" or (value == "numba" and numba is not None):
+        return value
+    if value:
+        print(f"Ignoring unavailable {NOISE_BACKEND_ENV}={value!r}")
+    return "numba" if numba is not None else "numpy"
+
+_noise_backend = _default_noise_backend()
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _noise2d_compiled(perm, grad3, xin, yin):
+        """Scalar simplex noise with the same float operations as SimplexNoise.noise2d."""
+        s = (xin + yin) * _F2
+        i = np.int64(xin + s)
+        j = np.int64(yin + s)
+
+        t = (i + j) * _G2
+        x0 = xin - (i - t)
+        y0 = yin - (j - t)
+
+        i1, j1 = 0, 1
+        if x0 > y0:
+            i1, j1 = 1, 0
+
+        x1 = x0 - i1 + _G2
+        y1 = y0 - j1 + _G2
+        x2 = x0 - 1.0 + 2.0 * _G2
+        y2 = y0 - 1.0 + 2.0 * _G2
+
+        ii = i & 255
+        jj = j & 255
+        gi0 = perm[ii + perm[jj]] % 12
+        gi1 = perm[ii + i1 + perm[jj + j1]] % 12
+        gi2 = perm[ii + 1 + perm[jj + 1]] % 12
+
+        n0, n1, n2 = 0.0, 0.0, 0.0
+
+        t0 = 0.5 - x0*x0 - y0*y0
+        if t0 >= 0:
+            t0 *= t0
+            n0 = t0 * t0 * (grad3[gi0, 0]*x0 + grad3[gi0, 1]*y0)
+
+        t1 = 0.5 - x1*x1 - y1*y1
+        if t1 >= 0:
+            t1 *= t1
+            n1 = t1 * t1 * (grad3[gi1, 0]*x1 + grad3[gi1, 1]*y1)
+
+        t2 = 0.5 - x2*x2 - y2*y2
+        if t2 >= 0:
+            t2 *= t2
+            n2 = t2 * t2 * (grad3[gi2, 0]*x2 + grad3[gi2, 1]*y2)
+
+        return 70.0 * (n0 + n1 + n2)
+
+    @numba.njit(parallel=True, cache=True)
+    def _noise2d_grid_compiled(perm, grad3, xs, ys, out):
+        rows, cols = out.shape
+        for r in numba.prange(rows):
+            for c in range(cols):
+                out[r, c] = _noise2d_compiled(perm, grad3, xs[r, c], ys[r, c])
+
+    @numba.njit(parallel=True, cache=True)
+    def _octave_grid_compiled(perm, grad3, xs, ys, frequencies, amplitudes,
+                              max_value, turbulence, out):
+        """Octave sum with the same float32 accumulation as simplexNoiseGrid."""
+        rows, cols = out.shape
+        for r in numba.prange(rows):
+            for c in range(cols):
+                total = np.float32(0.0)
+                for k in range(frequencies.shape[0]):
+                    n = _noise2d_compiled(perm, grad3,
+                                          xs[r, c] * frequencies[k],
+                                          ys[r, c] * frequencies[k])
+                    if turbulence:
+                        n = abs(n)
+                    total = np.float32(total + n * amplitudes[k])
+                out[r, c] = total / np.float32(max_value)
+
+def set_noise_backend(name=None):
+    """
+    Selects the backend used by the grid noise functions, in this process and
+    in the worker pool (see parallel.get_process_pool).
+
+    Args:
+        name (str): "numba" or "numpy"; None picks the fastest available one.
+
+    Returns:
+        str: The backend that is now active.
+    """
+    global _noise_backend
+    if name is None:
+        name = "numba" if numba is not None else "numpy"
+    if name not in NOISE_BACKENDS:
+        raise ValueError(f"Unknown noise backend: {name}")
+    if name == "numba" and numba is None:
+        raise ValueError("The numba backend requires the numba package")
+    _noise_backend = name
+    os.environ[NOISE_BACKEND_ENV] = name
+    return _noise_backend
+
+def get_noise_backend():
+    """Returns the name of the active noise backend."""
+    return _noise_backend
+
+# Ken Perlin's permutation and the 2D gradients of the noise package's snoise2
+_SNOISE_PERM = np.array([
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225, 140,
+    36, 103, 30, 69, 142, 8, 99, 37, 240, 21, 10, 23, 190, 6, 148, 247, 120,
+    234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117, 35, 11, 32, 57, 177, 33,
+    88, 237, 149, 56, 87, 174, 20, 125, 136, 171, 168, 68, 175, 74, 165, 71,
+    134, 139, 48, 27, 166, 77, 146, 158, 231, 83, 111, 229, 122, 60, 211, 133,
+    230, 220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161,
+    1, 216, 80, 73, 209, 76, 132, 187, 208, 89, 18, 169, 200, 196, 135, 130,
+    116, 188, 159, 86, 164, 100, 109, 198, 173, 186, 3, 64, 52, 217, 226, 250,
+    124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85, 212, 207, 206, 59, 227,
+    47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213, 119, 248, 152, 2, 44,
+    154, 163, 70, 221, 153, 101, 155, 167, 43, 172, 9, 129, 22, 39, 253, 19, 98,
+    108, 110, 79, 113, 224, 232, 178, 185, 112, 104, 218, 246, 97, 228, 251, 34,
+    242, 193, 238, 210, 144, 12, 191, 179, 162, 241, 81, 51, 145, 235, 249, 14,
+    239, 107, 49, 192, 214, 31, 181, 199, 106, 157, 184, 84, 204, 176, 115, 121,
+    50, 45, 127, 4, 150, 254, 138, 236, 205, 93, 222, 114, 67, 29, 24, 72, 243,
+    141, 128, 195, 78, 66, 215, 61, 156, 180] * 2, dtype=np.int64)
+_SNOISE_GRAD3 = np.array([
+    [1, 1], [-1, 1], [1, -1], [-1, -1], [1, 0], [-1, 0],
+    [1, 0], [-1, 0], [0, 1], [0, -1], [0, 1], [0, -1]], dtype=np.float32)
+_SNOISE_F2 = np.float32(_F2)
+_SNOISE_G2 = np.float32(_G2)
+
+def snoise2_array(xs, ys):
+    """
+    Single-octave noise.snoise2 over arrays, with the same float32 arithmetic
+    so every value matches the scalar call exactly.
+
+    Args:
+        xs, ys (array-like): Sample coordinates; broadcast against each other.
+
+    Returns:
+        np.ndarray: float64 noise values in [-1, 1].
+    """
+    x, y = np.broadcast_arrays(np.asarray(xs, dtype=np.float32), np.asarray(ys, dtype=np.float32))
+    s = (x + y) * _SNOISE_F2
+    i = np.floor(x + s)
+    j = np.floor(y + s)
+    t = (i + j) * _SNOISE_G2
+    x0 = x - (i - t)
+    y0 = y - (j - t)
+
+    i1 = (x0 > y0).astype(np.int64)
+    j1 = 1 - i1
+    x1 = x0 - i1.astype(np.float32) + _SNOISE_G2
+    y1 = y0 - j1.astype(np.float32) + _SNOISE_G2
+    x2 = x0 + _SNOISE_G2 * np.float32(2.0) - np.float32(1.0)
+    y2 = y0 + _SNOISE_G2 * np.float32(2.0) - np.float32(1.0)
+
+    perm = _SNOISE_PERM
+    ii = i.astype(np.int64) & 255
+    jj = j.astype(np.int64) & 255
+    g0 = perm[ii + perm[jj]] % 12
+    g1 = perm[ii + i1 + perm[jj + j1]] % 12
+    g2 = perm[ii + 1 + perm[jj + 1]] % 12
+
+    total = np.zeros(x.shape, dtype=np.float32)
+    for xc, yc, g in ((x0, y0, g0), (x1, y1, g1), (x2, y2, g2)):
+        f = np.float32(0.5) - xc * xc - yc * yc
+        n = f * f * f * f * (_SNOISE_GRAD3[g, 0] * xc + _SNOISE_GRAD3[g, 1] * yc)
+        total = total + np.where(f > 0, n, np.float32(0.0))
+    return (total * np.float32(70.0)).astype(np.float64)
+
+class NoiseTypeEnum:
+    PERLINNOISE = 0
+    FRACTALNOISE = 1
+    TURBULENCE = 2
+    SHAPE_NOISE = 3
+
+class SimplexNoise:
+    def __init__(self, seed=None):
+        # Local RNG so building tables never touches the global random state
+        rng = random.Random(seed)
+        
+        # Initialize gradient tables for 3D and 4D
+        self.grad3 = [
+            [1,1,0], [-1,1,0], [1,-1,0], [-1,-1,0],
+            [1,0,1], [-1,0,1], [1,0,-1], [-1,0,-1],
+            [0,1,1], [0,-1,1], [0,1,-1], [0,-1,-1]
+        ]
+        
+        self.grad4 = [
+            [0,1,1,1], [0,1,1,-1], [0,1,-1,1], [0,1,-1,-1],
+            [0,-1,1,1], [0,-1,1,-1], [0,-1,-1,1], [0,-1,-1,-1],
+            [1,0,1,1], [1,0,1,-1], [1,0,-1,1], [1,0,-1,-1],
+            [-1,0,1,1], [-1,0,1,-1], [-1,0,-1,1], [-1,0,-1,-1],
+            [1,1,0,1], [1,1,0,-1], [1,-1,0,1], [1,-1,0,-1],
+            [-1,1,0,1], [-1,1,0,-1], [-1,-1,0,1], [-1,-1,0,-1],
+            [1,1,1,0], [1,1,-1,0], [1,-1,1,0], [1,-1,-1,0],
+            [-1,1,1,0], [-1,1,-1,0], [-1,-1,1,0], [-1,-1,-1,0]
+        ]
+        
+        # Initialize permutation table
+        self.p = list(range(256))
+        rng.shuffle(self.p)
+        self.p = self.p * 2
+
+        # NumPy copies of the lookup tables for whole-grid evaluation
+        self.perm = np.array(self.p, dtype=np.int64)
+        self.grad3_array = np.array(self.grad3, dtype=np.float64)
+        
+        # Skewing and unskewing factors for 2D
+        self.F2 = 0.5 * (math.sqrt(3.0) - 1.0)
+        self.G2 = (3.0 - math.sqrt(3.0)) / 6.0
+        
+        # Skewing and unskewing factors for 3D
+        self.F3 = 1.0 / 3.0
+        self.G3 = 1.0 / 6.0
+        
+        # Skewing and unskewing factors for 4D
+        self.F4 = (math.sqrt(5.0) - 1.0) / 4.0
+        self.G4 = (5.0 - math.sqrt(5.0)) / 20.0
+
+    def dot2(self, g, x, y):
+        return g[0]*x + g[1]*y
+
+    def dot3(self, g, x, y, z):
+        return g[0]*x + g[1]*y + g[2]*z
+
+    def dot4(self, g, x, y, z, w):
+        return g[0]*x + g[1]*y + g[2]*z + g[3]*w
+
+    def noise2d(self, xin, yin):
+        # Skew the input space to determine which simplex cell we're in
+        s = (xin + yin) * self.F2
+        i = int(xin + s)
+        j = int(yin + s)
+        
+        t = (i + j) * self.G2
+        X0 = i - t
+        Y0 = j - t
+        x0 = xin - X0
+        y0 = yin - Y0
+        
+        # For the 2D case, the simplex shape is an equilateral triangle.
+        # Determine which simplex we are in.
+        i1, j1 = 0, 1
+        if x0 > y0:
+            i1, j1 = 1, 0
+            
+        # A step of (1,0) in (i,j) means a step of (1-c,-c) in (x,y), and
+        # a step of (0,1) in (i,j) means a step of (-c,1-c) in (x,y), where
+        # c = (3-sqrt(3))/6
+        x1 = x0 - i1 + self.G2
+        y1 = y0 - j1 + self.G2
+        x2 = x0 - 1.0 + 2.0 * self.G2
+        y2 = y0 - 1.0 + 2.0 * self.G2
+        
+        # Work out the hashed gradient indices of the three simplex corners
+        ii = i & 255
+        jj = j & 255
+        gi0 = self.p[ii + self.p[jj]] % 12
+        gi1 = self.p[ii + i1 + self.p[jj + j1]] % 12
+        gi2 = self.p[ii + 1 + self.p[jj + 1]] % 12
+        
+        # Calculate the contribution from the three corners
+        n0, n1, n2 = 0, 0, 0
+        
+        # Calculate the contribution from the three corners
+        t0 = 0.5 - x0*x0 - y0*y0
+        if t0 >= 0:
+            t0 *= t0
+            n0 = t0 * t0 * self.dot2(self.grad3[gi0], x0, y0)
+            
+        t1 = 0.5 - x1*x1 - y1*y1
+        if t1 >= 0:
+            t1 *= t1
+            n1 = t1 * t1 * self.dot2(self.grad3[gi1], x1, y1)
+            
+        t2 = 0.5 - x2*x2 - y2*y2
+        if t2 >= 0:
+            t2 *= t2
+            n2 = t2 * t2 * self.dot2(self.grad3[gi2], x2, y2)
+            
+        # Add contributions from each corner to get the final noise value.
+        # The result is scaled to return values in the interval [-1,1].
+        return 70.0 * (n0 + n1 + n2)
+
+    def noise2d_grid(self, xs, ys):
+        """
+        Evaluates 2D simplex noise over whole arrays of coordinates.
+
+        Performs the same steps as noise2d element-wise (including its
+        truncating cell lookup), so the result matches the scalar version
+        within float tolerance.
+
+        Args:
+            xs (array-like): X coordinates.
+            ys (array-like): Y coordinates, broadcastable against xs.
+
+        Returns:
+            np.ndarray: float64 noise values in [-1, 1] with the broadcast shape.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        shape = np.broadcast_shapes(xs.shape, ys.shape)
+        xs, ys = np.broadcast_to(xs, shape), np.broadcast_to(ys, shape)
+
+        if _noise_backend == "numba" and xs.ndim == 2:
+            out = np.empty(xs.shape, dtype=np.float64)
+            _noise2d_grid_compiled(self.perm, self.grad3_array, xs, ys, out)
+            return out
+
+        # Skew the input space to determine which simplex cell we're in
+        s = (xs + ys) * self.F2
+        i = (xs + s).astype(np.int64)  # Truncates toward zero like int()
+        j = (ys + s).astype(np.int64)
+
+        t = (i + j) * self.G2
+        x0 = xs - (i - t)
+        y0 = ys - (j - t)
+
+        # Upper or lower triangle of the cell
+        i1 = (x0 > y0).astype(np.int64)
+        j1 = 1 - i1
+
+        x1 = x0 - i1 + self.G2
+        y1 = y0 - j1 + self.G2
+        x2 = x0 - 1.0 + 2.0 * self.G2
+        y2 = y0 - 1.0 + 2.0 * self.G2
+
+        # Hashed gradient indices of the three simplex corners
+        perm = self.perm
+        ii = i & 255
+        jj = j & 255
+        gi0 = perm[ii + perm[jj]] % 12
+        gi1 = perm[ii + i1 + perm[jj + j1]] % 12
+        gi2 = perm[ii + 1 + perm[jj + 1]] % 12
+
+        n0 = self._corner_grid(gi0, x0, y0)
+        n1 = self._corner_grid(gi1, x1, y1)
+        n2 = self._corner_grid(gi2, x2, y2)
+
+        return 70.0 * (n0 + n1 + n2)
+
+    def _corner_grid(self, gi, x, y):
+        """Contribution of one simplex corner, masked to zero outside its radius."""
+        g = self.grad3_array[gi]
+        t = 0.5 - x*x - y*y
+        t = np.where(t >= 0, t, 0.0)
+        t *= t
+        return t * t * (g[..., 0]*x + g[..., 1]*y)
+
+    def noise4d(self, x, y, z, w):
+        # Placeholder for 4D noise
+        return 0.0
+
+    def simplexNoise(self, type, size, octaves, persistence, lacunarity, scale, x, y):
+        if type == NoiseTypeEnum.PERLINNOISE:
+            return self.noise2d(x/scale, y/scale)
+        elif type == NoiseTypeEnum.FRACTALNOISE:
+            total = 0
+            frequency = 1.0
+            amplitude = 1.0
+            maxValue = 0
+            
+            for i in range(octaves):
+                total += self.noise2d((x/scale) * frequency, (y/scale) * frequency) * amplitude
+                maxValue += amplitude
+                amplitude *= persistence
+                frequency *= lacunarity
+                
+            return total / maxValue
+        elif type == NoiseTypeEnum.TURBULENCE:
+            total = 0
+            frequency = 1.0
+            amplitude = 1.0
+            maxValue = 0
+            
+            for i in range(octaves):
+                total += abs(self.noise2d((x/scale) * frequency, (y/scale) * frequency)) * amplitude
+                maxValue += amplitude
+                amplitude *= persistence
+                frequency *= lacunarity
+                
+            return total / maxValue
+        return 0.0
+
+    def simplexNoiseGrid(self, type, octaves, persistence, lacunarity, scale, xs, ys, out=None):
+        """
+        Batched counterpart of simplexNoise over whole coordinate grids.
+
+        The octave sum is accumulated into a single float32 buffer that is
+        reused across octaves, and the amplitude normalization is computed
+        once up front instead of per pixel.
+
+        Args:
+            type (int): A NoiseTypeEnum value.
+            octaves (int): Number of octaves for fractal and turbulence noise.
+            persistence (float): Amplitude multiplier between octaves.
+            lacunarity (float): Frequency multiplier between octaves.
+            scale (float): Divisor applied to the coordinates.
+            xs (array-like): X coordinates.
+            ys (array-like): Y coordinates, broadcastable against xs.
+            out (np.ndarray): Optional float32 buffer of the broadcast shape.
+
+        Returns:
+            np.ndarray: The float32 noise field.
+        """
+        xs = np.asarray(xs, dtype=np.float64) / scale
+        ys = np.asarray(ys, dtype=np.float64) / scale
+        shape = np.broadcast_shapes(xs.shape, ys.shape)
+        if out is None:
+            out = np.empty(shape, dtype=np.float32)
+
+        if type == NoiseTypeEnum.PERLINNOISE:
+            out[...] = self.noise2d_grid(xs, ys)
+            return out
+        if type not in (NoiseTypeEnum.FRACTALNOISE, NoiseTypeEnum.TURBULENCE):
+            out.fill(0.0)
+            return out
+
+        # Per-octave frequency and amplitude, stepped exactly as simplexNoise does
+        frequencies, amplitudes = [], []
+        frequency, amplitude, max_value = 1.0, 1.0, 0
+        for _ in range(octaves):
+            frequencies.append(frequency)
+            amplitudes.append(amplitude)
+            max_value += amplitude
+            amplitude *= persistence
+            frequency *= lacunarity
+
+        if _noise_backend == "numba" and len(shape) == 2:
+            xs, ys = np.broadcast_to(xs, shape), np.broadcast_to(ys, shape)
+            _octave_grid_compiled(self.perm, self.grad3_array, xs, ys,
+                                  np.array(frequencies), np.array(amplitudes),
+                                  max_value, type == NoiseTypeEnum.TURBULENCE, out)
+            return out
+
+        out.fill(0.0)
+        for frequency, amplitude in zip(frequencies, amplitudes):
+            octave = self.noise2d_grid(xs * frequency, ys * frequency)
+            if type == NoiseTypeEnum.TURBULENCE:
+                np.abs(octave, out=octave)
+            octave *= amplitude
+            out += octave
+
+        out /= max_value
+        return out
+
+@lru_cache(maxsize=32)
+def get_simplex_noise(seed):
+    """
+    Returns a shared SimplexNoise instance for a seed.
+
+    Instances are kept in a bounded LRU cache, so repeated previews and
+    chunk tasks with the same seed skip rebuilding the permutation and
+    gradient tables. Callers must treat the returned instance as read-only.
+
+    Args:
+        seed (int): The seed for the permutation table.
+
+    Returns:
+        SimplexNoise: The cached noise instance.
+    """
+    return SimplexNoise(seed)
+
+class TextureGenerator:
+    def __init__(self, seed=None):
+        self.noise = get_simplex_noise(seed) if seed is not None else SimplexNoise()
+        self.terrain_type = "mountains"
+        self.terrain_colored = True
+        self.terrain_shadow = True
+        self.terrain_shadow_x = -1400.0
+        self.terrain_shadow_y = -1400.0
+
+    @property
+    def backend(self):
+        """Name of the noise backend currently in use ("numba" or "numpy")."""
+        return get_noise_backend()
+
+    @staticmethod
+    def select_backend(name=None):
+        """
+        Selects the noise backend for all generators, including the worker pool's.
+
+        Args:
+            name (str): "numba" or "numpy"; None picks the fastest available one.
+
+        Returns:
+            str: The backend that is now active.
+        """
+        return set_noise_backend(name)
+
+    def generate_terrain(self, size, persistence, scale, seed, min_height, 
+                         sun_position=None, shadow_strength=0.5, colors=None):
+        """
+        Generates a terrain heightmap with optional shadows and colors.
+
+        Args:
+            size (int): The size of the terrain (width and height).
+            persistence (float): Controls the amplitude of successive octaves.
+            scale (float): Controls the frequency of the noise.
+            seed (int): The seed for random noise generation.
+            min_height (float): The minimum height value.
+            sun_position (list): The position of the sun for shadow generation.
+            shadow_strength (float): The strength of the shadows.
+            colors (list): A list of colors for terrain coloring.
+
+        Returns:
+            PIL.Image: The generated terrain as an image.
+        """
+        # Generate base heightmap
+        if self.terrain_type == "mountains":
+            height_data = self._generate_mountain_terrain(size, persistence, scale, seed, min_height)
+        elif self.terrain_type == "sand":
+            height_data = self._generate_sand_terrain(size, persistence, scale, seed, min_height)
+        else:
+            raise ValueError(f"Unknown terrain type: {self.terrain_type}")
+
+        # Generate shadow if enabled
+        shadow_data = None
+        if self.terrain_shadow and sun_position is not None:
+            shadow_data = self._generate_shadow(size, sun_position, shadow_strength, height_data)
+
+        # Generate color if enabled
+        color_data = None
+        if self.terrain_colored and colors is not None:
+            color_data = self._generate_color(size, colors, height_data)
+
+        # Combine all layers
+        if color_data is not None and shadow_data is not None:
+            final_data = (color_data * (shadow_data[:, :, np.newaxis] / 255)).astype(np.uint8)
+        elif color_data is not None:
+            final_data = color_data
+        elif shadow_data is not None:
+            final_data = np.stack([shadow_data] * 3, axis=-1).astype(np.uint8)
+        else:
+            final_data = np.stack([height_data] * 3, axis=-1).astype(np.uint8)
+
+        return Image.fromarray(final_data)
+
+    def _generate_mountain_terrain(self, size, persistence, scale, seed, min_height):
+        """
+        Generates a heightmap for mountain terrain.
+
+        Args:
+            size (int): The size of the terrain (width and height).
+            persistence (float): Controls the amplitude of successive octaves.
+            scale (float): Controls the frequency of the noise.
+            seed (int): The seed for random noise generation.
+            min_height (float): The minimum height value.
+
+        Returns:
+            np.ndarray: A 2D array representing the heightmap.
+        """
+        noise = get_simplex_noise(seed)
+        coords = np.arange(size, dtype=np.float64)
+
+        height = noise.simplexNoiseGrid(
+            type=NoiseTypeEnum.FRACTALNOISE,
+            octaves=7,
+            persistence=persistence,
+            lacunarity=2.0,
+            scale=scale,
+            xs=coords[np.newaxis, :],
+            ys=coords[:, np.newaxis]
+        )
+        height = np.maximum(height * (1 + (1 - min_height / 4)) - min_height, 0)
+        heightmap = height ** 2
+
+        # Normalize to [0, 255]
+        heightmap = (heightmap - heightmap.min()) / (heightmap.max() - heightmap.min()) * 255
+        return heightmap.astype(np.uint8)
+
+    def _generate_sand_terrain(self, size, persistence, scale, seed, min_height):
+        """
+        Generates a heightmap for sand terrain.
+
+        Args:
+            size (int): The size of the terrain (width and height).
+            persistence (float): Controls the amplitude of successive octaves.
+            scale (float): Controls the frequency of the noise.
+            seed (int): The seed for random noise generation.
+            min_height (float): The minimum height value.
+
+        Returns:
+            np.ndarray: A 2D array representing the heightmap.
+        """
+        noise = get_simplex_noise(seed)
+        coords = np.arange(size, dtype=np.float64)
+
+        height = noise.simplexNoiseGrid(
+            type=NoiseTypeEnum.FRACTALNOISE,
+            octaves=7,
+            persistence=persistence,
+            lacunarity=2.0,
+            scale=scale,
+            xs=coords[np.newaxis, :],
+            ys=coords[:, np.newaxis]
+        )
+        height = np.maximum(height * (1 + (1 - min_height / 4)) - min_height, 0)
+        heightmap = height ** 2
+
+        # Normalize to [0, 255]
+        heightmap = (heightmap - heightmap.min()) / (heightmap.max() - heightmap.min()) * 255
+        return heightmap.astype(np.uint8)
+
+    def _generate_shadow(self, size, sun_position, shadow_strength, height_data):
+        """
+        Generates shadows for the terrain based on the sun position.
+
+        Args:
+            size (int): The size of the terrain (width and height).
+            sun_position (list): The position of the sun [x, y, z].
+            shadow_strength (float): The strength of the shadows.
+            height_data (np.ndarray): The heightmap data.
+
+        Returns:
+            np.ndarray: A 2D array representing the shadow map.
+        """
+        shadow_map = np.full((size, size), 255, dtype=np.uint8)
+        sun_x, sun_y, sun_z = sun_position
+
+        for y in range(size):
+            for x in range(size):
+                dx = x - sun_x
+                dy = y - sun_y
+                dz = sun_z - height_data[y, x]
+
+                if dx == 0 and dy == 0:
+                    continue
+
+                distance = math.sqrt(dx ** 2 + dy ** 2)
+                shadow = max(0, 255 - shadow_strength * (dz / distance))
+                shadow_map[y, x] = min(shadow_map[y, x], shadow)
+
+        return shadow_map
+
+    def _generate_color(self, size, colors, height_data):
+        """
+        Maps height values to colors.
+
+        Args:
+            size (int): The size of the terrain (width and height).
+            colors (list): A list of colors and their corresponding height percentages.
+            height_data (np.ndarray): The heightmap data.
+
+        Returns:
+            np.ndarray: A 3D array representing the colored terrain.
+        """
+        color_data = np.zeros((size, size, 3), dtype=np.uint8)
+
+        for y in range(size):
+            for x in range(size):
+                v = height_data[y, x] / 255
+
+                if colors[0][1] > v:
+                    color_data[y, x] = colors[0][0]
+                else:
+                    for col in range(1, len(colors)):
+                        if colors[col][1] > v:
+                            per = 1 - (v - colors[col - 1][1]) / (colors[col][1] - colors[col - 1][1])
+                            color_data[y, x] = (
+                                per * np.array(colors[col - 1][0]) +
+                                (1.0 - per) * np.array(colors[col][0])
+                            ).astype(np.uint8)
+                            break
+
+                if v > colors[-1][1]:
+                    color_data[y, x] = colors[-1][0]
+
+        return color_data
+
+def main():
+    # Example usage
+    generator = TextureGenerator(seed=42)
+    
+    # Generate mountain terrain
+    img = generator.generate_terrain(
+        size=512,
+        persistence=0.6,
+        scale=150.0,
+        seed=42,
+        min_height=0.3,
+        sun_position=[-1400.0, -1400.0, 255],
+        shadow_strength=0.5,
+        colors=[
+            [(180, 140, 100), 0.3],  # Sand
+            [(34, 139, 34), 0.6],    # Grass
+            [(100, 100, 100), 0.85], # Rock
+            [(255, 255, 255), 1.0]   # Snow
+        ]
+    )
+    
+    # Save the image
+    img.save("terrain_output.png")
+    print("Terrain generated and saved as terrain_output.png")
+
+if __name__ == "__main__":
+    main() 
\ No newline at end of file
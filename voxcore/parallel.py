@@ -0,0 +1,334 @@
+"""
+Shared worker pool and tiled parallel execution for the generation pipeline.
+
+Jobs are split into tiles that workers write straight into a shared-memory
+output array. With a single worker everything runs in-process instead.
+
+Work started inside cancellable() stops at the next check_cancelled() once
+its check reports the job is stale; the tile loops here, the preview and the
+grass map check between tiles and rows.
+"""
+import importlib.util
+import os
+import time
+import threading
+import tracemalloc
+import weakref
+import multiprocessing
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from voxcore.memory import start_worker_tracing, worker_memory
+from voxcore.timing import add_worker_spans, current_timer
+
+
+def _default_worker_count():
+    """Worker count from the VOXMAPPER_WORKERS environment variable, else one per core."""
+    value = os.environ.get("VOXMAPPER_WORKERS", "").strip()
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            print(f"Ignoring invalid VOXMAPPER_WORKERS={value!r}")
+    return multiprocessing.cpu_count()
+
+# Worker processes in the shared pool (see set_process_pool_workers)
+PROCESS_POOL_WORKERS = _default_worker_count()
+
+# Parallel jobs are cut into square tiles between these sizes, aiming for at
+# least TILES_PER_WORKER tiles per worker so idle workers can pick up slack
+PARALLEL_TILE_MIN = 32
+PARALLEL_TILE_MAX = 256
+TILES_PER_WORKER = 4
+
+# Print a timing summary after each parallel job when this is set
+TILE_TIMINGS = bool(os.environ.get("VOXMAPPER_TILE_TIMINGS"))
+
+# Timings of the most recent parallel job, see TileReport
+last_tile_report = None
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+# Noise backend the pool's workers were spawned with (see noise.set_noise_backend)
+_process_pool_backend = None
+
+# Set in pool workers, which report their memory use with each task
+_in_pool_worker = False
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    """Raised by check_cancelled() once the job running on this thread is stale."""
+
+
+@contextmanager
+def cancellable(is_cancelled):
+    """Run a block on this thread as a job that stops once is_cancelled() returns True."""
+    previous = getattr(_local, "is_cancelled", None)
+    _local.is_cancelled = is_cancelled
+    try:
+        yield
+    finally:
+        _local.is_cancelled = previous
+
+def check_cancelled():
+    """Raise JobCancelled if the enclosing cancellable() job is stale; otherwise do nothing."""
+    is_cancelled = getattr(_local, "is_cancelled", None)
+    if is_cancelled is not None and is_cancelled():
+        raise JobCancelled()
+
+def _worker_thread_count(workers):
+    """Numba threads per pool worker: the cores split between the workers."""
+    return max(1, multiprocessing.cpu_count() // workers)
+
+def _uses_numba(backend):
+    """Whether workers started with this VOXMAPPER_NOISE_BACKEND value select the numba backend."""
+    if backend is None or not backend.strip():
+        return importlib.util.find_spec("numba") is not None
+    return backend.strip().lower() == "numba"
+
+def _mp_worker_initializer(workers, backend):
+    """
+    Prevent worker processes from capturing keyboard interrupts, limit their
+    Numba kernels to their share of the cores, and start memory tracing if enabled.
+
+    numba is only imported under the numba backend, so NumPy workers start
+    without it (see voxcore/__init__.py).
+    """
+    global _in_pool_worker
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _in_pool_worker = True
+
+    # Every parallel kernel would otherwise start a thread per core in every worker
+    if _uses_numba(backend):
+        from voxcore.noise import numba
+        if numba is not None:
+            numba.set_num_threads(min(_worker_thread_count(workers), numba.config.NUMBA_NUM_THREADS))
+    start_worker_tracing()
+
+def _task_memory():
+    """Memory use to report with a task: only from pool workers, whose peaks are their own."""
+    return worker_memory() if _in_pool_worker else None
+
+def _reset_task_peak():
+    if _in_pool_worker and tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+def get_process_pool():
+    """
+    Return the long-lived worker pool shared by all parallel jobs, starting it
+    on first use. Workers read the noise backend from the environment when they
+    start, so the pool is replaced after the backend changes.
+    """
+    global _process_pool, _process_pool_backend
+    backend = os.environ.get("VOXMAPPER_NOISE_BACKEND")
+    old_pool = None
+    with _process_pool_lock:
+        if _process_pool is not None and backend != _process_pool_backend:
+            old_pool, _process_pool = _process_pool, None
+        if _process_pool is None:
+            ctx = multiprocessing.get_context("spawn")  # Use spawn method for Windows compatibility
+            _process_pool = ctx.Pool(processes=PROCESS_POOL_WORKERS, initializer=_mp_worker_initializer,
+                                     initargs=(PROCESS_POOL_WORKERS, backend))
+            _process_pool_backend = backend
+        pool = _process_pool
+    if old_pool is not None:
+        old_pool.close()
+    return pool
+
+def start_process_pool():
+    """Warm up the shared pool on a background thread so the first job doesn't pay for it."""
+    if PROCESS_POOL_WORKERS > 1:
+        threading.Thread(target=get_process_pool, daemon=True).start()
+
+def set_process_pool_workers(count):
+    """
+    Resize the shared pool. Jobs already queued finish on the old workers;
+    the next job starts a pool with the new size.
+
+    Args:
+        count (int): Worker processes to use, or None for one per core.
+    """
+    global PROCESS_POOL_WORKERS, _process_pool
+    count = multiprocessing.cpu_count() if count is None else max(1, int(count))
+    with _process_pool_lock:
+        if count == PROCESS_POOL_WORKERS:
+            return
+        PROCESS_POOL_WORKERS = count
+        old_pool, _process_pool = _process_pool, None
+    if old_pool is not None:
+        old_pool.close()
+
+def _create_shared_array(shape, dtype):
+    """Allocate an ndarray backed by shared memory; returns (array, block name).
+
+    The block is released once the array and every view of it are gone.
+    """
+    nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    weakref.finalize(array, _release_shared_memory, shm)
+    return array, shm.name
+
+def _release_shared_memory(shm):
+    shm.close()
+    shm.unlink()
+
+class TileReport:
+    """Per-tile timings of one parallel job, for comparing worker counts and tile sizes."""
+
+    def __init__(self, label, shape, tile_size, workers):
+        self.label = label
+        self.shape = shape
+        self.tile_size = tile_size
+        self.workers = workers
+        self.tiles = []  # (start_row, start_col, seconds, worker pid) in completion order
+        self.wall_time = 0.0
+
+    def add(self, bounds, seconds, pid):
+        self.tiles.append((bounds[0], bounds[2], seconds, pid))
+
+    @property
+    def busy_time(self):
+        """Seconds spent inside tile functions, summed over all workers."""
+        return sum(t[2] for t in self.tiles)
+
+    @property
+    def speedup(self):
+        """Busy time over wall time: how many workers were effectively kept busy."""
+        return self.busy_time / self.wall_time if self.wall_time > 0 else 0.0
+
+    def summary(self):
+        slowest = max((t[2] for t in self.tiles), default=0.0)
+        used = len(set(t[3] for t in self.tiles))
+        return (f"{self.label}: {len(self.tiles)} tiles of {self.tile_size}px on {used}/{self.workers} workers, "
+                f"{self.wall_time:.2f}s wall, {self.busy_time:.2f}s busy ({self.speedup:.1f}x), "
+                f"slowest tile {slowest:.3f}s")
+
+def _parallel_tile_size(shape, workers):
+    """Largest power-of-two tile giving every worker TILES_PER_WORKER tiles."""
+    tile = PARALLEL_TILE_MAX
+    while tile > PARALLEL_TILE_MIN:
+        count = -(-shape[0] // tile) * -(-shape[1] // tile)
+        if count >= workers * TILES_PER_WORKER:
+            break
+        tile //= 2
+    return tile
+
+def _run_tile(func, out, bounds, args, origin):
+    """Compute one tile into out; returns (bounds, seconds, pid, start time, memory) for the TileReport."""
+    start_row, end_row, start_col, end_col = bounds
+    row0, col0 = origin
+    _reset_task_peak()
+    start = time.time()
+    started = time.perf_counter()
+    out[start_row - row0:end_row - row0, start_col - col0:end_col - col0] = \
+        func(start_row, end_row, start_col, end_col, *args)
+    return bounds, time.perf_counter() - started, os.getpid(), start, _task_memory()
+
+def _shared_tile_task(task):
+    """Pool task: run func on one tile and write it straight into the parent's shared array."""
+    func, name, shape, dtype, bounds, args, origin = task
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        out = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        result = _run_tile(func, out, bounds, args, origin)
+        del out
+    finally:
+        shm.close()
+    return result
+
+def run_parallel_tiles(func, args, shape, dtype=np.float32, label=None, origin=(0, 0)):
+    """
+    Split a 2D job into small tiles and hand them to the shared pool as workers
+    free up, gathering the output in shared memory.
+
+    Args:
+        func (callable): Picklable function called as
+            func(start_row, end_row, start_col, end_col, *args), returning that tile.
+        args (tuple): Extra arguments passed to every call.
+        shape (tuple): Shape of the full output array.
+        dtype: Output dtype.
+        label (str): Name used in the timing report; defaults to func's name.
+        origin (tuple): (row, col) of the output's first element in the full
+            image; func always receives full-image coordinates.
+
+    Returns:
+        np.ndarray: The full output; with several workers it wraps the shared
+        block without a copy.
+    """
+    global last_tile_report
+    workers = PROCESS_POOL_WORKERS
+    tile_size = _parallel_tile_size(shape, workers)
+    height, width = shape[:2]
+    row0, col0 = origin
+    tiles = [
+        (row0 + y, row0 + min(y + tile_size, height), col0 + x, col0 + min(x + tile_size, width))
+        for y in range(0, height, tile_size)
+        for x in range(0, width, tile_size)
+    ]
+
+    report = TileReport(label or func.__name__, shape, tile_size, workers)
+    started = time.perf_counter()
+    if workers == 1:
+        out = np.empty(shape, dtype=dtype)
+        results = (_run_tile(func, out, bounds, args, origin) for bounds in tiles)
+    else:
+        out, name = _create_shared_array(shape, dtype)
+        results = get_process_pool().imap_unordered(
+            _shared_tile_task, [(func, name, shape, dtype, bounds, args, origin) for bounds in tiles])
+    spans = []
+    # A cancelled pool job abandons its results; the queued tiles still run
+    for bounds, seconds, pid, start, memory in results:
+        check_cancelled()
+        report.add(bounds, seconds, pid)
+        spans.append((start, seconds, pid, memory))
+    report.wall_time = time.perf_counter() - started
+    add_worker_spans(f"{report.label} tile", spans)
+
+    last_tile_report = report
+    if TILE_TIMINGS:
+        print(report.summary())
+    return out
+
+def _timed_task(task):
+    """Pool task for map_tasks: func(item) plus its (start, seconds, pid, memory) span."""
+    func, item = task
+    _reset_task_peak()
+    start = time.time()
+    started = time.perf_counter()
+    result = func(item)
+    return result, (start, time.perf_counter() - started, os.getpid(), _task_memory())
+
+def map_tasks(func, items, label=None):
+    """
+    Like the builtin map, returning a list, but spread over the shared pool
+    when it has several workers. Inside a timed job every call is recorded
+    as a worker span named label (func's name by default).
+    """
+    if current_timer() is None:
+        if PROCESS_POOL_WORKERS == 1:
+            return list(map(func, items))
+        return get_process_pool().map(func, items)
+
+    tasks = [(func, item) for item in items]
+    if PROCESS_POOL_WORKERS == 1:
+        timed = list(map(_timed_task, tasks))
+    else:
+        timed = get_process_pool().map(_timed_task, tasks)
+    add_worker_spans(label or func.__name__, [span for _, span in timed])
+    return [result for result, _ in timed]
+
+def shutdown_process_pool():
+    """Stop the shared pool's workers; jobs still running are abandoned."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.terminate()
+            _process_pool.join()
+            _process_pool = None
@@ -0,0 +1,276 @@
+"""
+Golden-image parity harness: proof that a backend or chunking strategy still
+produces the same terrain.
+
+    python voxmapper_parity.py --update                    # write the references
+    python voxmapper_parity.py                             # compare against them
+    python voxmapper_parity.py --backend numpy --workers 1  # ... with another setup
+    python voxmapper_parity.py --band-rows 37 -k canyons
+    python voxmapper_parity.py --size 512                   # only one map size
+
+A fixed set of presets (plain noise types, an off-centre focus, canyons,
+rivers, vignette, noise grass, landmass and the grass map) is rendered through every path that
+should agree: the serial preview sampler and the parallel tiled generator
+for the raw noise, the in-memory and the streamed export for the heightmap,
+and the single-process and pool-tiled grass map. Every render is compared
+with the golden reference of its output using per-pixel tolerances; each
+failure is written as a diff image (the reference in grey, pixels over the
+tolerance in red). Write the references with the trusted setup, then switch backend,
+worker count or band size and run again. The worker pool is checked to run
+the selected backend before anything is rendered. Every case runs at 256px and
+at 320px by default, so agreement is not tied to the default map size.
+"""
+import argparse
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+
+from voxcore import parallel
+from voxcore.grass import create_grass_map_data
+from voxcore.noise import NOISE_BACKENDS, get_noise_backend, set_noise_backend
+from voxcore.pipeline import PIPELINE_VERSION, generate_full_noise_data
+from voxcore.postprocess import create_heightmap
+from voxcore.presets import make_vars
+from voxcore.preview import generate_preview_noise
+from voxcore.streaming import STREAM_BAND_ROWS, export_heightmap_streaming
+
+DEFAULT_SIZES = (256, 320)
+DEFAULT_GOLDEN_DIR = "parity_golden"
+DEFAULT_DIFF_DIR = "parity_diffs"
+
+
+@dataclass(frozen=True)
+class Tolerance:
+    """Pixels may differ by up to atol; at most max_fraction of them may differ by more."""
+    atol: float
+    max_fraction: float = 0.0
+
+
+# Per output: float noise allows for backend rounding, 8-bit images for one step
+TOLERANCES = {
+    "noise": Tolerance(1e-5),
+    "heightmap": Tolerance(1),
+    "grass": Tolerance(0),
+}
+
+
+def _render_noise_serial(vars_dict, size, options):
+    # TextureGeneratorGUI._generate_noise_data
+    return generate_preview_noise(size, vars_dict)
+
+
+def _render_noise_parallel(vars_dict, size, options):
+    # TextureGeneratorGUI._generate_full_noise_data
+    return generate_full_noise_data(size, vars_dict)
+
+
+def _render_heightmap(vars_dict, size, options):
+    return create_heightmap(generate_full_noise_data(size, vars_dict), vars_dict)
+
+
+def _render_heightmap_streamed(vars_dict, size, options):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "heightmap.npy")
+        export_heightmap_streaming(vars_dict, path, band_rows=options.get("band_rows", STREAM_BAND_ROWS))
+        return np.load(path)
+
+
+def _render_grass_serial(vars_dict, size, options):
+    return create_grass_map_data(vars_dict, notify=lambda message: None, parallel=False)
+
+
+def _render_grass_parallel(vars_dict, size, options):
+    return create_grass_map_data(vars_dict, notify=lambda message: None, parallel=True)
+
+
+# render name -> (output it is compared as, function(vars_dict, size, options))
+RENDERS = {
+    "noise.serial": ("noise", _render_noise_serial),
+    "noise.parallel": ("noise", _render_noise_parallel),
+    "heightmap": ("heightmap", _render_heightmap),
+    "heightmap.streamed": ("heightmap", _render_heightmap_streamed),
+    "grass.serial": ("grass", _render_grass_serial),
+    "grass.parallel": ("grass", _render_grass_parallel),
+}
+
+NOISE_RENDERS = ("noise.serial", "noise.parallel", "heightmap", "heightmap.streamed")
+HEIGHTMAP_RENDERS = ("heightmap", "heightmap.streamed")
+
+# case name -> (preset overrides, renders); the first render of each output writes its reference
+CASES = {
+    "perlin": ({"noise_type": "perlin noise"}, NOISE_RENDERS),
+    "fractal": ({"noise_type": "fractal noise", "max_height": 0.8}, NOISE_RENDERS),
+    "turbulence": ({"noise_type": "turbulence noise", "min_height": 0.7}, NOISE_RENDERS),
+    "offcentre": ({"noise_type": "fractal noise", "focus_x": 0.37, "focus_y": 0.71}, NOISE_RENDERS),
+    "canyons": ({"noise_type": "fractal noise", "canyon_strength": 0.6, "canyon_count": 3,
+                 "canyon_branch_density": 0.3}, HEIGHTMAP_RENDERS),
+    "rivers": ({"noise_type": "fractal noise", "river_strength": 0.8, "river_threshold": 0.2},
+               HEIGHTMAP_RENDERS),
+    "vignette": ({"noise_type": "perlin noise", "vignette_strength": 0.5, "vignette_radius": 0.4},
+                 HEIGHTMAP_RENDERS),
+    "noise_grass": ({"noise_type": "perlin noise", "use_noise_grass": True, "grass_amount": 200},
+                    HEIGHTMAP_RENDERS),
+    "landmass": ({"noise_type": "landmass", "landmass_seed": 7}, ("heightmap",)),
+    "grass": ({"grass_density": 0.5, "simple_noise_amount": 0.8, "grass_seed": 3},
+              ("grass.serial", "grass.parallel")),
+}
+
+
+def case_vars(name, size):
+    overrides, _ = CASES[name]
+    vars_dict = make_vars({"noise_size": size, "landmass_size": size, "seed": 1234, **overrides})
+    # The serial render is the preview at this size, so the export zooms by
+    # size / preview_res = 1 and both snap the focus to the same pixels
+    vars_dict["preview_res"] = size
+    return vars_dict
+
+
+def _worker_noise_backend(_):
+    return get_noise_backend()
+
+
+def worker_backends():
+    """The noise backends the worker pool's processes report, one entry per task."""
+    return sorted(set(parallel.map_tasks(_worker_noise_backend, range(parallel.PROCESS_POOL_WORKERS * 4))))
+
+
+def golden_path(golden_dir, case, output, size):
+    return os.path.join(golden_dir, f"{case}.{output}.{size}.npy")
+
+
+def compare(reference, result, tolerance):
+    """Compare two renders; returns (passed, max abs difference, fraction over atol, mask over atol)."""
+    if reference.shape != result.shape:
+        return False, float("inf"), 1.0, None
+    difference = np.abs(reference.astype(np.float64) - result.astype(np.float64))
+    if difference.ndim == 3:
+        difference = difference.max(axis=2)
+    over = difference > tolerance.atol
+    fraction = float(over.mean()) if over.size else 0.0
+    return fraction <= tolerance.max_fraction, float(difference.max(initial=0.0)), fraction, over
+
+
+def diff_image(reference, over):
+    """The reference in grey with the pixels outside the tolerance in red."""
+    grey = reference.astype(np.float64)
+    if grey.ndim == 3:
+        grey = grey[:, :, 0]
+    span = grey.max() - grey.min()
+    grey = (grey - grey.min()) / span if span > 0 else np.zeros_like(grey)
+    image = np.repeat((grey * 127 + 64)[:, :, None], 3, axis=2).astype(np.uint8)
+    image[over] = (255, 0, 0)
+    return image
+
+
+def run_parity(cases, size, golden_dir, diff_dir, update=False, options=None, report=print):
+    """
+    Render the cases and compare (or, with update, store) them; returns a list
+    of result dicts, one per render.
+    """
+    options = options or {}
+    results = []
+    for case in cases:
+        vars_dict = case_vars(case, size)
+        _, renders = CASES[case]
+        updated = set()
+        for render in renders:
+            output, function = RENDERS[render]
+            array = function(vars_dict, size, options)
+            path = golden_path(golden_dir, case, output, size)
+            label = f"{case}.{render}.{size}"
+
+            if update and output not in updated:
+                os.makedirs(golden_dir, exist_ok=True)
+                np.save(path, array)
+                updated.add(output)
+                report(f"{label:<36} reference written")
+                continue
+            if not os.path.exists(path):
+                results.append({"case": case, "render": render, "size": size, "passed": False,
+                                "error": "no reference"})
+                report(f"{label:<36} MISSING reference {path} (run with --update)")
+                continue
+
+            reference = np.load(path)
+            tolerance = TOLERANCES[output]
+            passed, max_diff, fraction, over = compare(reference, array, tolerance)
+            result = {"case": case, "render": render, "size": size, "passed": passed, "max_diff": max_diff,
+                      "fraction_over": fraction}
+            if not passed and over is not None:
+                os.makedirs(diff_dir, exist_ok=True)
+                result["diff"] = os.path.join(diff_dir, f"{label}.diff.png")
+                Image.fromarray(diff_image(reference, over)).save(result["diff"])
+            elif not passed:
+                result["error"] = f"shape {array.shape} != reference {reference.shape}"
+            results.append(result)
+            status = "ok" if passed else "FAIL"
+            report(f"{label:<36} {status:<4}  max diff {max_diff:.6g}  over tolerance {fraction:.4%}"
+                   + (f"  -> {result['diff']}" if "diff" in result else ""))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="voxmapper-parity",
+                                     description="Compare voxmapper renders against golden references.")
+    parser.add_argument("--size", type=int, action="append", dest="sizes", metavar="SIZE",
+                        help="map size; may be repeated (default: "
+                             f"{', '.join(str(size) for size in DEFAULT_SIZES)})")
+    parser.add_argument("-k", "--filter", action="append", default=[], metavar="TEXT",
+                        help="only run cases whose name contains TEXT; may be repeated")
+    parser.add_argument("--golden-dir", default=DEFAULT_GOLDEN_DIR,
+                        help="directory of the reference renders (default: %(default)s)")
+    parser.add_argument("--diff-dir", default=DEFAULT_DIFF_DIR,
+                        help="directory for the diff images of failures (default: %(default)s)")
+    parser.add_argument("--update", action="store_true", help="write the references instead of comparing")
+    parser.add_argument("--backend", choices=NOISE_BACKENDS, help="noise backend to render with")
+    parser.add_argument("-w", "--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--band-rows", type=int, default=STREAM_BAND_ROWS,
+                        help="row band height of the streamed export (default: %(default)s)")
+    parser.add_argument("-o", "--output", help="also write the results as JSON")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for case, (_, renders) in CASES.items():
+            print(f"{case:<12} {', '.join(renders)}")
+        return 0
+
+    cases = [case for case in CASES if not args.filter or any(f in case for f in args.filter)]
+    if not cases:
+        parser.error("no case matches the filter")
+    if args.band_rows < 1:
+        parser.error("--band-rows must be positive")
+    sizes = args.sizes or list(DEFAULT_SIZES)
+    if min(sizes) < 1:
+        parser.error("--size must be positive")
+
+    if args.backend:
+        set_noise_backend(args.backend)
+    if args.workers:
+        parallel.set_process_pool_workers(args.workers)
+    try:
+        backends = worker_backends()
+        if backends != [get_noise_backend()]:
+            print(f"Worker pool runs the {', '.join(backends)} backend, not {get_noise_backend()}")
+            return 2
+        results = []
+        for size in sizes:
+            results += run_parity(cases, size, args.golden_dir, args.diff_dir, update=args.update,
+                                  options={"band_rows": args.band_rows})
+    finally:
+        parallel.shutdown_process_pool()
+
+    if args.output:
+        document = {"sizes": sizes, "backend": get_noise_backend(), "workers": parallel.PROCESS_POOL_WORKERS,
+                    "band_rows": args.band_rows, "pipeline_version": PIPELINE_VERSION, "results": results}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
+
+    failures = [r for r in results if not r["passed"]]
+    print(f"{len(results) - len(failures)}/{len(results)} renders match the references")
+    return 1 if failures else 0
@@ -0,0 +1,151 @@
+"""
+The export pipeline: full-resolution noise (tiled over the worker pool) or a
+landmass, followed by post-processing. Everything here takes a plain parameter
+dict (the GUI's variables plus focus_x/focus_y) so it can run headless.
+"""
+import hashlib
+import json
+
+import numpy as np
+
+from voxcore.canyons import canyon_layer_digest
+from voxcore.noise import TextureGenerator, NoiseTypeEnum
+from voxcore.landmass import generate_landmass
+from voxcore.parallel import run_parallel_tiles
+from voxcore.postprocess import create_heightmap
+from voxcore.presets import DEFAULT_VARS, coerce_value
+from voxcore.preview import focus_offset
+from voxcore.timing import stage
+
+# Bump whenever a change alters the output for the same parameters, so
+# previously exported tiles are regenerated rather than trusted
+PIPELINE_VERSION = 4
+
+# Parameters that determine the raw heights (and so their global maximum)
+NOISE_KEYS = (
+    "noise_size", "noise_type", "seed", "scale", "octaves", "persistence", "lacunarity",
+    "focus_x", "focus_y", "preview_res",
+    "landmass_size", "landmass_land_proportion", "landmass_water_level", "landmass_plain_factor",
+    "landmass_shore_height", "landmass_seed", "landmass_noise_scale", "landmass_octaves",
+)
+
+# Parameters applied on top of the raw heights by create_heightmap
+POST_KEYS = (
+    "min_height", "max_height", "vignette_strength", "vignette_radius", "special_value",
+    "grass_amount", "use_noise_grass", "grass_noise_octaves", "grass_noise_persistence",
+    "grass_noise_scale", "noise_grass_density",
+    "canyon_strength", "canyon_length", "canyon_branch_density", "canyon_count", "canyon_seed",
+    "canyon_layer_file", "river_strength", "river_threshold",
+)
+
+
+def params_digest(data):
+    """Stable SHA-1 of a JSON-serialisable structure, e.g. a parameter dict."""
+    text = json.dumps(data, sort_keys=True, separators=(",", ":"), default=float)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def normalized_params(vars_dict, keys):
+    """
+    The values of keys in vars_dict, converted to their default types so that
+    e.g. 512 and 512.0 compare equal. Missing keys are None.
+    """
+    params = {}
+    for key in keys:
+        value = vars_dict.get(key)
+        if value is not None and key in DEFAULT_VARS:
+            value = coerce_value(key, value)
+        params[key] = value
+    return params
+
+def noise_key(vars_dict):
+    """Hash of everything that affects the raw heights, including the code version."""
+    return params_digest([PIPELINE_VERSION, normalized_params(vars_dict, NOISE_KEYS)])
+
+def render_key(vars_dict):
+    """Hash of everything that affects the final heightmap, including the code version."""
+    params = normalized_params(vars_dict, NOISE_KEYS + POST_KEYS)
+    # Settings of disabled effects don't change the output
+    if params["canyon_strength"] <= 0:
+        for key in ("canyon_length", "canyon_branch_density", "canyon_count", "canyon_seed", "canyon_layer_file"):
+            params[key] = None
+    elif params["canyon_layer_file"]:
+        # A loaded layer replaces the generated network; key it by its contents
+        params["canyon_layer_file"] = canyon_layer_digest(params["canyon_layer_file"])
+        for key in ("canyon_length", "canyon_branch_density", "canyon_count", "canyon_seed"):
+            params[key] = None
+    if params["river_strength"] <= 0:
+        params["river_threshold"] = None
+    if params["vignette_strength"] <= 0:
+        params["vignette_radius"] = None
+    if not params["use_noise_grass"]:
+        for key in ("grass_noise_octaves", "grass_noise_persistence", "grass_noise_scale", "noise_grass_density"):
+            params[key] = None
+    return params_digest([PIPELINE_VERSION, params])
+
+
+def render_heightmap(vars_dict):
+    """Run the full export pipeline and return the RGB heightmap as a uint8 array."""
+    # Landmass has its own size and shaping; other noise types are tiled
+    noise_data = generate_full_noise_data(vars_dict["noise_size"], vars_dict)
+
+    # Canyons, vignette and grass are applied in create_heightmap
+    return create_heightmap(noise_data, vars_dict)
+
+def generate_full_noise_data(size, vars_dict):
+    """Generate the export-resolution noise for vars_dict as a float32 array."""
+    # Check if the requested noise type is landmass
+    if vars_dict.get("noise_type") == "landmass":
+        # Landmass generation is not currently chunkable and uses its own parameters.
+        with stage("landmass"):
+            return generate_landmass(vars_dict) # This will use vars_dict["landmass_size"], etc.
+
+    # Proceed with tile-based multiprocessing for other noise types.
+    # Pass the original size of the full image, not the potentially different landmass_size
+    with stage("noise"):
+        return run_parallel_tiles(generate_noise_chunk, (size, vars_dict),
+                                  (size, size), label="noise")
+
+def generate_noise_rows(start_row, end_row, size, vars_dict):
+    """Generate rows [start_row, end_row) of the export noise, tiled over the worker pool."""
+    with stage("noise"):
+        return run_parallel_tiles(generate_noise_chunk, (size, vars_dict),
+                                  (end_row - start_row, size), label="noise", origin=(start_row, 0))
+
+def generate_noise_chunk(start_row, end_row, start_col, end_col, size, vars_dict):
+    """Tile function for generate_full_noise_data."""
+    generator = TextureGenerator(seed=vars_dict["seed"])
+
+    noise_type = {
+        "perlin noise": NoiseTypeEnum.PERLINNOISE,
+        "fractal noise": NoiseTypeEnum.FRACTALNOISE,
+        "turbulence noise": NoiseTypeEnum.TURBULENCE
+    }[vars_dict["noise_type"]]
+
+    # Apply zoom factor to the scale
+    preview_res = vars_dict.get("preview_res", 256)  # Default preview resolution
+    zoom_factor = size / preview_res  # Scale export to match preview zoom
+    adjusted_scale = vars_dict["scale"] * zoom_factor
+
+    # Calculate the world offset: the preview's whole-pixel offset, scaled up
+    world_offset_x = focus_offset(vars_dict["focus_x"], preview_res) * zoom_factor
+    world_offset_y = focus_offset(vars_dict["focus_y"], preview_res) * zoom_factor
+
+    base_offset_x = 1000.0
+    base_offset_y = 1000.0
+
+    # Generate noise data for the whole chunk in one call
+    columns = np.arange(start_col, end_col, dtype=np.float64)
+    rows = np.arange(start_row, end_row, dtype=np.float64)
+    sample_x = base_offset_x + (columns - world_offset_x) / adjusted_scale
+    sample_y = base_offset_y + (rows - world_offset_y) / adjusted_scale
+
+    chunk = generator.noise.simplexNoiseGrid(
+        noise_type,
+        vars_dict["octaves"],
+        vars_dict["persistence"],
+        vars_dict["lacunarity"],
+        1.0,
+        sample_x[np.newaxis, :], sample_y[:, np.newaxis]
+    )
+
+    return chunk
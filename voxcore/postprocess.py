@@ -0,0 +1,138 @@
+"""
+Heightmap post-processing: height range, canyons, rivers, vignette and
+packing into the Teardown RGB layout.
+"""
+import numpy as np
+
+from voxcore.canyons import apply_canyons
+from voxcore.grass import generate_grass_noise
+from voxcore.parallel import check_cancelled
+from voxcore.rivers import apply_rivers, river_strokes
+from voxcore.timing import stage
+
+
+def create_heightmap(height_data, vars_dict):
+    """Create RGB heightmap from raw height data with proper canyon application."""
+    # The max height setting rescales against the highest raw sample
+    data_max = height_data.max() if vars_dict["max_height"] != 1.0 else None
+    return create_heightmap_rows(height_data, vars_dict, 0, height_data.shape[0], data_max)
+
+def create_heightmap_rows(height_data, vars_dict, start_row, size, data_max, canyon_strokes=None,
+                          rivers=None):
+    """
+    Post-process rows of raw height data into Teardown RGB rows.
+
+    Args:
+        height_data (np.ndarray): Raw heights for rows [start_row, start_row + len) of the map.
+        vars_dict (dict): Generation parameters.
+        start_row (int): First row of height_data within the full map.
+        size (int): Height of the full map.
+        data_max: Maximum raw height over the whole map; only needed when
+            max_height is not 1.0.
+        canyon_strokes (np.ndarray): Precomputed canyon segments, to reuse across bands.
+        rivers (np.ndarray): river_strokes of the whole map's raw heights;
+            computed here when height_data is the whole map.
+    """
+    # Rivers follow the raw terrain of the whole map
+    if rivers is None and vars_dict["river_strength"] > 0:
+        if start_row != 0 or height_data.shape[0] != size:
+            raise ValueError("River carving needs the river strokes of the whole map")
+        rivers = river_strokes(height_data, vars_dict)
+
+    # Create RGB image with height in red channel
+    heightmap = np.zeros((height_data.shape[0], height_data.shape[1], 3), dtype=np.uint8)
+
+    # Get min and max height values
+    min_height = vars_dict["min_height"]
+    max_height = vars_dict["max_height"]
+
+    with stage("height range"):
+        # Adjust height data based on min/max settings
+        if min_height != 0.0:
+            height_data = height_data + min_height
+
+        if max_height != 1.0:
+            current_max = data_max + min_height if min_height != 0.0 else data_max
+            if current_max > 0:
+                height_data = height_data * (max_height / current_max)
+
+        # Ensure values are within valid range
+        height_data = np.clip(height_data, 0.0, 1.0)
+
+    # Get necessary parameters
+    vignette_strength = vars_dict["vignette_strength"]
+    vignette_radius = vars_dict["vignette_radius"]
+
+    # Apply canyon effect
+    check_cancelled()
+    height_data = apply_canyons(height_data, vars_dict, start_row, height_data.shape[1], canyon_strokes)
+
+    # Carve rivers along the drainage network
+    check_cancelled()
+    height_data = apply_rivers(height_data, vars_dict, start_row, height_data.shape[1], rivers)
+
+    # Scale to 0-255 range AFTER canyon application
+    height_scaled = (height_data * 255).astype(np.uint8)
+
+    # Apply vignette if strength > 0
+    if vignette_strength > 0:
+        with stage("vignette"):
+            height_scaled = apply_vignette(height_scaled, vignette_strength, vignette_radius, start_row, size)
+
+    # Set channels according to Teardown format
+    heightmap[:, :, 0] = height_scaled  # Red channel = height
+
+    if vars_dict["use_noise_grass"]:
+        # Generate grass noise
+        with stage("grass noise"):
+            grass_noise = generate_grass_noise(size, height_data.shape[1], vars_dict,
+                                               start_row, start_row + height_data.shape[0])
+        heightmap[:, :, 1] = grass_noise  # Green channel = grass with noise
+    else:
+        # Use uniform grass amount
+        heightmap[:, :, 1] = vars_dict["grass_amount"]  # Green channel = grass amount
+
+    # Fill with special value
+    special_val = vars_dict["special_value"]
+    heightmap[:, :, 2] = special_val
+
+    return heightmap
+
+def apply_vignette(image, strength, radius, start_row=0, full_height=None):
+    """
+    Apply vignette effect to the image.
+
+    For a band of a larger image, pass its first row and the full image height.
+    """
+    # Support both grayscale and color images
+    if image.ndim == 2:
+        # Grayscale image
+        height, width = image.shape
+        channels = 1
+        is_gray = True
+    else:
+        # Color image
+        height, width, channels = image.shape
+        is_gray = False
+
+    if full_height is None:
+        full_height = height
+
+    # Create vignette mask
+    y, x = np.ogrid[start_row:start_row + height, :width]
+    center_x, center_y = width / 2, full_height / 2
+    # Calculate distance from center
+    distance = np.sqrt((x - center_x)**2 + (y - center_y)**2)
+    max_distance = np.sqrt(center_x**2 + center_y**2)
+    # Create vignette mask with adjustable radius
+    vignette = 1 - np.clip((distance / (max_distance * radius)), 0, 1) * strength
+    vignette = np.clip(vignette, 0, 1)
+    # Apply vignette mask
+    if is_gray:
+        # For grayscale images, directly multiply and return 2D array
+        return (image * vignette).astype(np.uint8)
+    else:
+        # For color images, apply per-channel and return image
+        for i in range(channels):
+            image[:, :, i] = (image[:, :, i] * vignette).astype(np.uint8)
+        return image
@@ -0,0 +1,155 @@
+"""
+Parameter presets: the GUI's variables as a plain dict, loadable from JSON or TOML.
+"""
+import json
+import os
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+NOISE_TYPES = ("perlin noise", "fractal noise", "turbulence noise", "landmass")
+
+# Every key of TextureGeneratorGUI.vars with its default, plus the focus point
+DEFAULT_VARS = {
+    "noise_size": 512,
+    "scale": 150.0,
+    "seed": 42,
+    "min_height": 1.0,
+    "max_height": 0.5,
+    "noise_type": "perlin noise",
+    "octaves": 7,
+    "lacunarity": 2.0,
+    "persistence": 0.6,
+    "height_scale": 255,
+    "grass_amount": 0,
+    "special_value": 0,
+    "vignette_strength": 0.0,
+    "vignette_radius": 0.5,
+    "vignette_smoothness": 0.5,
+    "landmass_size": 256,
+    "landmass_land_proportion": 0.6,
+    "landmass_water_level": 0.12,
+    "landmass_plain_factor": 2.5,
+    "landmass_shore_height": 0.05,
+    "landmass_seed": 0,
+    "landmass_noise_scale": 100.0,
+    "landmass_octaves": 6,
+    "grass_noise_type": "perlin noise",
+    "grass_octaves": 5,
+    "grass_persistence": 0.5,
+    "grass_scale": 50.0,
+    "perlin_noise_amount": 0.5,
+    "simple_noise_amount": 0.5,
+    "fractal_noise_amount": 0.5,
+    "grass_seed": 0,
+    "use_noise_grass": False,
+    "grass_noise_scale": 50.0,
+    "grass_noise_octaves": 4,
+    "grass_noise_persistence": 0.5,
+    "grass_density": 0.5,
+    "noise_grass_density": 0.5,
+    "canyon_strength": 0.0,
+    "canyon_length": 0.7,
+    "canyon_branch_density": 0.15,
+    "canyon_count": 6,
+    "canyon_seed": 42,
+    "canyon_layer_file": "",
+    "river_strength": 0.0,
+    "river_threshold": 0.5,
+    "lightness": 0.0,
+    "image_brightness": 1.0,
+    "image_contrast": 1.0,
+    "image_gamma": 1.0,
+    "image_size": 512,
+    "red_channel_value": 0.5,
+    "red_lightness": 0.5,
+    "invert_red": False,
+    "red_channel_weight": 0.299,
+    "green_channel_value": 0.5,
+    "green_lightness": 0.5,
+    "invert_green": False,
+    "green_channel_weight": 0.587,
+    "blue_channel_weight": 0.114,
+    "gaussian_blur": 0.0,
+    "grayscale_exposure": 1.0,
+    "hill_count": 600,
+    "base_radius": 16.0,
+    "radius_variation": 0.7,
+    "focus_x": 0.5,
+    "focus_y": 0.5,
+}
+
+
+def make_vars(overrides=None):
+    """
+    Return a complete parameter dict: the defaults updated with overrides.
+
+    Values are converted to the type of the default, so "512" or 512.0 both
+    become the integer 512.
+
+    Raises:
+        ValueError: For unknown keys, unconvertible values or an unknown noise type.
+    """
+    vars_dict = dict(DEFAULT_VARS)
+    for key, value in (overrides or {}).items():
+        if key not in DEFAULT_VARS:
+            raise ValueError(f"Unknown preset key: {key}")
+        vars_dict[key] = coerce_value(key, value)
+
+    if vars_dict["noise_type"] not in NOISE_TYPES:
+        raise ValueError(f"Unknown noise type: {vars_dict['noise_type']}")
+    return vars_dict
+
+
+def coerce_value(key, value):
+    default = DEFAULT_VARS[key]
+    try:
+        if isinstance(default, bool):
+            if isinstance(value, str):
+                if value.lower() in ("1", "true", "yes", "on"):
+                    return True
+                if value.lower() in ("0", "false", "no", "off"):
+                    return False
+                raise ValueError(value)
+            return bool(value)
+        if isinstance(default, int):
+            return int(float(value))
+        if isinstance(default, float):
+            return float(value)
+        return str(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid value for {key}: {value!r}") from None
+
+
+def load_preset(path):
+    """
+    Load a preset file (.json or .toml) and return the complete parameter dict.
+
+    The file holds a flat table of parameter names to values; missing keys
+    keep their defaults.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".toml":
+        if tomllib is None:
+            raise ValueError("Reading TOML presets needs Python 3.11+ or the 'tomli' package")
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: a preset must be a table of parameter names to values")
+    return make_vars(data)
+
+
+def save_preset(path, vars_dict):
+    """Write vars_dict as a JSON preset."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(vars_dict, f, indent=4, sort_keys=True)
+        f.write("\n")
@@ -0,0 +1,161 @@
+"""
+Serial noise preview: the view around the focus point, sampled on a grid of
+world-space tiles so panning and coarse-to-fine refinement reuse earlier work.
+
+The view is offset from the focus point in whole pixels (see focus_offset),
+and the export snaps its offset the same way, so the final preview pass
+shows exactly the export's samples.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from voxcore.noise import NoiseTypeEnum, TextureGenerator
+from voxcore.parallel import check_cancelled
+
+# Side length of the world-space tiles the noise preview is sampled on
+PREVIEW_TILE_SIZE = 64
+
+NOISE_TYPE_ENUMS = {
+    "perlin noise": NoiseTypeEnum.PERLINNOISE,
+    "fractal noise": NoiseTypeEnum.FRACTALNOISE,
+    "turbulence noise": NoiseTypeEnum.TURBULENCE
+}
+
+
+class NoiseTileCache:
+    """Memory-bounded LRU cache of noise preview tiles."""
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.tiles = OrderedDict()
+
+    def get(self, key):
+        """Return the cached tile for key (marking it recently used), or None."""
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        """Store a tile, evicting the least recently used ones over the budget."""
+        old_tile = self.tiles.pop(key, None)
+        if old_tile is not None:
+            self.current_bytes -= old_tile.nbytes
+        self.tiles[key] = tile
+        self.current_bytes += tile.nbytes
+
+        while self.current_bytes > self.max_bytes and len(self.tiles) > 1:
+            _, evicted = self.tiles.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+
+    def clear(self):
+        self.tiles.clear()
+        self.current_bytes = 0
+
+
+def generate_preview_noise(size, vars_dict, tile_cache=None, noise_type=None, octaves=None,
+                           persistence=None, scale=None):
+    """
+    The size x size preview of the noise around the focus point, assembled from
+    world-space tiles that are kept in tile_cache while panning and zooming.
+
+    octaves, persistence and scale override the values in vars_dict; noise_type
+    is a NoiseTypeEnum value and defaults to vars_dict's (non-landmass) type.
+    """
+    if tile_cache is None:
+        tile_cache = NoiseTileCache()
+    if noise_type is None:
+        noise_type = NOISE_TYPE_ENUMS[vars_dict["noise_type"]]
+
+    # Calculate the world offset, snapped to whole pixels so the view
+    # lines up with the world-space tile grid
+    world_offset_x = focus_offset(vars_dict["focus_x"], size)
+    world_offset_y = focus_offset(vars_dict["focus_y"], size)
+
+    # Use the exact scale value from the UI - don't apply any adjustments
+    adjusted_scale = scale if scale is not None else vars_dict["scale"]
+
+    params = (
+        vars_dict["seed"],
+        noise_type,
+        octaves if octaves is not None else vars_dict["octaves"],
+        persistence if persistence is not None else vars_dict["persistence"],
+        vars_dict["lacunarity"],
+        adjusted_scale
+    )
+
+    # Assemble the view from cached tiles; view pixel x shows world pixel x - world_offset_x
+    noise_data = np.empty((size, size), dtype=np.float32)
+    tile = PREVIEW_TILE_SIZE
+    world_x0, world_y0 = -world_offset_x, -world_offset_y
+
+    for tile_y in range(world_y0 // tile, (world_y0 + size - 1) // tile + 1):
+        for tile_x in range(world_x0 // tile, (world_x0 + size - 1) // tile + 1):
+            check_cancelled()
+            tile_data = get_noise_tile(tile_cache, params, tile_x, tile_y)
+
+            # Overlap of this tile with the view, in world pixels
+            x0 = max(tile_x * tile, world_x0)
+            x1 = min((tile_x + 1) * tile, world_x0 + size)
+            y0 = max(tile_y * tile, world_y0)
+            y1 = min((tile_y + 1) * tile, world_y0 + size)
+
+            noise_data[y0 - world_y0:y1 - world_y0, x0 - world_x0:x1 - world_x0] = \
+                tile_data[y0 - tile_y * tile:y1 - tile_y * tile, x0 - tile_x * tile:x1 - tile_x * tile]
+
+    return noise_data
+
+def focus_offset(focus, size):
+    """
+    World offset in whole pixels of a size-pixel view centred on focus
+    (clamped to [0, 1]); the export scales the offset of its preview
+    resolution, so both sample the same points.
+    """
+    return int(round((max(0.0, min(1.0, focus)) - 0.5) * size))
+
+def get_noise_tile(tile_cache, params, tile_x, tile_y):
+    """Return one world-space preview tile, computing it only on a cache miss."""
+    key = params + (tile_x, tile_y)
+    tile_data = tile_cache.get(key)
+    if tile_data is not None:
+        return tile_data
+
+    seed, noise_type, octaves, persistence, lacunarity, scale = params
+    noise = TextureGenerator(seed=seed).noise
+
+    base_offset_x = 1000.0  # Large offset to avoid zero
+    base_offset_y = 1000.0  # Large offset to avoid zero
+
+    # Sample noise with precise floating-point coordinates
+    pixels = np.arange(PREVIEW_TILE_SIZE, dtype=np.float64)
+    sample_x = base_offset_x + (tile_x * PREVIEW_TILE_SIZE + pixels) / scale
+    sample_y = base_offset_y + (tile_y * PREVIEW_TILE_SIZE + pixels) / scale
+
+    def sample(xs, ys):
+        return noise.simplexNoiseGrid(
+            noise_type,
+            octaves,
+            persistence,
+            lacunarity,
+            1.0,  # Use 1.0 as scale here since we're adjusting coordinates directly
+            xs[np.newaxis, :], ys[:, np.newaxis]
+        )
+
+    # World pixel 2k at this scale is world pixel k at half the scale, so a
+    # cached tile from the previous coarser pass already holds every other sample
+    half = PREVIEW_TILE_SIZE // 2
+    coarse_tile = tile_cache.get(params[:-1] + (scale / 2, tile_x // 2, tile_y // 2))
+
+    if coarse_tile is None:
+        tile_data = sample(sample_x, sample_y)
+    else:
+        off_x = (tile_x % 2) * half
+        off_y = (tile_y % 2) * half
+        tile_data = np.empty((PREVIEW_TILE_SIZE, PREVIEW_TILE_SIZE), dtype=np.float32)
+        tile_data[0::2, 0::2] = coarse_tile[off_y:off_y + half, off_x:off_x + half]
+        tile_data[0::2, 1::2] = sample(sample_x[1::2], sample_y[0::2])
+        tile_data[1::2, :] = sample(sample_x, sample_y[1::2])
+
+    tile_cache.put(key, tile_data)
+    return tile_data
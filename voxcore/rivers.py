@@ -0,0 +1,324 @@
+"""
+Terrain-following rivers: drainage over the raw heightfield, carved where
+enough of the map flows through.
+
+Depressions are filled with priority-flood + epsilon (Barnes et al. 2014):
+cells are flooded inward from the map edge in order of height, and a cell
+that would be a pit is raised just above the neighbour that reached it, so
+every cell has a strictly lower neighbour and all water reaches the edge.
+Each cell then drains to its steepest D8 neighbour on the filled surface,
+and the flow accumulation (the number of cells draining through each cell)
+is summed from the ridges downstream.
+
+Cells whose accumulation passes river_threshold (a percentage of the map
+area) become river segments, wider and deeper downstream, which are rasterized
+like the canyons and carved out of the heightmap. The drainage needs the
+whole map, so banded exports compute the segments once up front.
+"""
+import heapq
+from collections import deque
+
+import numpy as np
+
+from voxcore.canyons import (CANYON_LAYER_GRID, SEG_AX, SEG_AY, SEG_BX, SEG_BY, SEG_INTENSITY_A,
+                             SEG_INTENSITY_B, SEG_WIDTH_A, SEG_WIDTH_B, SEGMENT_FIELDS, rasterize_canyon_mask)
+from voxcore.noise import get_noise_backend, numba
+from voxcore.timing import stage
+
+# D8 neighbour offsets (dy, dx) and their distances
+D8_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+D8_DISTANCES = tuple(float(np.hypot(dy, dx)) for dy, dx in D8_OFFSETS)
+
+# River radius in pixels of a CANYON_LAYER_GRID map, at the threshold and at full size
+RIVER_MIN_RADIUS = 0.5
+RIVER_MAX_RADIUS = 1.5
+
+# Rivers reach full width and depth at this many times the threshold accumulation
+RIVER_FULL_RATIO = 100.0
+
+# Fraction of the height a full-strength river carves away at its deepest
+RIVER_DEPTH = 0.5
+
+
+def apply_rivers(height_data, vars_dict, start_row=0, size=None, strokes=None):
+    """
+    Carve the rivers into height_data (floats in [0, 1]) and return the result.
+
+    Args:
+        height_data (np.ndarray): The full heightmap, or rows of it starting at start_row.
+        vars_dict (dict): Generation parameters.
+        start_row (int): First row of height_data within the full map.
+        size (int): Side length of the full map; defaults to height_data's width.
+        strokes (np.ndarray): river_strokes of the full map's raw heights.
+    """
+    river_strength = vars_dict["river_strength"]
+    if river_strength <= 0 or strokes is None:
+        return height_data
+    if size is None:
+        size = height_data.shape[1]
+
+    with stage("river mask"):
+        river_mask = rasterize_canyon_mask(strokes, size, river_edge_softness(size),
+                                           start_row, start_row + height_data.shape[0])
+        return height_data * (1.0 - river_mask * (river_strength * RIVER_DEPTH))
+
+def river_edge_softness(size):
+    """Width in pixels of the soft river banks."""
+    return max(1.0, size / CANYON_LAYER_GRID)
+
+def river_strokes(heights, vars_dict):
+    """
+    The river network of a raw heightfield as an (n, SEGMENT_FIELDS) array of
+    tapered segments (see canyons.canyon_strokes), one per river cell to the
+    cell it drains into.
+    """
+    size = heights.shape[1]
+    with stage("river drainage"):
+        filled = fill_depressions(heights)
+        receivers = flow_directions(filled)
+        del filled
+        accumulation = flow_accumulation(receivers)
+
+        threshold = max(2.0, vars_dict["river_threshold"] / 100 * heights.size)
+        river = np.flatnonzero((accumulation >= threshold) & (receivers >= 0))
+        if not len(river):
+            return np.zeros((0, SEGMENT_FIELDS))
+        downstream = receivers[river]
+
+        # Width and depth grow with the log of the accumulation
+        def taper(cells):
+            return np.clip(np.log(accumulation[cells] / threshold) / np.log(RIVER_FULL_RATIO), 0.0, 1.0)
+        scale = size / CANYON_LAYER_GRID
+        segments = np.empty((len(river), SEGMENT_FIELDS))
+        segments[:, SEG_AX], segments[:, SEG_AY] = river % size, river // size
+        segments[:, SEG_BX], segments[:, SEG_BY] = downstream % size, downstream // size
+        for cells, width, intensity in ((river, SEG_WIDTH_A, SEG_INTENSITY_A),
+                                         (downstream, SEG_WIDTH_B, SEG_INTENSITY_B)):
+            amount = taper(cells)
+            segments[:, width] = 2 * scale * (RIVER_MIN_RADIUS + (RIVER_MAX_RADIUS - RIVER_MIN_RADIUS) * amount)
+            segments[:, intensity] = 0.5 + 0.5 * amount
+        return segments
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _heap_push(keys, cells, count, key, cell):
+        i = count
+        while i > 0:
+            parent = (i - 1) >> 1
+            if keys[parent] < key or (keys[parent] == key and cells[parent] < cell):
+                break
+            keys[i] = keys[parent]
+            cells[i] = cells[parent]
+            i = parent
+        keys[i] = key
+        cells[i] = cell
+        return count + 1
+
+    @numba.njit(cache=True)
+    def _heap_pop(keys, cells, count):
+        top = cells[0]
+        count -= 1
+        key = keys[count]
+        cell = cells[count]
+        i = 0
+        while True:
+            child = 2 * i + 1
+            if child >= count:
+                break
+            if child + 1 < count and (keys[child + 1] < keys[child] or
+                                      (keys[child + 1] == keys[child] and cells[child + 1] < cells[child])):
+                child += 1
+            if key < keys[child] or (key == keys[child] and cell < cells[child]):
+                break
+            keys[i] = keys[child]
+            cells[i] = cells[child]
+            i = child
+        keys[i] = key
+        cells[i] = cell
+        return top, count
+
+    @numba.njit(cache=True)
+    def _fill_compiled(filled, offsets_y, offsets_x):
+        """Priority-flood + epsilon in place, as _fill_python."""
+        rows, cols = filled.shape
+        flat = filled.ravel()
+        closed = np.zeros(rows * cols, dtype=np.bool_)
+        keys = np.empty(rows * cols, dtype=np.float64)
+        cells = np.empty(rows * cols, dtype=np.int64)
+        pit = np.empty(rows * cols, dtype=np.int64)
+        count = 0
+        for cell in range(rows * cols):
+            y = cell // cols
+            x = cell % cols
+            if y == 0 or y == rows - 1 or x == 0 or x == cols - 1:
+                closed[cell] = True
+                count = _heap_push(keys, cells, count, flat[cell], cell)
+        pit_head = 0
+        pit_tail = 0
+        while count > 0 or pit_head < pit_tail:
+            if pit_head < pit_tail:
+                cell = pit[pit_head]
+                pit_head += 1
+            else:
+                cell, count = _heap_pop(keys, cells, count)
+            y = cell // cols
+            x = cell % cols
+            raised = np.nextafter(flat[cell], np.inf)
+            for k in range(8):
+                ny = y + offsets_y[k]
+                nx = x + offsets_x[k]
+                if ny < 0 or ny >= rows or nx < 0 or nx >= cols:
+                    continue
+                neighbour = ny * cols + nx
+                if closed[neighbour]:
+                    continue
+                closed[neighbour] = True
+                if flat[neighbour] <= raised:
+                    flat[neighbour] = raised
+                    pit[pit_tail] = neighbour
+                    pit_tail += 1
+                else:
+                    count = _heap_push(keys, cells, count, flat[neighbour], neighbour)
+
+    @numba.njit(parallel=True, cache=True)
+    def _flow_directions_compiled(filled, offsets_y, offsets_x, distances, receivers):
+        """D8 flow directions, as flow_directions, row by row in parallel."""
+        rows, cols = filled.shape
+        for y in numba.prange(rows):
+            for x in range(cols):
+                best_slope = 0.0
+                best = -1
+                for k in range(8):
+                    ny = y + offsets_y[k]
+                    nx = x + offsets_x[k]
+                    if ny < 0 or ny >= rows or nx < 0 or nx >= cols:
+                        continue
+                    slope = (filled[y, x] - filled[ny, nx]) / distances[k]
+                    if slope > best_slope:
+                        best_slope = slope
+                        best = ny * cols + nx
+                receivers[y * cols + x] = best
+
+    @numba.njit(cache=True)
+    def _accumulate_compiled(receivers, accumulation):
+        """Flow accumulation, as _accumulate_numpy, from the cells nothing drains into."""
+        donors = np.zeros(len(receivers), dtype=np.int32)
+        for cell in range(len(receivers)):
+            if receivers[cell] >= 0:
+                donors[receivers[cell]] += 1
+        stack = np.empty(len(receivers), dtype=np.int64)
+        top = 0
+        for cell in range(len(receivers)):
+            if donors[cell] == 0:
+                stack[top] = cell
+                top += 1
+        while top > 0:
+            top -= 1
+            cell = stack[top]
+            target = receivers[cell]
+            if target >= 0:
+                accumulation[target] += accumulation[cell]
+                donors[target] -= 1
+                if donors[target] == 0:
+                    stack[top] = target
+                    top += 1
+
+def _fill_python(filled):
+    """
+    Priority-flood + epsilon in place: flood from the edge cells in order of
+    (height, index); a neighbour no higher than the cell that reaches it is
+    raised to the next float above it and flooded from a FIFO queue first.
+    """
+    rows, cols = filled.shape
+    flat = filled.ravel()
+    closed = np.zeros(rows * cols, dtype=bool)
+    edge = np.zeros((rows, cols), dtype=bool)
+    edge[[0, -1], :] = True
+    edge[:, [0, -1]] = True
+    border = np.flatnonzero(edge)
+    closed[border] = True
+    heap = list(zip(flat[border].tolist(), border.tolist()))
+    heapq.heapify(heap)
+    pit = deque()
+    while heap or pit:
+        cell = pit.popleft() if pit else heapq.heappop(heap)[1]
+        y, x = divmod(cell, cols)
+        raised = np.nextafter(flat[cell], np.inf)
+        for dy, dx in D8_OFFSETS:
+            ny, nx = y + dy, x + dx
+            if ny < 0 or ny >= rows or nx < 0 or nx >= cols:
+                continue
+            neighbour = ny * cols + nx
+            if closed[neighbour]:
+                continue
+            closed[neighbour] = True
+            if flat[neighbour] <= raised:
+                flat[neighbour] = raised
+                pit.append(neighbour)
+            else:
+                heapq.heappush(heap, (float(flat[neighbour]), neighbour))
+
+def fill_depressions(heights):
+    """
+    Fill the depressions of a heightfield so that every cell drains to the
+    map edge; returns the filled heights as float64.
+
+    Uses a compiled heap with the numba noise backend and heapq otherwise;
+    both flood in the same order and give the same result.
+    """
+    filled = np.array(heights, dtype=np.float64)
+    if get_noise_backend() == "numba":
+        offsets = np.array(D8_OFFSETS, dtype=np.int64)
+        _fill_compiled(filled, offsets[:, 0].copy(), offsets[:, 1].copy())
+    else:
+        _fill_python(filled)
+    return filled
+
+def flow_directions(filled):
+    """
+    D8 flow direction of every cell: the flat index of the neighbour with the
+    steepest descent, or -1 where no neighbour is lower (the outlets on the
+    map edge). Ties go to the first neighbour in D8_OFFSETS order.
+    """
+    rows, cols = filled.shape
+    if get_noise_backend() == "numba":
+        offsets = np.array(D8_OFFSETS, dtype=np.int64)
+        receivers = np.empty(rows * cols, dtype=np.int64)
+        _flow_directions_compiled(filled, offsets[:, 0].copy(), offsets[:, 1].copy(),
+                                  np.array(D8_DISTANCES), receivers)
+        return receivers
+
+    padded = np.pad(filled, 1, constant_values=np.inf)
+    best_slope = np.zeros((rows, cols))
+    best = np.full((rows, cols), -1, dtype=np.int64)
+    index = np.arange(rows * cols, dtype=np.int64).reshape(rows, cols)
+    for (dy, dx), distance in zip(D8_OFFSETS, D8_DISTANCES):
+        slope = (filled - padded[1 + dy:1 + dy + rows, 1 + dx:1 + dx + cols]) / distance
+        steeper = slope > best_slope
+        best_slope[steeper] = slope[steeper]
+        best[steeper] = (index + (dy * cols + dx))[steeper]
+    return best.ravel()
+
+def _accumulate_numpy(receivers, accumulation):
+    """
+    Flow accumulation in place, a front at a time: the cells whose donors
+    are all done pass their accumulation on to their receivers.
+    """
+    donors = np.bincount(receivers[receivers >= 0], minlength=len(receivers))
+    front = np.flatnonzero(donors == 0)
+    while len(front):
+        front = front[receivers[front] >= 0]
+        targets = receivers[front]
+        np.add.at(accumulation, targets, accumulation[front])
+        np.subtract.at(donors, targets, 1)
+        targets = np.unique(targets)
+        front = targets[donors[targets] == 0]
+
+def flow_accumulation(receivers):
+    """Number of cells (itself included) that drain through each cell, as float64."""
+    accumulation = np.ones(len(receivers))
+    if get_noise_backend() == "numba":
+        _accumulate_compiled(receivers, accumulation)
+    else:
+        _accumulate_numpy(receivers, accumulation)
+    return accumulation
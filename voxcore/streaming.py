@@ -0,0 +1,311 @@
+"""
+Out-of-core export: the heightmap is generated, post-processed and written in
+row bands, so peak memory depends on the map width rather than its area.
+
+Output goes to a PNG encoded row by row, or to a .npy file that can later be
+opened with np.load(..., mmap_mode="r").
+"""
+import os
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+
+from voxcore.canyons import canyon_strokes
+from voxcore.landmass import generate_landmass
+from voxcore.memory import BYTES_PER_PIXEL_RIVERS, estimate_export_memory, format_bytes, memory_budget
+from voxcore.pipeline import generate_noise_rows
+from voxcore.postprocess import create_heightmap_rows
+from voxcore.rivers import river_strokes
+from voxcore.timing import stage
+
+# Maps at least this large are exported in bands by default
+STREAMING_MIN_SIZE = 8192
+
+# Rows generated and written per band
+STREAM_BAND_ROWS = 256
+
+
+class PngStreamWriter:
+    """
+    Write an 8-bit greyscale or RGB PNG one band of rows at a time.
+
+    Rows use the PNG "Up" filter, which suits smooth heightmaps and is cheap
+    to apply to a whole band with NumPy.
+    """
+
+    def __init__(self, path, width, height, channels=3, compress_level=6):
+        if channels not in (1, 3):
+            raise ValueError("Only greyscale and RGB PNGs are supported")
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.rows_written = 0
+        self._previous_row = np.zeros((1, width * channels), dtype=np.uint8)
+        self._compressor = zlib.compressobj(compress_level)
+        self._file = open(path, "wb")
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        color_type = 2 if channels == 3 else 0
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+
+    def _write_chunk(self, kind, data):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(kind)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+    def write_rows(self, rows):
+        """Append rows shaped (n, width) or (n, width, channels), dtype uint8."""
+        rows = np.ascontiguousarray(rows, dtype=np.uint8).reshape(len(rows), self.width * self.channels)
+        if self.rows_written + len(rows) > self.height:
+            raise ValueError("More rows written than the image height")
+
+        # Up filter: each byte minus the byte above it, modulo 256
+        filtered = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2
+        filtered[:, 1:] = rows - np.concatenate((self._previous_row, rows[:-1]))
+        self._previous_row = rows[-1:].copy()
+        self.rows_written += len(rows)
+
+        data = self._compressor.compress(filtered.tobytes())
+        if data:
+            self._write_chunk(b"IDAT", data)
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"Wrote {self.rows_written} of {self.height} rows")
+            self._write_chunk(b"IDAT", self._compressor.flush())
+            self._write_chunk(b"IEND", b"")
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+class NpyStreamWriter:
+    """Write a uint8 .npy array one band of rows at a time."""
+
+    def __init__(self, path, width, height, channels=3):
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        self.height = height
+        self.rows_written = 0
+        self._file = open(path, "wb")
+        np.lib.format.write_array_header_1_0(self._file, {
+            "descr": np.lib.format.dtype_to_descr(np.dtype(np.uint8)),
+            "fortran_order": False,
+            "shape": shape,
+        })
+
+    def write_rows(self, rows):
+        if self.rows_written + len(rows) > self.height:
+            raise ValueError("More rows written than the array height")
+        self._file.write(np.ascontiguousarray(rows, dtype=np.uint8).tobytes())
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        if self.rows_written != self.height:
+            raise ValueError(f"Wrote {self.rows_written} of {self.height} rows")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+def should_stream(vars_dict, path):
+    """
+    Whether an export of vars_dict to path should go through
+    export_heightmap_streaming: for .npy output, large maps, and maps whose
+    in-memory export is estimated to exceed the memory budget.
+    """
+    if os.path.splitext(path)[1].lower() == ".npy":
+        return True
+    return _too_large_for_memory(vars_dict)
+
+
+def _map_size(vars_dict):
+    return vars_dict["landmass_size" if vars_dict["noise_type"] == "landmass" else "noise_size"]
+
+
+def _too_large_for_memory(vars_dict):
+    """Whether vars_dict's map is streamed for its size or its estimated in-memory export."""
+    if _map_size(vars_dict) >= STREAMING_MIN_SIZE:
+        return True
+    budget = memory_budget()
+    return budget is not None and estimate_export_memory(vars_dict) > budget
+
+
+def check_rivers(vars_dict):
+    """
+    Raise ValueError if vars_dict asks for rivers on a map too large to
+    export in memory. The drainage needs the whole map at once, which the
+    bands of a streamed export cannot bound.
+    """
+    if vars_dict["river_strength"] <= 0 or not _too_large_for_memory(vars_dict):
+        return
+    size = _map_size(vars_dict)
+    raise ValueError(f"Rivers are not available for {size}px maps: their drainage needs the whole map "
+                     f"in memory (about {format_bytes(size * size * BYTES_PER_PIXEL_RIVERS)}). "
+                     f"Set River Depth to 0 or export a smaller map.")
+
+
+def check_memory_budget(vars_dict):
+    """
+    A warning message if even a streamed export of vars_dict is estimated to
+    exceed the memory budget, else None.
+    """
+    budget = memory_budget()
+    if budget is None:
+        return None
+    estimate = estimate_export_memory(vars_dict, band_rows=STREAM_BAND_ROWS)
+    if estimate <= budget:
+        return None
+    return (f"This export needs about {format_bytes(estimate)} of memory, more than the "
+            f"{format_bytes(budget)} budget (VOXMAPPER_MEMORY_BUDGET_MB). It may fail or slow "
+            f"the system down; consider a smaller map size.")
+
+
+def open_stream_writer(path, width, height, channels=3):
+    """Pick the writer from the file extension: .npy or PNG otherwise."""
+    if os.path.splitext(path)[1].lower() == ".npy":
+        return NpyStreamWriter(path, width, height, channels)
+    return PngStreamWriter(path, width, height, channels)
+
+
+class RawHeightBands:
+    """
+    The raw heights of a map (before post-processing), served in row bands.
+
+    Noise is generated band by band on request. When the global maximum or
+    the whole map is needed (max_height other than 1.0, or rivers), every
+    band is generated once up front and spilled to a temporary file, and
+    later reads come from there.
+    Landmass maps have their own, much smaller, size and global shaping, so
+    they are generated in memory.
+    """
+
+    def __init__(self, vars_dict, spill_dir=None, band_rows=STREAM_BAND_ROWS, data_max=None):
+        """
+        Args:
+            vars_dict (dict): Generation parameters.
+            spill_dir (str): Directory for the temporary spill file.
+            band_rows (int): Rows per band when spilling.
+            data_max: The global maximum if already known, e.g. from an
+                earlier export with the same noise.
+        """
+        self.vars_dict = vars_dict
+        self.band_rows = band_rows
+        self._spill_dir = spill_dir
+        self._spill = None
+        self._data_max = data_max
+        if vars_dict["noise_type"] == "landmass":
+            self._raw = generate_landmass(vars_dict)
+            self.size = self._raw.shape[0]
+        else:
+            self._raw = None
+            self.size = vars_dict["noise_size"]
+
+    def bands(self, band_rows=None):
+        """(start, end) row ranges covering the map."""
+        band_rows = band_rows or self.band_rows
+        return [(start, min(start + band_rows, self.size)) for start in range(0, self.size, band_rows)]
+
+    def data_max(self):
+        """Maximum raw height over the whole map, or None when max_height is 1.0."""
+        if self.vars_dict["max_height"] == 1.0:
+            return None
+        if self._data_max is None:
+            if self._raw is not None:
+                self._data_max = self._raw.max()
+            else:
+                self._spill_all()
+        return self._data_max
+
+    def full_map(self):
+        """Raw heights of the whole map, spilling every band first so the noise is generated only once."""
+        if self._raw is not None:
+            return self._raw
+        if self._spill is None:
+            self._spill_all()
+        return self.rows(0, self.size)
+
+    def _spill_all(self):
+        self._spill = tempfile.TemporaryFile(dir=self._spill_dir)
+        data_max = None
+        for start, end in self.bands():
+            band = generate_noise_rows(start, end, self.size, self.vars_dict)
+            band.tofile(self._spill)
+            data_max = band.max() if data_max is None else max(data_max, band.max())
+        self._data_max = data_max
+
+    def rows(self, start, end):
+        """Raw heights for rows [start, end) as a float32 array."""
+        if self._spill is not None:
+            self._spill.seek(start * self.size * 4)
+            count = (end - start) * self.size
+            return np.fromfile(self._spill, dtype=np.float32, count=count).reshape(end - start, self.size)
+        if self._raw is None:
+            return generate_noise_rows(start, end, self.size, self.vars_dict)
+        return self._raw[start:end]
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def export_heightmap_streaming(vars_dict, path, band_rows=STREAM_BAND_ROWS, greyscale=False, progress=None):
+    """
+    Render the heightmap for vars_dict straight to path, one band at a time.
+
+    The output is identical to render_heightmap. See RawHeightBands for how
+    a max_height other than 1.0 is handled; rivers are refused for maps too
+    large to export in memory (see check_rivers).
+
+    Args:
+        vars_dict (dict): Generation parameters.
+        path (str): Output .png or .npy file.
+        band_rows (int): Rows per band.
+        greyscale (bool): Write only the height (red) channel.
+        progress (callable): Called with (rows_done, total_rows) after each band.
+    """
+    check_rivers(vars_dict)
+    spill_dir = os.path.dirname(os.path.abspath(path))
+    with RawHeightBands(vars_dict, spill_dir, band_rows) as source:
+        size = source.size
+        data_max = source.data_max()
+        strokes = canyon_strokes(size, vars_dict) if vars_dict["canyon_strength"] > 0 else None
+        rivers = river_strokes(source.full_map(), vars_dict) if vars_dict["river_strength"] > 0 else None
+
+        with open_stream_writer(path, size, size, 1 if greyscale else 3) as writer:
+            for start, end in source.bands():
+                rows = create_heightmap_rows(source.rows(start, end), vars_dict, start, size, data_max, strokes,
+                                             rivers)
+                with stage("encode"):
+                    writer.write_rows(rows[:, :, 0] if greyscale else rows)
+                if progress is not None:
+                    progress(end, size)
@@ -0,0 +1,190 @@
+"""
+Tile-split export: the heightmap as a grid of PNG tiles plus manifest.json,
+laid out the way biome_ground.lua walks the map in tileSize blocks.
+
+Adjacent tiles share their edge row/column, as in the Lua loop where each
+Heightmap(x0, y0, x1, y1) call starts at the previous x1/y1.
+
+On re-export into the same directory, each tile's inputs are hashed and
+compared with the manifest. Only tiles whose inputs changed are generated,
+and of those only the ones whose pixels actually changed are rewritten.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from voxcore.canyons import canyon_edge_softness, canyon_strokes, segments_near
+from voxcore.pipeline import PIPELINE_VERSION, POST_KEYS, noise_key, params_digest
+from voxcore.postprocess import create_heightmap_rows
+from voxcore.rivers import river_strokes
+from voxcore.streaming import RawHeightBands, check_rivers
+
+MANIFEST_NAME = "manifest.json"
+
+# biome_ground.lua's default tilesize
+DEFAULT_TILE_SIZE = 128
+
+# Parameters used by create_heightmap_rows, apart from the canyon geometry
+# which is hashed per tile as the segments that reach it
+TILE_POST_KEYS = tuple(key for key in POST_KEYS if key not in (
+    "canyon_length", "canyon_branch_density", "canyon_count", "canyon_seed"))
+
+
+def tile_bounds(width, height, tile_size=DEFAULT_TILE_SIZE):
+    """
+    Inclusive (x0, y0, x1, y1) bounds of every tile, row by row, exactly as
+    biome_ground.lua iterates them.
+    """
+    bounds = []
+    y0 = 0
+    while y0 < height - 1:
+        y1 = min(y0 + tile_size, height - 1)
+        x0 = 0
+        while x0 < width - 1:
+            x1 = min(x0 + tile_size, width - 1)
+            bounds.append((x0, y0, x1, y1))
+            x0 = x1
+        y0 = y1
+    return bounds
+
+
+def _strokes_digest(strokes, softness, x0, y0, x1, y1):
+    """Hash of the canyon segments that can reach the tile's pixels."""
+    if strokes is None:
+        return None
+    near = np.ascontiguousarray(segments_near(strokes, softness, x0, y0, x1, y1), dtype=np.float64)
+    return hashlib.sha1(near.tobytes()).hexdigest()
+
+
+def load_manifest(out_dir):
+    """The manifest of a previous export to out_dir, or None."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_tile(path, pixels, previous_hash):
+    """Hash a tile and save it unless the file already holds the same pixels."""
+    content_hash = hashlib.sha1(pixels.tobytes()).hexdigest()
+    if content_hash == previous_hash and os.path.exists(path):
+        return content_hash, False
+    Image.fromarray(pixels).save(path)
+    return content_hash, True
+
+
+def export_tiles(vars_dict, out_dir, tile_size=DEFAULT_TILE_SIZE, greyscale=False, progress=None):
+    """
+    Export the heightmap for vars_dict as tile PNGs plus manifest.json in out_dir.
+
+    Noise for the tile rows that need regenerating is tiled over the worker
+    pool as usual, and the finished tiles are hashed and encoded on a thread
+    pool while the next row of tiles is generated.
+
+    Args:
+        vars_dict (dict): Generation parameters.
+        out_dir (str): Output directory; created if needed.
+        tile_size (int): biome_ground.lua's tilesize.
+        greyscale (bool): Write only the height (red) channel.
+        progress (callable): Called with (tile_rows_done, tile_rows) after each row of tiles.
+
+    Returns:
+        dict: Tile counts: "total", "generated", "written" and "removed".
+    """
+    check_rivers(vars_dict)
+    os.makedirs(out_dir, exist_ok=True)
+    previous = load_manifest(out_dir) or {}
+    previous_tiles = {tile["file"]: tile for tile in previous.get("tiles", [])}
+
+    key = noise_key(vars_dict)
+    known_max = None
+    if previous.get("noise_key") == key and previous.get("data_max") is not None:
+        # Same noise as last time: skip the pass over the whole map for its maximum
+        known_max = np.dtype(previous["data_max_dtype"]).type(previous["data_max"])
+
+    with RawHeightBands(vars_dict, out_dir, data_max=known_max) as source:
+        size = source.size
+        data_max = source.data_max()
+        strokes = canyon_strokes(size, vars_dict) if vars_dict["canyon_strength"] > 0 else None
+        softness = canyon_edge_softness(size, vars_dict["canyon_strength"])
+        rivers = None
+        if vars_dict["river_strength"] > 0:
+            rivers = river_strokes(source.full_map(), vars_dict)
+        post = {
+            "version": PIPELINE_VERSION,
+            "noise_key": key,
+            "data_max": None if data_max is None else float(data_max),
+            "greyscale": greyscale,
+            **{name: vars_dict[name] for name in TILE_POST_KEYS},
+        }
+
+        # Hash each tile's inputs and keep the previous entry where they match
+        tiles = []
+        dirty_rows = {}
+        for x0, y0, x1, y1 in tile_bounds(size, size, tile_size):
+            name = f"tile_{y0 // tile_size:03d}_{x0 // tile_size:03d}.png"
+            input_hash = params_digest([post, [x0, y0, x1, y1],
+                                        _strokes_digest(strokes, softness, x0, y0, x1, y1)])
+            old = previous_tiles.get(name)
+            tile = {"file": name, "x0": x0, "y0": y0, "x1": x1, "y1": y1,
+                    "input_hash": input_hash, "content_hash": old and old.get("content_hash")}
+            tiles.append(tile)
+            if not old or old.get("input_hash") != input_hash or \
+                    not os.path.exists(os.path.join(out_dir, name)):
+                dirty_rows.setdefault((y0, y1), []).append(tile)
+
+        generated = sum(len(row) for row in dirty_rows.values())
+        written = 0
+        with ThreadPoolExecutor() as executor:
+            pending = []
+            for done, ((y0, y1), row_tiles) in enumerate(sorted(dirty_rows.items()), 1):
+                rows = create_heightmap_rows(source.rows(y0, y1 + 1), vars_dict, y0, size, data_max, strokes,
+                                             rivers)
+                if greyscale:
+                    rows = rows[:, :, 0]
+                for tile in row_tiles:
+                    pixels = np.ascontiguousarray(rows[:, tile["x0"]:tile["x1"] + 1])
+                    path = os.path.join(out_dir, tile["file"])
+                    pending.append((tile, executor.submit(_write_tile, path, pixels, tile["content_hash"])))
+                if progress is not None:
+                    progress(done, len(dirty_rows))
+
+            for tile, future in pending:
+                tile["content_hash"], changed = future.result()
+                written += changed
+
+    # Remove tiles of the previous export that are no longer part of the grid
+    current = {tile["file"] for tile in tiles}
+    removed = 0
+    for name in previous_tiles:
+        if name not in current and os.path.basename(name) == name:
+            try:
+                os.remove(os.path.join(out_dir, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+
+    manifest = {
+        "version": PIPELINE_VERSION,
+        "tile_size": tile_size,
+        "width": size,
+        "height": size,
+        "channels": 1 if greyscale else 3,
+        "noise_key": key,
+        "data_max": post["data_max"],
+        "data_max_dtype": None if data_max is None else np.asarray(data_max).dtype.name,
+        "parameters": vars_dict,
+        "tiles": tiles,
+    }
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, default=float)
+        f.write("\n")
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    return {"total": len(tiles), "generated": generated, "written": written, "removed": removed}
@@ -0,0 +1,189 @@
+"""
+Lightweight stage timers for exports.
+
+An export runs inside timed_job(); the pipeline marks its phases with
+stage() (noise, canyon paths, canyon mask, vignette, grass noise, PNG save,
+...). Outside a job stage() costs next to nothing. Work done in the worker
+pool is reported back with its own start times, so worker spans can be shown
+alongside the parent's.
+
+Each stage also records its peak memory (see voxcore.memory), and workers
+report theirs with their spans.
+
+Set VOXMAPPER_TRACE to a file path to write every job as a Chrome trace-event
+JSON file (open it in chrome://tracing or https://ui.perfetto.dev). The file
+is replaced by each job.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from voxcore.memory import MemoryTracker, format_bytes
+
+# Chrome trace output file, if any
+TRACE_PATH = os.environ.get("VOXMAPPER_TRACE", "").strip() or None
+
+_local = threading.local()
+
+
+class StageTimer:
+    """Timed spans of one job, from the parent process and its workers."""
+
+    def __init__(self, name, track_memory=True):
+        self.name = name
+        self.origin = time.time()
+        self.spans = []  # (name, category, start, seconds, pid, tid, args)
+        self.memory = MemoryTracker() if track_memory else None
+        self._lock = threading.Lock()
+
+    def add(self, name, start, seconds, category="stage", pid=None, tid=None, args=None):
+        """Record a span; start is a time.time() timestamp."""
+        if pid is None:
+            pid = os.getpid()
+        if tid is None:
+            tid = threading.get_ident()
+        with self._lock:
+            self.spans.append((name, category, start, seconds, pid, tid, args))
+
+    def totals(self):
+        """Seconds per stage of the parent process, in order of first appearance."""
+        totals = {}
+        for name, category, _, seconds, _, _, _ in self.spans:
+            if category == "stage":
+                totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def peaks(self, key):
+        """Highest value of a memory key ("rss_peak" or "traced_peak") per stage of the parent process."""
+        peaks = {}
+        for name, category, _, _, _, _, args in self.spans:
+            if category == "stage" and args and args.get(key) is not None:
+                peaks[name] = max(peaks.get(name, 0), args[key])
+        return peaks
+
+    def worker_peaks(self, key):
+        """Highest value of a memory key per worker process."""
+        peaks = {}
+        for _, category, _, _, pid, _, args in self.spans:
+            if category == "worker" and args and args.get(key) is not None:
+                peaks[pid] = max(peaks.get(pid, 0), args[key])
+        return peaks
+
+    def summary(self):
+        """
+        One-line readout, e.g. "export 3.1s: noise 1.9s, canyon mask 0.6s,
+        save png 0.5s; peak RSS 1.2 GB (canyon mask)".
+        """
+        totals = self.totals()
+        total = totals.pop(self.name, None)
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in totals.items())
+        head = f"{self.name} {total:.2f}s" if total is not None else self.name
+        text = f"{head}: {stages}" if stages else head
+        return text + self.memory_summary()
+
+    def memory_summary(self):
+        """The memory part of summary(): the highest stage peaks in the parent and workers."""
+        parts = []
+        for key, label in (("rss_peak", "peak RSS"), ("traced_peak", "traced peak")):
+            peaks = self.peaks(key)
+            inner = {name: value for name, value in peaks.items() if name != self.name}
+            if peaks:
+                stage_name = max(inner, key=inner.get) if inner else self.name
+                parts.append(f"{label} {format_bytes(max(peaks.values()))} ({stage_name})")
+            workers = self.worker_peaks(key)
+            if workers:
+                parts.append(f"workers {format_bytes(max(workers.values()))}")
+        return "; " + ", ".join(parts) if parts else ""
+
+    def trace_events(self):
+        """The spans as Chrome trace "complete" events, timestamps in microseconds."""
+        events = []
+        main_pid = os.getpid()
+        for pid in sorted({span[4] for span in self.spans}):
+            label = "voxmapper" if pid == main_pid else f"worker {pid}"
+            events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": label}})
+        for name, category, start, seconds, pid, tid, args in self.spans:
+            event = {"name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+                     "ts": round((start - self.origin) * 1e6, 3), "dur": round(seconds * 1e6, 3)}
+            if args:
+                event["args"] = args
+            events.append(event)
+        if self.memory is not None:
+            for start, rss in self.memory.samples:
+                events.append({"name": "memory", "ph": "C", "pid": main_pid,
+                               "ts": round((start - self.origin) * 1e6, 3), "args": {"rss_mb": rss / 2**20}})
+        return events
+
+    def write_trace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+
+
+def current_timer():
+    """The StageTimer of the job running on this thread, or None."""
+    return getattr(_local, "timer", None)
+
+
+@contextmanager
+def timed_job(name, timer=None):
+    """
+    Time a whole job on this thread, yielding its StageTimer.
+
+    The job itself is recorded as a stage named name; its trace is written to
+    VOXMAPPER_TRACE when that is set.
+    """
+    timer = timer or StageTimer(name)
+    previous = current_timer()
+    _local.timer = timer
+    if timer.memory is not None:
+        timer.memory.start()
+    try:
+        with stage(name):
+            yield timer
+    finally:
+        _local.timer = previous
+        if timer.memory is not None:
+            timer.memory.stop()
+        if TRACE_PATH:
+            try:
+                timer.write_trace(TRACE_PATH)
+            except OSError as e:
+                print(f"Could not write trace {TRACE_PATH}: {e}")
+
+
+@contextmanager
+def stage(name, **args):
+    """Time a phase of the current job; does nothing outside timed_job()."""
+    timer = current_timer()
+    if timer is None:
+        yield
+        return
+    frame = timer.memory.enter() if timer.memory is not None else None
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        if frame is not None:
+            args.update(timer.memory.exit(frame))
+        timer.add(name, start, seconds, args=args or None)
+
+
+def add_worker_spans(name, spans):
+    """
+    Record spans measured in worker processes for the current job, as
+    (start, seconds, pid, memory) with memory a (peak RSS, tracemalloc peak)
+    pair or None.
+    """
+    timer = current_timer()
+    if timer is None:
+        return
+    for start, seconds, pid, memory in spans:
+        args = None
+        if memory is not None:
+            args = {"rss_peak": memory[0], "traced_peak": memory[1]}
+        # One trace row per worker process
+        timer.add(name, start, seconds, category="worker", pid=pid, tid=pid, args=args)
@@ -1,13 +1,22 @@
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, colorchooser
-from PIL import Image, ImageTk, ImageDraw, ImageFilter, ImageEnhance
 import numpy as np
 import threading
 import multiprocessing
-from texture_generator import TextureGenerator, NoiseTypeEnum
-from noise import snoise2, pnoise2
+import types
 import traceback
 
+# Spawned worker processes re-run this script as "__mp_main__" before they
+# unpickle their first task. Tasks only need voxcore, so skip the GUI toolkit
+# and the generator imports there and let each worker load what it uses.
+if __name__ != "__mp_main__":
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox
+    from PIL import Image, ImageTk, ImageDraw, ImageFilter
+    from voxcore.noise import TextureGenerator, NoiseTypeEnum, get_noise_backend
+    from voxcore import (bundle, cache, canyons, grass, imageimport, landmass, pipeline, postprocess,
+                         preview, streaming, tiles, timing)
+    from voxcore.preview import NoiseTileCache
+    from voxcore.parallel import JobCancelled, cancellable, start_process_pool, shutdown_process_pool
+
 # Theme Colors
 THEME_COLOR = "#2c3e50"  # Dark blue-gray
 ACCENT_COLOR = "#3498db"  # Bright blue
@@ -21,6 +30,9 @@ SUCCESS_COLOR = "#2ecc71"  # Green
 WARNING_COLOR = "#f39c12"  # Orange
 ERROR_COLOR = "#e74c3c"  # Red
 
+# Coarse-to-fine preview resolutions; each pass doubles the previous one
+PREVIEW_PASSES = (64, 128, 256)
+
 class ToolTip:
     def __init__(self, widget, text):
         self.widget = widget
@@ -146,6 +158,73 @@ class ModernStyle:
             background=[('active', BACKGROUND_COLOR)],
             foreground=[('active', ACCENT_COLOR)])
 
+class PreviewScheduler:
+    """Renders a preview on a background thread, keeping only the newest request.
+
+    Each submit() tags its render callable with a generation ID. A request
+    that arrives while a render is running replaces any older pending one,
+    so bursts of drag and slider events collapse into the newest request.
+    Results are applied on the Tk thread only if no newer request has been
+    submitted since.
+
+    A render may also be a generator yielding progressively refined results;
+    each is applied as it arrives, and the remaining passes are abandoned as
+    soon as a newer request comes in.
+
+    Renders run inside parallel.cancellable(), so a stale request also stops
+    within a pass, at the next tile or row of the noise, landmass and grass
+    generators or between post-processing steps. Steps without such checks
+    (the canyon and river passes themselves, image import) run to completion.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.generation = 0
+        self._pending = None
+        self._condition = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, render, apply):
+        """Queue render() off the Tk thread and apply each result on it while still current."""
+        with self._condition:
+            self.generation += 1
+            self._pending = (self.generation, render, apply)
+            self._condition.notify()
+            return self.generation
+
+    def is_stale(self, generation):
+        """True once a newer request than generation has been submitted."""
+        return generation != self.generation
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                generation, render, apply = self._pending
+                self._pending = None
+
+            try:
+                with cancellable(lambda: self.is_stale(generation)):
+                    result = render()
+                    if not isinstance(result, types.GeneratorType):
+                        self.root.after(0, self._deliver, generation, apply, result)
+                        continue
+
+                    for partial in result:
+                        if self.is_stale(generation):
+                            result.close()
+                            break
+                        self.root.after(0, self._deliver, generation, apply, partial)
+            except JobCancelled:
+                pass
+            except Exception as e:
+                print(f"Preview generation error: {e}")
+                traceback.print_exc()
+
+    def _deliver(self, generation, apply, result):
+        if not self.is_stale(generation):
+            apply(result)
+
 class TextureGeneratorGUI:
     def __init__(self, root):
         self.root = root
@@ -172,6 +251,10 @@ class TextureGeneratorGUI:
         # Create the header
         self._create_header()  # Call the new header method
         
+        # Status bar along the bottom, e.g. for the stage timings of the last export
+        self.status_var = tk.StringVar(value="Ready")
+        ttk.Label(self.main_frame, textvariable=self.status_var, anchor="w").pack(side="bottom", fill="x", pady=(5, 0))
+
         # Create notebook for tabs
         self.notebook = ttk.Notebook(self.main_frame)
         self.notebook.pack(fill="both", expand=True)
@@ -215,6 +298,7 @@ class TextureGeneratorGUI:
             "simple_noise_amount": tk.DoubleVar(value=0.5),  # Default value for simple noise amount
             # "noise_type" is already in the main self.vars dictionary
             "fractal_noise_amount": tk.DoubleVar(value=0.5),  # Default value for fractal noise amount
+            "grass_seed": tk.IntVar(value=0),  # Seed of the grass map's simple noise
             "use_noise_grass": tk.BooleanVar(value=False),  # Toggle for noise-based grass
             "grass_noise_scale": tk.DoubleVar(value=50.0),  # Scale for grass noise
             "grass_noise_octaves": tk.IntVar(value=4),      # Octaves for grass noise
@@ -241,6 +325,16 @@ class TextureGeneratorGUI:
         self.imported_image = None
         self.processed_image = None
         self.image_preview = None
+
+        self.noise_tile_cache = NoiseTileCache()
+
+        # Start the shared worker pool while the UI is being built
+        start_process_pool()
+
+        # Background renderers for the three preview canvases
+        self.noise_preview_scheduler = PreviewScheduler(self.root)
+        self.grass_preview_scheduler = PreviewScheduler(self.root)
+        self.image_preview_scheduler = PreviewScheduler(self.root)
         
         # Create controls and preview for noise tab
         self._create_noise_controls()
@@ -485,7 +579,7 @@ class TextureGeneratorGUI:
         noise_combo.bind("<<ComboboxSelected>>", lambda e: [self._toggle_landmass_controls(), self.update_noise_preview()])
 
         # Size and scale sliders
-        self._create_slider(basic_frame, "Size", "noise_size", 64, 4096, 64).bind("<ButtonRelease-1>", lambda e: self._on_size_change())
+        self._create_slider(basic_frame, "Size", "noise_size", 64, 16384, 64).bind("<ButtonRelease-1>", lambda e: self._on_size_change())
         self._create_slider(basic_frame, "Scale", "scale", 1.0, 500.0, 1.0)
         self._create_slider(basic_frame, "Seed", "seed", 1.0, 500.0, 1.0)
 
@@ -537,6 +631,7 @@ class TextureGeneratorGUI:
         self.vars["canyon_branch_density"] = tk.DoubleVar(value=0.15)  # Default branch density
         self.vars["canyon_count"] = tk.IntVar(value=6)  # Default canyon count (6 per edge)
         self.vars["canyon_seed"] = tk.IntVar(value=42)  # Add canyon-specific seed
+        self.vars["canyon_layer_file"] = tk.StringVar(value="")  # Saved network replacing the generated one
         self._create_slider(canyon_frame, "Canyon Intensity", "canyon_strength", 0.0, 1.0, 0.05)
         self._create_slider(canyon_frame, "Canyon Length", "canyon_length", 0.3, 0.9, 0.05)
         self._create_slider(canyon_frame, "Branch Density", "canyon_branch_density", 0.0, 0.5, 0.01)
@@ -551,6 +646,31 @@ class TextureGeneratorGUI:
                                           self.update_noise_preview()],
                                   style='TButton')
 
+        # Save the current network, or load one to keep it while other settings change
+        canyon_layer_frame = ttk.Frame(canyon_frame)
+        canyon_layer_frame.pack(fill="x", pady=5)
+        self._create_styled_button(canyon_layer_frame, "Save Canyon Layer", self._save_canyon_layer)
+        self._create_styled_button(canyon_layer_frame, "Load Canyon Layer", self._load_canyon_layer)
+        self._create_styled_button(canyon_layer_frame, "Use Generated Canyons", self._clear_canyon_layer)
+        ttk.Label(canyon_layer_frame, textvariable=self.vars["canyon_layer_file"],
+                  wraplength=250).pack(fill="x")
+
+        # Rivers along the terrain's drainage, next to the canyons
+        river_frame = ttk.LabelFrame(scrollable_frame, text="River Settings", padding=10)
+        river_frame.pack(fill="x", pady=10)
+        self.vars["river_strength"] = tk.DoubleVar(value=0.0)
+        self.vars["river_threshold"] = tk.DoubleVar(value=0.5)  # Percent of the map draining into a river
+        river_sliders = [
+            self._create_slider(river_frame, "River Depth", "river_strength", 0.0, 1.0, 0.05),
+            self._create_slider(river_frame, "River Threshold %", "river_threshold", 0.05, 5.0, 0.05),
+        ]
+        if not self._rivers_available():
+            for slider in river_sliders:
+                slider.state(["disabled"])
+            ttk.Label(river_frame, foreground=WARNING_COLOR, wraplength=250,
+                      text="Rivers need the Numba backend; without it the drainage "
+                           "would freeze the preview, so they are turned off.").pack(fill="x")
+
         # Group 5: Vignette Settings
         vignette_frame = ttk.LabelFrame(scrollable_frame, text="Vignette Effect", padding=10)
         vignette_frame.pack(fill="x", pady=10)
@@ -590,6 +710,14 @@ class TextureGeneratorGUI:
                                                command=self.generate_greyscale_heightmap)
         self.generate_greyscale_button.pack(fill="x", pady=5)
 
+        self.export_bundle_button = ttk.Button(button_frame, text="Export Bundle (RGB, Greyscale, Grass)",
+                                               command=self.export_bundle)
+        self.export_bundle_button.pack(fill="x", pady=5)
+
+        self.export_tiles_button = ttk.Button(button_frame, text="Export Tiles",
+                                              command=self.export_tiles)
+        self.export_tiles_button.pack(fill="x", pady=5)
+
         # Initially toggle landmass controls
         self._toggle_landmass_controls()
 
@@ -739,19 +867,22 @@ class TextureGeneratorGUI:
         dx = event.x - self.drag_start_x
         dy = event.y - self.drag_start_y
     
-        # Convert drag distance to world space movement
-        # Use floating point arithmetic to ensure smooth movement
+        # Convert drag distance to whole preview pixels, so the view stays on
+        # the preview's tile grid and panning only computes the exposed tiles
         canvas_width, canvas_height = 600, 600
-        world_dx = dx / canvas_width
-        world_dy = dy / canvas_height
-    
+        preview_res = PREVIEW_PASSES[-1]
+        pixels_x = int(dx * preview_res / canvas_width)
+        pixels_y = int(dy * preview_res / canvas_height)
+        if not pixels_x and not pixels_y:
+            return
+
         # Update the focus point (move in opposite direction of drag)
-        self.focus_x = max(0.0, min(1.0, getattr(self, "focus_x", 0.5) - world_dx))
-        self.focus_y = max(0.0, min(1.0, getattr(self, "focus_y", 0.5) - world_dy))
-    
-        # Update drag start to current position
-        self.drag_start_x = event.x
-        self.drag_start_y = event.y
+        self.focus_x = self._snap_focus(getattr(self, "focus_x", 0.5) - pixels_x / preview_res)
+        self.focus_y = self._snap_focus(getattr(self, "focus_y", 0.5) - pixels_y / preview_res)
+
+        # Keep the part of the drag shorter than a pixel for the next event
+        self.drag_start_x += pixels_x * canvas_width / preview_res
+        self.drag_start_y += pixels_y * canvas_height / preview_res
     
         # Update position indicator
         self._update_position_indicator()
@@ -759,6 +890,12 @@ class TextureGeneratorGUI:
         # Generate new preview with updated focus
         self.update_noise_preview()
 
+    @staticmethod
+    def _snap_focus(focus):
+        """Clamp focus to [0, 1] on a whole pixel of the final preview pass."""
+        preview_res = PREVIEW_PASSES[-1]
+        return max(0.0, min(1.0, 0.5 + round((focus - 0.5) * preview_res) / preview_res))
+
     def _update_position_indicator(self):
         """Update the position indicator label based on current focus point."""
         if hasattr(self, "position_label"):
@@ -777,6 +914,27 @@ class TextureGeneratorGUI:
         # Finalize the drag operation (optional, can be used for cleanup)
         pass
 
+    def _snapshot_vars(self):
+        """Capture all Tk variables plus the focus point as a plain dict.
+
+        Generation code reads parameters from this dict so it can run off the
+        Tk thread.
+        """
+        vars_dict = {k: v.get() for k, v in self.vars.items()}
+        vars_dict["focus_x"] = getattr(self, "focus_x", 0.5)
+        vars_dict["focus_y"] = getattr(self, "focus_y", 0.5)
+        if not self._rivers_available():
+            vars_dict["river_strength"] = 0.0
+        return vars_dict
+
+    @staticmethod
+    def _rivers_available():
+        """
+        Rivers are only offered with the numba backend: the NumPy fallback of
+        the drainage takes seconds at 1024px (see voxcore.rivers).
+        """
+        return get_noise_backend() == "numba"
+
     def generate_greyscale_heightmap(self):
         """Generate and save the heightmap in greyscale."""
         # Ask for save location
@@ -789,261 +947,84 @@ class TextureGeneratorGUI:
             return  # User canceled
 
         size = self.vars["noise_size"].get()
-        num_workers = multiprocessing.cpu_count()
 
         # Capture all parameters
-        focus_x = getattr(self, "focus_x", 0.5)
-        focus_y = getattr(self, "focus_y", 0.5)
-
-        vars_dict = {k: v.get() for k, v in self.vars.items()}
-        vars_dict["focus_x"] = focus_x
-        vars_dict["focus_y"] = focus_y
-
-        # Generate noise data
-        noise_data = self._generate_full_noise_data(size, vars_dict, num_workers)
-
-        # Create greyscale heightmap
-        heightmap = self._create_heightmap(noise_data)
+        vars_dict = self._snapshot_vars()
+        if not self._confirm_memory_budget(vars_dict):
+            return
+        render_cache = cache.get_render_cache()
 
-        # Convert heightmap to greyscale (using the red channel)
-        greyscale_image = Image.fromarray(heightmap[:, :, 0])  # Use the red channel for greyscale
+        try:
+            with timing.timed_job("greyscale export") as timer:
+                # The same map was exported before: copy it from the render cache
+                with timing.stage("cache lookup"):
+                    cached = render_cache.copy_image(vars_dict, file_path, greyscale=True)
+
+                if not cached:
+                    if streaming.should_stream(vars_dict, file_path):
+                        streaming.export_heightmap_streaming(vars_dict, file_path, greyscale=True)
+                    else:
+                        # Generate noise data
+                        noise_data = self._generate_full_noise_data(size, vars_dict)
+
+                        # Create greyscale heightmap
+                        heightmap = self._create_heightmap(noise_data, vars_dict)
+
+                        # Convert heightmap to greyscale (using the red channel)
+                        with timing.stage("save png"):
+                            greyscale_image = Image.fromarray(heightmap[:, :, 0])  # Use the red channel for greyscale
+
+                            # Save it
+                            greyscale_image.save(file_path)
+
+                    with timing.stage("cache store"):
+                        render_cache.store_image(vars_dict, file_path, greyscale=True)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            traceback.print_exc()
+            return
 
-        # Save it
-        greyscale_image.save(file_path)
+        self._show_timings(timer)
         messagebox.showinfo("Success", f"Greyscale heightmap saved to {file_path}")
 
-    def _create_heightmap(self, height_data):
+    def _create_heightmap(self, height_data, vars_dict=None):
         """Create RGB heightmap from raw height data with proper canyon application."""
-        # Create RGB image with height in red channel
-        heightmap = np.zeros((height_data.shape[0], height_data.shape[1], 3), dtype=np.uint8)
-
-        # Get min and max height values
-        min_height = self.vars["min_height"].get()
-        max_height = self.vars["max_height"].get()
-
-        # Adjust height data based on min/max settings
-        if min_height != 0.0:
-            height_data = height_data + min_height
-
-        if max_height != 1.0:
-            current_max = height_data.max()
-            if current_max > 0:
-                height_data = height_data * (max_height / current_max)
-
-        # Ensure values are within valid range
-        height_data = np.clip(height_data, 0.0, 1.0)
-
-        # Get necessary parameters
-        size = height_data.shape[0]  # Assuming square heightmap
-        seed = self.vars["seed"].get()
-        canyon_strength = self.vars["canyon_strength"].get()
-        canyon_length = self.vars["canyon_length"].get()
-        canyon_branch_density = self.vars["canyon_branch_density"].get()
-        canyon_count = self.vars["canyon_count"].get()
-        canyon_seed = self.vars["canyon_seed"].get()  # Get canyon-specific seed
-        vignette_strength = self.vars["vignette_strength"].get()
-        vignette_radius = self.vars["vignette_radius"].get()
-
-        # Apply canyon effect
-        if canyon_strength > 0:
-            # Create canyon mask image using the same approach as mountain tab
-            from PIL import Image, ImageDraw, ImageFilter
-            import math
-            import multiprocessing
-    
-            canyon_img = Image.new('L', (size, size), 0)
-            draw = ImageDraw.Draw(canyon_img)
-    
-            # Fixed random generator with canyon-specific seed instead of main seed
-            fixed_rng = np.random.RandomState(canyon_seed)
-    
-            # Center point for canyons
-            cx, cy = size / 2, size / 2
-    
-            # Number of canyons per edge - now using the slider value
-            canyons_per_edge = canyon_count
-    
-            # Generate edge points
-            edge_points = []
-    
-            # Generate evenly distributed edge points with consistent randomness
-            def generate_edge_points(edge_type, count):
-                points = []
-                spacing = size / count
-        
-                if edge_type == "top":
-                    y = 0
-                    for i in range(count):
-                        offset = fixed_rng.uniform(0.2, 0.8)
-                        x = int((i + offset) * spacing)
-                        points.append((x, y))
-                elif edge_type == "bottom":
-                    y = size - 1
-                    for i in range(count):
-                        offset = fixed_rng.uniform(0.2, 0.8)
-                        x = int((i + offset) * spacing)
-                        points.append((x, y))
-                elif edge_type == "left":
-                    x = 0
-                    for i in range(count):
-                        offset = fixed_rng.uniform(0.2, 0.8)
-                        y = int((i + offset) * spacing)
-                        points.append((x, y))
-                elif edge_type == "right":
-                    x = size - 1
-                    for i in range(count):
-                        offset = fixed_rng.uniform(0.2, 0.8)
-                        y = int((i + offset) * spacing)
-                        points.append((x, y))
-                
-                return points
-    
-            # Get points from all four edges
-            edge_points.extend(generate_edge_points("top", canyons_per_edge))
-            edge_points.extend(generate_edge_points("bottom", canyons_per_edge))
-            edge_points.extend(generate_edge_points("left", canyons_per_edge))
-            edge_points.extend(generate_edge_points("right", canyons_per_edge))
-    
-            # Create arguments for parallel processing
-            worker_args = [(start_x, start_y, cx, cy, canyon_length, canyon_branch_density, canyon_seed, size) 
-                          for start_x, start_y in edge_points]
-        
-            # Use multiprocessing to generate canyon paths
-            try:
-                ctx = multiprocessing.get_context('spawn')
-                num_workers = min(ctx.cpu_count(), 4)  # Use at most 4 workers
-            
-                with ctx.Pool(processes=num_workers) as pool:
-                    canyon_paths_results = pool.map(_create_canyon_path_worker, worker_args)
-                
-                # Filter out None results
-                all_canyon_paths = [path for path in canyon_paths_results if path is not None]
-            except Exception as e:
-                # Fallback to single-process if multiprocessing fails
-                print(f"Multiprocessing error for canyons: {e}. Using single-process mode.")
-                all_canyon_paths = []
-            
-                # Process each starting point sequentially as fallback
-                for start_x, start_y in edge_points:
-                    result = _create_canyon_path_worker((start_x, start_y, cx, cy, canyon_length, 
-                                                       canyon_branch_density, canyon_seed, size))
-                    if result is not None:
-                        all_canyon_paths.append(result)
-    
-            # Now apply the actual canyon_length parameter to draw only portions of each path
-            for canyon in all_canyon_paths:
-                # Get the main path
-                path_points = canyon['main_path']
-            
-                # Calculate the actual path length based on canyon_length parameter
-                length_variation = fixed_rng.uniform(-0.05, 0.05)
-                length_ratio = canyon_length + length_variation
-                length_ratio = max(0.2, min(0.95, length_ratio))
-            
-                # Get the number of points to use based on length_ratio
-                points_to_use = max(2, int(len(path_points) * length_ratio))
-                used_path = path_points[:points_to_use]
-            
-                # Smooth the main path
-                if len(used_path) > 3:
-                    smoothed_path = []
-                    window_size = 3
-                
-                    for i in range(len(used_path)):
-                        if i < window_size // 2 or i >= len(used_path) - window_size // 2:
-                            smoothed_path.append(used_path[i])
-                        else:
-                            x_avg = sum(p[0] for p in used_path[i-window_size//2:i+window_size//2+1]) / window_size
-                            y_avg = sum(p[1] for p in used_path[i-window_size//2:i+window_size//2+1]) / window_size
-                            smoothed_path.append((int(x_avg), int(y_avg)))
-                    
-                    # Draw the main path with width scaled by canyon_strength
-                    for j in range(len(smoothed_path) - 1):
-                        progress = j / (len(smoothed_path) - 1)
-                        width = max(2, int((1.0 - progress * 0.7) * canyon_strength * 15))
-                        intensity = int(255 * (1.0 - progress * 0.2))
-                        draw.line([smoothed_path[j], smoothed_path[j+1]], 
-                                fill=intensity,
-                                width=width)
-            
-                # Now draw branches - only those that connect to the used portion of the main path
-                for branch_points in canyon['branches']:
-                    # Get the starting point of the branch
-                    branch_start = branch_points[0]
-                
-                    # Check if this branch connects to the used portion of the path
-                    # by comparing the starting point to all points in the used path
-                    is_connected = False
-                    for p in used_path:
-                        if abs(p[0] - branch_start[0]) <= 1 and abs(p[1] - branch_start[1]) <= 1:
-                            is_connected = True
-                            break
-                
-                    # Only draw branches that connect to the used path
-                    if is_connected:
-                        # Calculate how much of the branch to use based on main path length ratio
-                        branch_length_ratio = length_ratio * 1.2  # Branches can be a bit longer
-                        branch_length_ratio = min(1.0, branch_length_ratio)  # Cap at 100%
-                    
-                        # Get the points to use
-                        branch_points_to_use = max(2, int(len(branch_points) * branch_length_ratio))
-                        used_branch = branch_points[:branch_points_to_use]
-                    
-                        # Smooth the branch
-                        if len(used_branch) > 3:
-                            smoothed_branch = []
-                            window_size = 3
-                    
-                            for i in range(len(used_branch)):
-                                if i < window_size // 2 or i >= len(used_branch) - window_size // 2:
-                                    smoothed_branch.append(used_branch[i])
-                                else:
-                                    x_avg = sum(p[0] for p in used_branch[i-window_size//2:i+window_size//2+1]) / window_size
-                                    y_avg = sum(p[1] for p in used_branch[i-window_size//2:i+window_size//2+1]) / window_size
-                                    smoothed_branch.append((int(x_avg), int(y_avg)))
-                            
-                            # Draw the branch
-                            for k in range(len(smoothed_branch) - 1):
-                                prog = k / (len(smoothed_branch) - 1)
-                                branch_width = max(1, int((1.0 - prog * 0.7) * canyon_strength * 5))
-                                intensity = int(220 * (1.0 - prog * 0.3))
-                                draw.line([smoothed_branch[k], smoothed_branch[k+1]], 
-                                        fill=intensity, 
-                                        width=branch_width)
-    
-            # Apply Gaussian blur scaled with canyon_strength
-            blur_radius = max(1.0, min(3.0, size / 256 * canyon_strength * 2))
-            canyon_img = canyon_img.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-    
-            # Convert to numpy array
-            canyon_mask = np.array(canyon_img) / 255.0
-    
-            # Apply to heightmap with canyon_strength
-            height_data = height_data * (1.0 - canyon_mask * min(1.0, canyon_strength * 1.2))
-
-        # Scale to 0-255 range AFTER canyon application
-        height_scaled = (height_data * 255).astype(np.uint8)
+        if vars_dict is None:
+            vars_dict = self._snapshot_vars()
+        return postprocess.create_heightmap(height_data, vars_dict)
 
-        # Apply vignette if strength > 0
-        if vignette_strength > 0:
-            height_scaled = self._apply_vignette(height_scaled, vignette_strength, vignette_radius)
-
-        # Set channels according to Teardown format
-        heightmap[:, :, 0] = height_scaled  # Red channel = height
-
-        if self.vars["use_noise_grass"].get():
-            # Generate grass noise
-            grass_noise = self._generate_grass_noise(height_data.shape[0], height_data.shape[1])
-            heightmap[:, :, 1] = grass_noise  # Green channel = grass with noise
-        else:
-            # Use uniform grass amount
-            heightmap[:, :, 1] = self.vars["grass_amount"].get()  # Green channel = grass amount
+    def _save_canyon_layer(self):
+        """Save the current canyon network as a resolution-independent JSON layer."""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Canyon layers", "*.json"), ("All files", "*.*")])
+        if not file_path:
+            return
+        try:
+            canyons.save_canyon_layer(canyons.canyon_layer(self._snapshot_vars()), file_path)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save canyon layer: {e}")
+            return
+        self.status_var.set(f"Canyon layer saved to {file_path}")
 
-        # Fill with special value
-        special_val = self.vars["special_value"].get()
-        heightmap[:, :, 2] = special_val
+    def _load_canyon_layer(self):
+        """Use a saved canyon layer instead of the generated network."""
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Canyon layers", "*.json"), ("All files", "*.*")])
+        if not file_path:
+            return
+        try:
+            canyons.load_canyon_layer(file_path)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Error", f"Failed to load canyon layer: {e}")
+            return
+        self.vars["canyon_layer_file"].set(file_path)
+        self.update_noise_preview()
 
-        return heightmap
+    def _clear_canyon_layer(self):
+        """Go back to the network generated from the canyon settings."""
+        self.vars["canyon_layer_file"].set("")
+        self.update_noise_preview()
 
     def _toggle_grass_noise_controls(self, *args):
         """Toggle visibility of grass noise controls based on the use_noise_grass variable."""
@@ -1199,94 +1180,15 @@ class TextureGeneratorGUI:
         # Call the method to generate the grass map based on current settings
         self.generate_grass_map()
 
-    def create_grass_map_data(self):
+    def create_grass_map_data(self, vars_dict=None):
         """Generate the current grass map data array (not saving or previewing yet)."""
-        size = self.vars["noise_size"].get()
-        density = self.vars["grass_density"].get()
-        perlin_amount = self.vars["perlin_noise_amount"].get()
-        simple_amount = self.vars["simple_noise_amount"].get()
-        lightness = self.vars["lightness"].get()
-        
-        # For smaller sizes, avoid multiprocessing
-        if size < 512:
-            # Generate the entire map in the main process for small maps
-            grass_map_data = np.zeros((size, size), dtype=np.float32)
-            for y in range(size):
-                for x in range(size):
-                    # Generate noise values as before
-                    noise_value_perlin = snoise2(x / (50.0 * perlin_amount), 
-                                            y / (50.0 * perlin_amount), 
-                                            octaves=5, 
-                                            persistence=0.5, 
-                                            lacunarity=2.0, 
-                                            repeatx=size, 
-                                            repeaty=size, 
-                                            base=42)
-                    noise_value_simple = np.random.rand()  # Example: random noise
-                    
-                    # Normalize the noise values to be between 0 and 1
-                    normalized_noise_value_perlin = (noise_value_perlin + 1) / 2
-                    normalized_noise_value_simple = noise_value_simple
-                    
-                    # Combine noise values based on their amounts
-                    combined_noise_value = (perlin_amount * normalized_noise_value_perlin + 
-                                        simple_amount * normalized_noise_value_simple) / (perlin_amount + simple_amount)
-                    
-                    # Determine grass presence based on combined noise and density
-                    grass_map_data[y, x] = combined_noise_value < density
-        else:
-            # Use multiprocessing only for larger maps
-            try:
-                # Use context manager to ensure clean process termination
-                ctx = multiprocessing.get_context('spawn')  # Use spawn method for Windows compatibility
-                num_workers = min(ctx.cpu_count(), 4)  # Limit to 4 workers max
-                chunk_size = size // num_workers
-                tasks = [
-                    (i * chunk_size, (i + 1) * chunk_size if i < num_workers - 1 else size,
-                    size, density, perlin_amount, simple_amount)
-                    for i in range(num_workers)
-                ]
-                
-                with ctx.Pool(processes=num_workers, initializer=_mp_worker_initializer) as pool:
-                    results = pool.starmap(self._generate_grass_map_chunk, tasks)
-                    
-                grass_map_data = np.vstack(results)
-                
-            except Exception as e:
-                print(f"Multiprocessing error: {e}")
-                # Fall back to single-process method
-                messagebox.showinfo("Notice", "Using single-process mode for generating grass map")
-                
-                # Generate the entire map in the main process as fallback
-                grass_map_data = np.zeros((size, size), dtype=np.float32)
-                for y in range(size):
-                    for x in range(size):
-                        # Same code as above single-process version
-                        noise_value_perlin = snoise2(x / (50.0 * perlin_amount), 
-                                                y / (50.0 * perlin_amount), 
-                                                octaves=5, 
-                                                persistence=0.5, 
-                                                lacunarity=2.0, 
-                                                repeatx=size, 
-                                                repeaty=size, 
-                                                base=42)
-                        noise_value_simple = np.random.rand()
-                        normalized_noise_value_perlin = (noise_value_perlin + 1) / 2
-                        normalized_noise_value_simple = noise_value_simple
-                        combined_noise_value = (perlin_amount * normalized_noise_value_perlin + 
-                                            simple_amount * normalized_noise_value_simple) / (perlin_amount + simple_amount)
-                        grass_map_data[y, x] = combined_noise_value < density
-
-        # Turn into an image
-        grass_map_image = np.zeros((size, size), dtype=np.uint8)
-        grass_map_image[grass_map_data.astype(bool)] = 255
-
-        brightness_value = int(255 * lightness)
-        brightness_value = max(0, min(255, brightness_value))
-
-        grass_map_image[~grass_map_data.astype(bool)] = brightness_value
-
-        return grass_map_image
+        if vars_dict is None:
+            vars_dict = self._snapshot_vars()
+
+        def notify(message):
+            self.root.after(0, lambda: messagebox.showinfo("Notice", message))
+
+        return grass.create_grass_map_data(vars_dict, notify=notify)
 
     def _create_grass_map_tab(self):
         """Creates the grass map tab with controls and preview."""
@@ -1315,6 +1217,9 @@ class TextureGeneratorGUI:
         simple_slider = self._create_slider(noise_frame, "Simple Noise Amount", "simple_noise_amount", 0.0, 2.0, 0.01)
         simple_slider.bind("<ButtonRelease-1>", lambda e: self.update_grass_map_preview())
 
+        seed_slider = self._create_slider(noise_frame, "Grass Seed", "grass_seed", 0, 1000, 1)
+        seed_slider.bind("<ButtonRelease-1>", lambda e: self.update_grass_map_preview())
+
         # Create appearance settings frame
         appearance_frame = ttk.LabelFrame(left_panel, text="Appearance", padding=10)
         appearance_frame.pack(fill="x", pady=10)
@@ -1581,169 +1486,53 @@ class TextureGeneratorGUI:
         if not hasattr(self, 'original_image'):
             return
 
-        try:
-            # Resize the actual imported image based on slider
-            target_size = self.vars["image_size"].get()
-            width, height = self.original_image.size
-            aspect_ratio = width / height
-
-            if width > height:
-                new_width = min(target_size, 4096)
-                new_height = int(new_width / aspect_ratio)
-            else:
-                new_height = min(target_size, 4096)
-                new_width = int(new_height * aspect_ratio)
+        # Snapshot the inputs here; processing happens off the Tk thread
+        original_image = self.original_image
+        vars_dict = self._snapshot_vars()
 
-            self.imported_image = self.original_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-            # Create a copy of the resized image for processing
-            img = self.imported_image.copy()
-
-            # Convert to numpy array for red channel processing
-            img_array = np.array(img)
-            rgb_array = np.zeros((img_array.shape[0], img_array.shape[1], 3), dtype=np.uint8)
-
-            red_channel = img_array[:, :, 0].astype(float)
-            if self.vars["invert_red"].get():
-                red_channel = 255 - red_channel
-            lightness = self.vars["red_lightness"].get()
-            if lightness > 0:
-                red_channel = red_channel + (255 - red_channel) * lightness
-            red_value = self.vars["red_channel_value"].get()
-            red_channel = (red_channel * red_value).clip(0, 255).astype(np.uint8)
-            rgb_array[:, :, 0] = red_channel
-
-            # Convert to RGBA for overlay
-            img_rgba = Image.fromarray(rgb_array, mode="RGB").convert("RGBA")
+        def render():
+            try:
+                return self._process_imported_image(original_image, vars_dict)
+            except Exception as e:
+                self.root.after(0, lambda e=e: messagebox.showerror("Error", f"Failed to process image: {str(e)}"))
+                raise
 
-            # Create green overlay
-            alpha_val = int(self.vars["green_channel_value"].get() * 255)
-            green_overlay = Image.new('RGBA', img_rgba.size, (0, 255, 0, alpha_val))
+        self.image_preview_scheduler.submit(render, self._show_image_preview)
 
-            # Composite green overlay
-            img_with_overlay = Image.alpha_composite(img_rgba, green_overlay)
-            self.processed_image = img_with_overlay.convert("RGB")
+    def _process_imported_image(self, original_image, vars_dict):
+        """Resize and process the imported image, returning (resized, processed, preview) images."""
+        return imageimport.process_imported_image(original_image, vars_dict)
 
-            # Apply Gaussian blur if set
-            blur_radius = self.vars["gaussian_blur"].get()
-            if blur_radius > 0:
-                self.processed_image = self.processed_image.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+    def _show_image_preview(self, images):
+        """Display a processed image on the canvas (Tk thread only)."""
+        self.imported_image, self.processed_image, preview_img = images
 
-            # Create preview image at consistent size (512x512)
-            preview_size = 512
-            if width > height:
-                preview_width = preview_size
-                preview_height = int(preview_width / aspect_ratio)
-            else:
-                preview_height = preview_size
-                preview_width = int(preview_height * aspect_ratio)
+        preview = ImageTk.PhotoImage(preview_img)
+        self.image_preview = preview
 
-            preview_img = self.processed_image.resize((preview_width, preview_height), Image.Resampling.LANCZOS)
-            preview = ImageTk.PhotoImage(preview_img)
-            self.image_preview = preview
-
-            # Update canvas
-            self.image_canvas.delete("all")
-            self.image_canvas.create_image(
-                self.image_canvas.winfo_width() // 2,
-                self.image_canvas.winfo_height() // 2,
-                image=preview,
-                anchor="center"
-            )
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to process image: {str(e)}")
+        # Update canvas
+        self.image_canvas.delete("all")
+        self.image_canvas.create_image(
+            self.image_canvas.winfo_width() // 2,
+            self.image_canvas.winfo_height() // 2,
+            image=preview,
+            anchor="center"
+        )
 
-    def _generate_landmass(self):
+    def _generate_landmass(self, vars_dict=None):
         """Generate heightmap with landmass shape, returning a 2D float numpy array normalized 0-1."""
+        if vars_dict is None:
+            vars_dict = self._snapshot_vars()
         try:
-            # Get parameters
-            size = self.vars["landmass_size"].get()
-            land_proportion = self.vars["landmass_land_proportion"].get()
-            # water_level is not directly used in this version of landmass shaping, but kept for potential future use
-            # water_level = self.vars["landmass_water_level"].get() 
-            plain_factor = self.vars["landmass_plain_factor"].get()
-            shore_height = self.vars["landmass_shore_height"].get()
-            noise_scale = self.vars["landmass_noise_scale"].get()
-            octaves = self.vars["landmass_octaves"].get()
-            seed = self.vars["landmass_seed"].get()
-
-            # Generate base terrain using FBM noise
-            heightmap = generate_landmass_parallel(
-                size=size,
-                land_proportion=land_proportion,
-                plain_factor=plain_factor,
-                shore_height=shore_height,
-                noise_scale=noise_scale,
-                octaves=octaves,
-                seed=seed
-            )
-            
-            # Normalize heightmap to 0-1 range initially
-            h_min_initial = np.min(heightmap)
-            h_max_initial = np.max(heightmap)
-            if h_max_initial == h_min_initial:
-                heightmap = np.full((size, size), 0.5, dtype=np.float32)
-            else:
-                heightmap = (heightmap - h_min_initial) / (h_max_initial - h_min_initial)
-
-            # Determine water threshold using np.percentile
-            # (1.0 - land_proportion) gives the percentile of water.
-            # E.g., if land_proportion is 0.7 (70% land), water is 30%, so we find the 30th percentile.
-            if len(heightmap.flatten()) == 0: # Should not happen with proper size
-                water_threshold = 0.5
-            else:
-                water_threshold = np.percentile(heightmap.flatten(), (1.0 - land_proportion) * 100.0)
-
-            # --- Vectorized Shaping Logic ---
-            under_water_mask = heightmap < water_threshold
-            above_water_mask = ~under_water_mask
-
-            # Process underwater areas
-            # Lower underwater terrain by shore_height (relative to current 0-1 range)
-            heightmap[under_water_mask] = heightmap[under_water_mask] - shore_height
-
-            # Process above-water areas
-            # Temporarily store above-water heights to avoid modifying them in place during calculation
-            h_above = heightmap[above_water_mask]
-            
-            # Handle case where water_threshold might be 1.0 (all water or flat terrain at max)
-            denominator = 1.0 - water_threshold
-            if np.isclose(denominator, 0): # Avoid division by zero
-                # If denominator is close to zero, it means water_threshold is very close to 1.0
-                # This implies very little or no land above water_threshold to apply plain_factor to.
-                # Or, all land is effectively at water_threshold.
-                # Set h_norm_above to 0 to avoid issues, or handle as appropriate (e.g., no change).
-                h_norm_above = np.zeros_like(h_above) # Or 0.0 if h_above could be scalar
-            else:
-                h_norm_above = (h_above - water_threshold) / denominator
-            
-            h_norm_above = np.clip(h_norm_above, 0.0, 1.0) # Ensure h_norm is in [0,1] before power
-            h_shaped_above = h_norm_above ** plain_factor
-            
-            # Apply shaped heights back
-            heightmap[above_water_mask] = water_threshold + h_shaped_above * (1.0 - water_threshold)
-            # --- End of Vectorized Shaping Logic ---
-            
-            # Final normalization to ensure output is strictly 0-1
-            heightmap = heightmap.astype(np.float32) 
-            final_h_min = np.min(heightmap)
-            final_h_max = np.max(heightmap)
-            if final_h_max == final_h_min:
-                heightmap = np.full((size, size), 0.5, dtype=np.float32)
-            else:
-                heightmap = (heightmap - final_h_min) / (final_h_max - final_h_min)
-
-            return heightmap
+            return landmass.generate_landmass(vars_dict)
 
+        except JobCancelled:
+            raise
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate landmass: {str(e)}\\nTraceback: {traceback.format_exc()}")
+            error_text = f"Failed to generate landmass: {str(e)}\\nTraceback: {traceback.format_exc()}"
+            self.root.after(0, lambda: messagebox.showerror("Error", error_text))
             # Return a default array in case of error to prevent None return
-            default_size_val = 512 # Default fallback size
-            try:
-                default_size_val = self.vars.get("landmass_size", tk.IntVar(value=512)).get()
-            except: # Broad except if self.vars or get() fails during error handling
-                pass
+            default_size_val = vars_dict.get("landmass_size", 512)
             return np.full((default_size_val, default_size_val), 0.5, dtype=np.float32)
 
     def _normalize_dir(self, dx, dy):
@@ -1756,39 +1545,10 @@ class TextureGeneratorGUI:
 
     def generate_grass_map(self):
         """Update the preview canvas with the current grass map."""
-        grass_map_image = self.create_grass_map_data()
-        self._update_grass_map_preview(grass_map_image)
+        vars_dict = self._snapshot_vars()
+        self.grass_preview_scheduler.submit(lambda: self.create_grass_map_data(vars_dict),
+                                            self._update_grass_map_preview)
 
-    @staticmethod
-    def _generate_grass_map_chunk(start_row, end_row, size, density, perlin_amount, simple_amount):
-        chunk_data = np.zeros((end_row - start_row, size), dtype=np.float32)
-
-        for y in range(start_row, end_row):
-            for x in range(size):
-                # Generate Perlin noise
-                noise_value_perlin = snoise2(x / (50.0 * perlin_amount), 
-                                            y / (50.0 * perlin_amount), 
-                                            octaves=5, 
-                                            persistence=0.5, 
-                                            lacunarity=2.0, 
-                                            repeatx=size, 
-                                            repeaty=size, 
-                                            base=42)
-                # Generate Simple noise
-                noise_value_simple = np.random.rand()  # Example: random noise
-
-                # Normalize the noise values to be between 0 and 1
-                normalized_noise_value_perlin = (noise_value_perlin + 1) / 2  # Normalize from [-1, 1] to [0, 1]
-                normalized_noise_value_simple = (noise_value_simple)  # Already between [0, 1]
-
-                # Combine noise values based on their amounts
-                combined_noise_value = (perlin_amount * normalized_noise_value_perlin + 
-                                        simple_amount * normalized_noise_value_simple) / (perlin_amount + simple_amount)
-
-                # Determine grass presence based on combined noise and density
-                chunk_data[y - start_row, x] = combined_noise_value < density
-
-        return chunk_data
 
     def _update_grass_map_preview(self, grass_map_image):
         # Convert the NumPy array to an image
@@ -1822,109 +1582,27 @@ class TextureGeneratorGUI:
         Image.fromarray(grass_map_image).save(file_path)
         messagebox.showinfo("Success", f"Grass map saved to {file_path}")
     
-    def _generate_grass_noise(self, height, width):
+    def _generate_grass_noise(self, height, width, vars_dict=None):
         """Generate grass noise using exactly the same coordinate system as the main noise."""
-
-        # === 1. Grass-specific parameters ===
-        octaves = self.vars["grass_noise_octaves"].get()
-        persistence = self.vars["grass_noise_persistence"].get()
-        grass_scale = self.vars["grass_noise_scale"].get()
-        density = self.vars["noise_grass_density"].get()
-        grass_amount = self.vars["grass_amount"].get()
-        seed = self.vars["seed"].get() + 1000  # Offset seed to differentiate grass
-
-        # === 2. Scaling and resolution matching ===
-        base_scale = self.vars["scale"].get()
-        preview_res = self.vars["noise_size"].get()  # Size used in preview
-        export_res = width  # Export width — assume square
-
-        zoom_factor = export_res / preview_res
-        adjusted_scale = base_scale * zoom_factor * 0.05  # 🔧 Tame zoom with 0.05 multiplier
-
-        # === 3. Use current focus point ===
-        focus_x = max(0.0, min(1.0, getattr(self, "focus_x", 0.5)))
-        focus_y = max(0.0, min(1.0, getattr(self, "focus_y", 0.5)))
-
-        # === 4. Coordinate offset matching main noise ===
-        world_offset_x = (focus_x - 0.5) * width
-        world_offset_y = (focus_y - 0.5) * height
-
-        base_offset_x = 1000.0
-        base_offset_y = 1000.0
-
-        # === 5. Output grass map ===
-        grass_map = np.zeros((height, width), dtype=np.uint8)
-
-        for y in range(height):
-            for x in range(width):
-                # Match coordinate sampling with base texture
-                sample_x = base_offset_x + (x - world_offset_x) / adjusted_scale
-                sample_y = base_offset_y + (y - world_offset_y) / adjusted_scale
-
-                # Apply grass-specific scaling
-                grass_sample_x = sample_x / grass_scale
-                grass_sample_y = sample_y / grass_scale
-
-                noise_value = snoise2(
-                    grass_sample_x,
-                    grass_sample_y,
-                    octaves=octaves,
-                    persistence=persistence,
-                    lacunarity=2.0,
-                    base=seed
-                )
-
-                normalized_noise = (noise_value + 1) / 2
-
-                if normalized_noise < density:
-                    grass_map[y, x] = grass_amount
-                else:
-                    grass_map[y, x] = 0
-
-        return grass_map
+        if vars_dict is None:
+            vars_dict = self._snapshot_vars()
+        return grass.generate_grass_noise(height, width, vars_dict)
 
     def _apply_vignette(self, image, strength, radius):
         """Apply vignette effect to the image."""
-        # Support both grayscale and color images
-        if image.ndim == 2:
-            # Grayscale image
-            height, width = image.shape
-            channels = 1
-            is_gray = True
-        else:
-            # Color image
-            height, width, channels = image.shape
-            is_gray = False
-        
-        # Create vignette mask
-        y, x = np.ogrid[:height, :width]
-        center_x, center_y = width / 2, height / 2
-        # Calculate distance from center
-        distance = np.sqrt((x - center_x)**2 + (y - center_y)**2)
-        max_distance = np.sqrt(center_x**2 + center_y**2)
-        # Create vignette mask with adjustable radius
-        vignette = 1 - np.clip((distance / (max_distance * radius)), 0, 1) * strength
-        vignette = np.clip(vignette, 0, 1)
-        # Apply vignette mask
-        if is_gray:
-            # For grayscale images, directly multiply and return 2D array
-            return (image * vignette).astype(np.uint8)
-        else:
-            # For color images, apply per-channel and return image
-            for i in range(channels):
-                image[:, :, i] = (image[:, :, i] * vignette).astype(np.uint8)
-            return image
+        return postprocess.apply_vignette(image, strength, radius)
 
-    def _generate_noise_data(self, size, noise_type=None, octaves=None, persistence=None, scale=None):
-        self.generator = TextureGenerator(seed=self.vars["seed"].get())
+    def _generate_noise_data(self, size, vars_dict=None, noise_type=None, octaves=None, persistence=None, scale=None):
+        if vars_dict is None:
+            vars_dict = self._snapshot_vars()
 
         # If noise_type is not provided, use the default from the noise tab
         # Determine the noise type string from the UI
-        current_noise_type_str = self.vars["noise_type"].get()
+        current_noise_type_str = vars_dict["noise_type"]
 
         if current_noise_type_str == "landmass":
-            # Landmass generation uses its own parameters (including size) from self.vars
-            return self._generate_landmass()
+            # Landmass generation uses its own parameters (including size) from vars_dict
+            return self._generate_landmass(vars_dict)
 
         # For other noise types, use the existing mapping and parameters
         if noise_type is None: # This noise_type is an enum, different from current_noise_type_str
@@ -1934,65 +1612,40 @@ class TextureGeneratorGUI:
                 "turbulence noise": NoiseTypeEnum.TURBULENCE
             }
             if current_noise_type_str not in noise_type_map:
-                messagebox.showerror("Error", f"Unknown noise type: {current_noise_type_str}")
+                self.root.after(0, lambda: messagebox.showerror("Error", f"Unknown noise type: {current_noise_type_str}"))
                 return np.full((size, size), 0.5, dtype=np.float32) # Return default
             noise_type = noise_type_map[current_noise_type_str]
 
-        # Create output array
-        noise_data = np.zeros((size, size), dtype=np.float32)
-
-        # Get focus point coordinates
-        focus_x = max(0.0, min(1.0, getattr(self, "focus_x", 0.5)))  # Clamp to [0, 1]
-        focus_y = max(0.0, min(1.0, getattr(self, "focus_y", 0.5)))  # Clamp to [0, 1]
-
-        # Calculate the world offset
-        world_offset_x = (focus_x - 0.5) * size
-        world_offset_y = (focus_y - 0.5) * size
+        return preview.generate_preview_noise(size, vars_dict, self.noise_tile_cache, noise_type,
+                                              octaves=octaves, persistence=persistence, scale=scale)
 
-        # Use the exact scale value from the UI - don't apply any adjustments
-        adjusted_scale = scale if scale is not None else self.vars["scale"].get()
-
-        base_offset_x = 1000.0  # Large offset to avoid zero
-        base_offset_y = 1000.0  # Large offset to avoid zero
-
-        # Sample noise with precise floating-point coordinates
-        for y in range(size):
-            for x in range(size):
-                sample_x = base_offset_x + (x - world_offset_x) / adjusted_scale
-                sample_y = base_offset_y + (y - world_offset_y) / adjusted_scale
+    def update_noise_preview(self, event=None):
+        # Snapshot the parameters here; rendering happens off the Tk thread
+        vars_dict = self._snapshot_vars()
 
-                noise_data[y, x] = self.generator.noise.simplexNoise(
-                    noise_type,
-                    size,
-                    octaves if octaves is not None else self.vars["octaves"].get(),
-                    persistence if persistence is not None else self.vars["persistence"].get(),
-                    self.vars["lacunarity"].get(),
-                    1.0,  # Use 1.0 as scale here since we're adjusting coordinates directly
-                    sample_x, sample_y
-                )
+        def render():
+            # Refine coarse-to-fine over the same view; landmass has its own
+            # fixed resolution, so it only needs the final pass
+            passes = PREVIEW_PASSES if vars_dict["noise_type"] != "landmass" else PREVIEW_PASSES[-1:]
 
-        return noise_data
+            for preview_res in passes:
+                # Keep the view's world extent fixed as the resolution changes
+                scale = vars_dict["scale"] * preview_res / PREVIEW_PASSES[-1]
 
-    def update_noise_preview(self, event=None):
-        try:
-            # Set the preview resolution 
-            preview_res = 256  # Always use high quality
-
-            # Generate the raw noise data
-            noise_data = self._generate_noise_data(preview_res)
+                # Generate the raw noise data
+                noise_data = self._generate_noise_data(preview_res, vars_dict, scale=scale)
         
-            # Create heightmap with canyons and other effects
-            heightmap = self._create_heightmap(noise_data)
+                # Create heightmap with canyons and other effects
+                heightmap = self._create_heightmap(noise_data, vars_dict)
         
-            # Convert to PIL image for display
-            self.full_heightmap = Image.fromarray(heightmap)
-        
-            # Display the preview
-            self._update_preview_canvas()
-        except Exception as e:
-            print(f"Preview generation error: {e}")
-            import traceback
-            traceback.print_exc()
+                # Convert to PIL image for display
+                yield Image.fromarray(heightmap)
+
+        self.noise_preview_scheduler.submit(render, self._show_noise_preview)
+
+    def _show_noise_preview(self, heightmap_image):
+        self.full_heightmap = heightmap_image
+        self._update_preview_canvas()
 
     def _update_preview_canvas(self):
         if self.full_heightmap is None:
@@ -2017,48 +1670,55 @@ class TextureGeneratorGUI:
         # Ask for save location
         file_path = filedialog.asksaveasfilename(
             defaultextension=".png",
-            filetypes=[("PNG files", "*.png")]
+            filetypes=[("PNG files", "*.png"), ("NumPy arrays", "*.npy")]
         )
 
         if not file_path:
             return  # User canceled
 
+        # Create a complete vars dictionary including all parameters (and the
+        # same focus point as the preview) before leaving the Tk thread
+        vars_dict = self._snapshot_vars()
+        if not self._confirm_memory_budget(vars_dict):
+            return
+
         def worker(file_path):
             try:
                 self.root.after(0, lambda: self.generate_button.config(state="disabled"))
 
-                size = self.vars["noise_size"].get()
-            
-                # Use the same focus points as the preview
-                focus_x = getattr(self, "focus_x", 0.5)
-                focus_y = getattr(self, "focus_y", 0.5)
-
-                # Create a complete vars dictionary including all parameters
-                vars_dict = {k: v.get() for k, v in self.vars.items()}
-                vars_dict["focus_x"] = focus_x
-                vars_dict["focus_y"] = focus_y
-
-                # For landmass mode, generate using the existing function
-                if vars_dict["noise_type"] == "landmass":
-                    # For landmass, use the existing function which handles its own multiprocessing
-                    noise_data = self._generate_landmass()
-                else:
-                    # For other noise types, use multiprocessing
-                    num_workers = min(multiprocessing.cpu_count(), 4)
-                    noise_data = self._generate_full_noise_data(size, vars_dict, num_workers)
+                size = vars_dict["noise_size"]
+                render_cache = cache.get_render_cache()
+
+                with timing.timed_job("export") as timer:
+                    # The same map was exported before: copy it from the render cache
+                    with timing.stage("cache lookup"):
+                        cached = render_cache.copy_image(vars_dict, file_path)
+
+                    if not cached:
+                        # Very large maps (and .npy output) are generated and written in
+                        # bands so they never have to fit in memory
+                        if streaming.should_stream(vars_dict, file_path):
+                            streaming.export_heightmap_streaming(vars_dict, file_path)
+                        else:
+                            # Landmass or tiled noise, reusing cached raw heights when possible
+                            noise_data = self._generate_full_noise_data(size, vars_dict)
+
+                            # Create heightmap with canyons applied (handled in _create_heightmap)
+                            heightmap = self._create_heightmap(noise_data, vars_dict)
 
-                # Create heightmap with canyons applied (handled in _create_heightmap)
-                heightmap = self._create_heightmap(noise_data)
+                            # Save the heightmap as an image
+                            with timing.stage("save png"):
+                                img = Image.fromarray(heightmap)
+                                img.save(file_path)
 
-                # Save the heightmap as an image
-                img = Image.fromarray(heightmap)
-                img.save(file_path)
+                        with timing.stage("cache store"):
+                            render_cache.store_image(vars_dict, file_path)
 
+                self._show_timings(timer)
                 self.root.after(0, lambda: messagebox.showinfo("Success", f"Noise saved to {file_path}"))
 
             except Exception as e:
                 self.root.after(0, lambda e=e: messagebox.showerror("Error", str(e)))
-                import traceback
                 traceback.print_exc()
 
             finally:
@@ -2066,298 +1726,95 @@ class TextureGeneratorGUI:
 
         threading.Thread(target=worker, args=(file_path,), daemon=True).start()
 
-    def _generate_full_noise_data(self, size, vars_dict, num_workers):
-        # Check if the requested noise type is landmass
-        if vars_dict.get("noise_type") == "landmass":
-            # Landmass generation is not currently chunkable and uses self.vars directly.
-            # Ensure self.vars is up-to-date if called from a context where vars_dict is the source of truth.
-            # For now, assume self.vars accurately reflects UI settings for landmass when this is called.
-            return self._generate_landmass() # This will use self.vars["landmass_size"], etc.
+    def export_bundle(self):
+        """Export the RGB heightmap, greyscale heightmap and grass map in one job sharing the noise."""
+        file_path = filedialog.asksaveasfilename(
+            title="Bundle base name",
+            defaultextension=".png",
+            filetypes=[("PNG files", "*.png"), ("NumPy arrays", "*.npy")]
+        )
+        if not file_path:
+            return  # User canceled
 
-        # Proceed with chunk-based multiprocessing for other noise types
-        tile_size = size // num_workers
+        vars_dict = self._snapshot_vars()
+        if not self._confirm_memory_budget(vars_dict):
+            return
 
-        tasks = []
-        for i in range(num_workers):
-            start_row = i * tile_size
-            end_row = (i + 1) * tile_size if i < num_workers - 1 else size
-            # Pass the original size of the full image, not the potentially different landmass_size
-            tasks.append((start_row, end_row, size, vars_dict))
+        def notify(message):
+            self.root.after(0, lambda: messagebox.showinfo("Notice", message))
 
-        # Ensure TextureGenerator and NoiseTypeEnum are available to the child processes
-        # This is handled by the re-import within _generate_chunk
-        with multiprocessing.Pool(processes=num_workers) as pool:
-            results = pool.map(TextureGeneratorGUI._generate_chunk, tasks)
+        def worker():
+            try:
+                self.root.after(0, lambda: self.export_bundle_button.config(state="disabled"))
+                with timing.timed_job("bundle export") as timer:
+                    paths = bundle.export_bundle(vars_dict, file_path, notify=notify)
+                self._show_timings(timer)
+                message = "Saved:\n" + "\n".join(paths.values())
+                self.root.after(0, lambda: messagebox.showinfo("Success", message))
+            except Exception as e:
+                self.root.after(0, lambda e=e: messagebox.showerror("Error", str(e)))
+                traceback.print_exc()
+            finally:
+                self.root.after(0, lambda: self.export_bundle_button.config(state="normal"))
 
-        return np.vstack(results)
+        threading.Thread(target=worker, daemon=True).start()
 
-    @staticmethod
-    def _generate_chunk(args):
-        start_row, end_row, size, vars_dict = args
-    
-        from texture_generator import TextureGenerator, NoiseTypeEnum  # Re-import in child process
-        generator = TextureGenerator(seed=vars_dict["seed"])
-    
-        noise_type = {
-            "perlin noise": NoiseTypeEnum.PERLINNOISE,
-            "fractal noise": NoiseTypeEnum.FRACTALNOISE,
-            "turbulence noise": NoiseTypeEnum.TURBULENCE
-        }[vars_dict["noise_type"]]
-    
-        # Initialize the chunk
-        chunk = np.zeros((end_row - start_row, size), dtype=np.float32)
-   
-        # Get focus point coordinates
-        focus_x = max(0.0, min(1.0, vars_dict["focus_x"]))  # Clamp to [0, 1]
-        focus_y = max(0.0, min(1.0, vars_dict["focus_y"]))  # Clamp to [0, 1]
-    
-        # Calculate the world offset
-        world_offset_x = (focus_x - 0.5) * size  # Center on focus_x
-        world_offset_y = (focus_y - 0.5) * size  # Center on focus_y
-    
-        # Apply zoom factor to the scale
-        preview_res = vars_dict.get("preview_res", 256)  # Default preview resolution
-        zoom_factor = size / preview_res  # Scale export to match preview zoom
-        adjusted_scale = vars_dict["scale"] * zoom_factor
-    
-        base_offset_x = 1000.0
-        base_offset_y = 1000.0
-    
-        # Generate noise data for each pixel in the chunk
-        for y in range(start_row, end_row):
-            for x in range(size):
-                sample_x = base_offset_x + (x - world_offset_x) / adjusted_scale
-                sample_y = base_offset_y + (y - world_offset_y) / adjusted_scale
-            
-                chunk[y - start_row, x] = generator.noise.simplexNoise(
-                    noise_type,
-                    size,
-                    vars_dict["octaves"],
-                    vars_dict["persistence"],
-                    vars_dict["lacunarity"],
-                    1.0,
-                    sample_x, sample_y
-                )
-    
-        return chunk
-
-def _create_canyon_path_worker(args):
-    """Worker function to generate a canyon path in parallel."""
-    start_x, start_y, cx, cy, canyon_length, canyon_branch_density, canyon_seed, size = args
-    import math
-    from noise import snoise2
-    import numpy as np
-    
-    # Direction vector toward center
-    to_center_x = cx - start_x
-    to_center_y = cy - start_y
-    
-    # Skip if already at center
-    if abs(to_center_x) < 1 and abs(to_center_y) < 1:
-        return None
-    
-    # Fixed random generator with canyon-specific seed
-    fixed_rng = np.random.RandomState(canyon_seed)
-    
-    # Get distance to center
-    dist_to_center = math.sqrt(to_center_x**2 + to_center_y**2)
-    
-    # Normalize direction vector
-    if dist_to_center > 0:
-        to_center_x /= dist_to_center
-        to_center_y /= dist_to_center
-    
-    # Add slight random angle deviation
-    angle_deviation = fixed_rng.uniform(-0.1, 0.1)
-    rotated_x = to_center_x * math.cos(angle_deviation) - to_center_y * math.sin(angle_deviation)
-    rotated_y = to_center_x * math.sin(angle_deviation) + to_center_y * math.cos(angle_deviation)
-    to_center_x, to_center_y = rotated_x, rotated_y
-    
-    # Calculate max possible path length
-    max_path_length = int(dist_to_center * 0.95)  # Maximum allowed length
-    
-    # Generate wiggle parameters from fixed RNG
-    wiggle_freq = fixed_rng.uniform(30.0, 50.0)
-    wiggle_amp = fixed_rng.uniform(0.2, 0.5)
-    wiggle_phase = fixed_rng.uniform(0, 100)
-    
-    # Initialize canyon path
-    path_points = [(start_x, start_y)]
-    x, y = start_x, start_y
-    
-    # Draw path with wiggles
-    step_count = 0
-    
-    # Generate the FULL path up to max_path_length
-    while len(path_points) < max_path_length:
-        step_count += 1
-    
-        # Get perlin noise value for wiggles
-        perlin_val = snoise2(step_count/wiggle_freq, wiggle_phase, octaves=1)
-    
-        # Add random jitter
-        jitter = fixed_rng.uniform(-0.05, 0.05)
-    
-        # Calculate wiggle angle
-        wiggle_angle = perlin_val * wiggle_amp * math.pi + jitter
-    
-        # Add periodic larger bends
-        if step_count % 8 == 0:
-            wiggle_angle += fixed_rng.uniform(-0.2, 0.2)
-        
-        # Apply wiggle to direction
-        dx = to_center_x * math.cos(wiggle_angle) - to_center_y * math.sin(wiggle_angle)
-        dy = to_center_x * math.sin(wiggle_angle) + to_center_y * math.cos(wiggle_angle)
-    
-        # Use consistent step size
-        step_size = fixed_rng.uniform(1.0, 2.0)
-    
-        # Move along path
-        x += dx * step_size
-        y += dy * step_size
-    
-        # Keep in bounds
-        x = min(max(0, x), size-1)
-        y = min(max(0, y), size-1)
-    
-        # Add point to path
-        path_points.append((int(x), int(y)))
-        
-        # Stop if we're very close to center
-        if math.sqrt((x - cx)**2 + (y - cy)**2) < 10:
-            break
-        
-    # Create and store branch paths as well
-    branches = []
-    
-    # Generate all potential branches (with fixed seed based on canyon seed)
-    for i, (px, py) in enumerate(path_points):
-        # Only generate branches beyond a certain point along main path
-        path_progress = i / len(path_points)
-        if 0.3 < path_progress < 0.7 and fixed_rng.random() < canyon_branch_density:
-            # Use canyon_seed instead of main seed for branch seeds
-            branch_seed = canyon_seed + i + int(px * 100 + py)
-            branch_rng = np.random.RandomState(branch_seed)
-            
-            # Branch parameters
-            branch_angle = branch_rng.uniform(-math.pi/4, math.pi/4)
-            
-            # Get direction vector of main path at this point
-            if i < len(path_points) - 1:
-                main_dx = path_points[i+1][0] - px
-                main_dy = path_points[i+1][1] - py
-            else:
-                main_dx = path_points[i][0] - path_points[i-1][0]
-                main_dy = path_points[i][1] - path_points[i-1][1]
-            
-            # Normalize
-            length = math.sqrt(main_dx**2 + main_dy**2)
-            if length > 0:
-                main_dx /= length
-                main_dy /= length
-            
-            # Rotate to get branch direction
-            branch_dx = main_dx * math.cos(branch_angle) - main_dy * math.sin(branch_angle)
-            branch_dy = main_dx * math.sin(branch_angle) + main_dy * math.cos(branch_angle)
-            
-            branch_length = branch_rng.uniform(20, 50)
-            branch_points = [(int(px), int(py))]
-            
-            # Branch wiggle parameters
-            branch_freq = branch_rng.uniform(20.0, 40.0)
-            branch_amp = branch_rng.uniform(0.2, 0.4)
-            branch_phase = branch_rng.uniform(0, 100)
-            
-            branch_x, branch_y = px, py
-            
-            # Create branch path
-            for step in range(int(branch_length)):
-                branch_perlin = snoise2(step/branch_freq, branch_phase, octaves=1)
-                branch_wiggle = branch_perlin * branch_amp * math.pi + branch_rng.uniform(-0.05, 0.05)
-                
-                branch_dir_x = branch_dx * math.cos(branch_wiggle) - branch_dy * math.sin(branch_wiggle)
-                branch_dir_y = branch_dx * math.sin(branch_wiggle) + branch_dy * math.cos(branch_wiggle)
-                
-                step_size = branch_rng.uniform(1.0, 1.5)
-                branch_x += branch_dir_x * step_size
-                branch_y += branch_dir_y * step_size
-                
-                # Keep in bounds
-                if branch_x < 0 or branch_x >= size or branch_y < 0 or branch_y >= size:
-                    break
-                
-                branch_points.append((int(branch_x), int(branch_y)))
-            
-            # Save this branch
-            if len(branch_points) > 5:  # Only save non-trivial branches
-                branches.append(branch_points)
-    
-    return {
-        'main_path': path_points,
-        'branches': branches
-    }
-
-def generate_landmass_chunk(start_y, end_y, size, noise_scale, octaves, seed):
-        chunk = np.zeros((end_y - start_y, size), dtype=np.float32)
-        for y in range(start_y, end_y):
-            for x in range(size):
-                nx = x / noise_scale
-                ny = y / noise_scale
-                chunk[y - start_y, x] = snoise2(nx, ny, octaves=octaves, persistence=0.5, lacunarity=2.0, base=seed)
-        return chunk
-
-def generate_landmass_parallel(size, land_proportion, plain_factor,
-                                shore_height, noise_scale, octaves, seed):
-    ctx = multiprocessing.get_context("spawn")
-    num_workers = min(ctx.cpu_count(), 4)
-    chunk_size = size // num_workers
-    ranges = [
-        (i * chunk_size,
-        (i + 1) * chunk_size if i < num_workers - 1 else size,
-        size, noise_scale, octaves, seed)
-        for i in range(num_workers)
-    ]
-
-    with ctx.Pool(processes=num_workers) as pool:
-        results = pool.starmap(generate_landmass_chunk, ranges)
-
-    heightmap = np.vstack(results)
-
-    # Normalize to [0, 1]
-    h_min, h_max = heightmap.min(), heightmap.max()
-    if h_max != h_min:
-        heightmap = (heightmap - h_min) / (h_max - h_min)
-    else:
-        heightmap[:] = 0.5
-
-    # Water threshold
-    water_threshold = np.percentile(heightmap, (1.0 - land_proportion) * 100.0)
-    under = heightmap < water_threshold
-    above = ~under
-
-    # Shore and plain shaping
-    heightmap[under] -= shore_height
-    denom = 1.0 - water_threshold
-    h_above = heightmap[above]
-    norm_above = np.clip((h_above - water_threshold) / denom, 0.0, 1.0) if denom > 1e-6 else np.zeros_like(h_above)
-    heightmap[above] = water_threshold + norm_above**plain_factor * denom
-
-    # Final normalization
-    h_min, h_max = heightmap.min(), heightmap.max()
-    return (heightmap - h_min) / (h_max - h_min) if h_max != h_min else np.full_like(heightmap, 0.5)
-    
-def _mp_worker_initializer():
-    """Prevent worker processes from capturing keyboard interrupts."""
-    import signal
-    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    def export_tiles(self):
+        """Export the heightmap as biome_ground.lua tiles plus a manifest, rewriting only changed tiles."""
+        out_dir = filedialog.askdirectory(title="Tile export directory", mustexist=False)
+        if not out_dir:
+            return  # User canceled
+
+        vars_dict = self._snapshot_vars()
+        if not self._confirm_memory_budget(vars_dict):
+            return
+
+        def worker():
+            try:
+                self.root.after(0, lambda: self.export_tiles_button.config(state="disabled"))
+                with timing.timed_job("tile export") as timer:
+                    counts = tiles.export_tiles(vars_dict, out_dir)
+                self._show_timings(timer)
+                message = (f"{counts['total']} tiles in {out_dir}: {counts['written']} written, "
+                           f"{counts['total'] - counts['written']} unchanged")
+                if counts["removed"]:
+                    message += f", {counts['removed']} removed"
+                self.root.after(0, lambda: messagebox.showinfo("Success", message))
+            except Exception as e:
+                self.root.after(0, lambda e=e: messagebox.showerror("Error", str(e)))
+                traceback.print_exc()
+            finally:
+                self.root.after(0, lambda: self.export_tiles_button.config(state="normal"))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _confirm_memory_budget(self, vars_dict):
+        """Ask before an export that is estimated to exceed the memory budget; returns whether to go ahead."""
+        warning = streaming.check_memory_budget(vars_dict)
+        if warning is None:
+            return True
+        return messagebox.askyesno("Memory warning", warning + "\n\nExport anyway?", icon="warning")
+
+    def _show_timings(self, timer):
+        """Show an export's per-stage timings in the status bar (from any thread)."""
+        summary = timer.summary()
+        print(summary)
+        self.root.after(0, lambda: self.status_var.set(summary))
+
+    def _generate_full_noise_data(self, size, vars_dict):
+        # Raw heights are shared through the render cache, e.g. between the RGB
+        # and greyscale exports of the same map. Errors (including landmass
+        # failures) propagate so a broken result is never saved or cached.
+        return cache.cached_noise_data(vars_dict, lambda: pipeline.generate_full_noise_data(size, vars_dict))
 
 def main():
     # Windows-specific fix for multiprocessing
     if __name__ == "__main__":
         multiprocessing.freeze_support()  # Needed for PyInstaller
         root = tk.Tk()
-        app = TextureGeneratorGUI(root)
+        TextureGeneratorGUI(root)
         root.mainloop()
+        shutdown_process_pool()
 
 if __name__ == "__main__":
     multiprocessing.freeze_support()  # Critical for PyInstaller on Windows
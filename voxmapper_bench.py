@@ -0,0 +1,9 @@
+"""Benchmark entry point: time the generation hot paths, see voxcore.benchmark."""
+import multiprocessing
+import sys
+
+from voxcore.benchmark import main
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,9 @@
+"""Command-line entry point: render heightmaps from presets without the GUI."""
+import multiprocessing
+import sys
+
+from voxcore.cli import main
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,9 @@
+"""Parity harness entry point: compare renders against golden references, see voxcore.parity."""
+import multiprocessing
+import sys
+
+from voxcore.parity import main
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())